@@ -0,0 +1,271 @@
+import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+import requests
+from config import MADIEN_LOGIN_URL, MADIEN_REPORT_URL, MADIEN_USER, MADIEN_PASS, REPORT_SUBMITTER
+from logger.logger import LoggerFactory
+from network.http_client import HttpClient
+
+class SubmitError(Exception):
+    """A page of the madien2 flow did not look as expected."""
+
+class HtmlForm:
+    """
+    One <form> of a page: its action/method and the fields in document order.
+    Each field is a dict with name, tag (input/select/textarea), type, value
+    and, for <select>, the list of option values.
+    """
+    def __init__(self, action: str, method: str):
+        self.action = action
+        self.method = method.lower() or "get"
+        self.fields: list[dict] = []
+
+    def field(self, name: str) -> dict | None:
+        for field in self.fields:
+            if field["name"] == name:
+                return field
+        return None
+
+    def submit_after(self, name: str) -> dict | None:
+        """First submit button after the field `name` (like XPath following::)."""
+        position = next((i for i, f in enumerate(self.fields) if f["name"] == name), None)
+        if position is None:
+            return None
+        return next((f for f in self.fields[position + 1:] if f["type"] == "submit"), None)
+
+    def values(self, button: dict | None = None, **overrides) -> dict:
+        """
+        Values a browser would send: every named field except submit buttons
+        other than `button`, and unchecked checkboxes/radios.
+        """
+        data = {}
+        for field in self.fields:
+            name, kind = field["name"], field["type"]
+            if not name or kind in ("button", "reset", "image", "file"):
+                continue
+            if kind == "submit" and field is not button:
+                continue
+            if kind in ("checkbox", "radio") and not field["checked"]:
+                continue
+            data[name] = field["value"]
+        data.update(overrides)
+        return data
+
+class FormParser(HTMLParser):
+    """
+    Collect the forms of a page with the stdlib html.parser. Fields outside
+    any <form> are ignored.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms: list[HtmlForm] = []
+        self._form = None
+        self._select = None
+        self._option = None
+        self._textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {key: value or "" for key, value in attrs}
+        if tag == "form":
+            self._form = HtmlForm(attrs.get("action", ""), attrs.get("method", "get"))
+            self.forms.append(self._form)
+        elif self._form is None:
+            return
+        elif tag == "input":
+            kind = attrs.get("type", "text").lower()
+            self._form.fields.append({
+                "name": attrs.get("name", ""), "tag": "input", "type": kind,
+                "value": attrs.get("value", "on" if kind in ("checkbox", "radio") else ""),
+                "checked": "checked" in attrs,
+            })
+        elif tag == "button":
+            self._form.fields.append({
+                "name": attrs.get("name", ""), "tag": "button", "type": attrs.get("type", "submit").lower(),
+                "value": attrs.get("value", ""), "checked": False,
+            })
+        elif tag == "select":
+            self._select = {"name": attrs.get("name", ""), "tag": "select", "type": "select",
+                            "value": None, "options": [], "checked": False}
+            self._form.fields.append(self._select)
+        elif tag == "option" and self._select is not None:
+            self._option = {"value": attrs.get("value"), "text": "", "selected": "selected" in attrs}
+            self._select["options"].append(self._option)
+        elif tag == "textarea":
+            self._textarea = {"name": attrs.get("name", ""), "tag": "textarea", "type": "textarea",
+                              "value": "", "checked": False}
+            self._form.fields.append(self._textarea)
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option["text"] += data
+        elif self._textarea is not None:
+            self._textarea["value"] += data
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+        elif tag == "option":
+            self._option = None
+        elif tag == "select" and self._select is not None:
+            options = self._select["options"]
+            for option in options:
+                if option["value"] is None:  # <option>text</option>
+                    option["value"] = option["text"].strip()
+            chosen = next((o for o in options if o["selected"]), options[0] if options else None)
+            self._select["value"] = chosen["value"] if chosen else ""
+            self._select = None
+        elif tag == "textarea":
+            self._textarea = None
+
+def parse_forms(html: str) -> list[HtmlForm]:
+    parser = FormParser()
+    parser.feed(html)
+    parser.close()
+    return parser.forms
+
+def find_form(forms: list[HtmlForm], *names: str) -> HtmlForm | None:
+    """First form that has every field in `names`."""
+    return next((form for form in forms if all(form.field(name) for name in names)), None)
+
+class HttpFormSubmitter:
+    """
+    Submit the madien2 report without a browser.
+
+    Same flow as the Selenium controller, with a cookie-keeping session:
+    POST the login form, GET add_maTV.asp for the day, choose `gio`, post
+    `noidungmadien` with the submit button after `ma_tr`, and check that
+    the content appears in the response. The session cookie is kept between
+    reports; if add_maTV answers with the login form, log in again.
+    The URLs are parameters so the flow can run against a local stub server.
+    """
+    def __init__(self,
+                 user: str = MADIEN_USER,
+                 password: str = MADIEN_PASS,
+                 login_link: str = MADIEN_LOGIN_URL,
+                 report_link: str = MADIEN_REPORT_URL,
+                 client: HttpClient | None = None):
+        self.user = user
+        self.password = password
+        self.login_link = login_link
+        self.report_link = report_link
+        # client riêng: cookie đăng nhập không lẫn với các request khác
+        self.client = client if client is not None else HttpClient()
+        self.logged_in = False
+        self.logger = LoggerFactory()
+
+    def submit_report(self, content: str, now: datetime.datetime | None = None) -> bool:
+        """
+        Whole flow for one report: form of today, hour of `now` (0h → 24).
+        "checking" stops before the final submit, like the browser flow.
+        Failures before the report is posted raise (SubmitError or a
+        requests exception); once the POST is sent the result is only
+        returned: False if it failed or the content is not on the result page.
+        """
+        now = now or datetime.datetime.now()
+        hour = now.hour if now.hour != 0 else 24
+        url, forms = self.open_report_form(now.date())
+
+        form = find_form(forms, "gio")
+        if form is None:
+            raise SubmitError("add_maTV page has no 'gio' select")
+        options = [option["value"] for option in form.field("gio")["options"]]
+        if str(hour) not in options:
+            raise SubmitError(f"hour {hour} is not an option of 'gio': {options}")
+        url, forms = self._submit(url, form, form.field("OK") or form.submit_after("gio"), gio=str(hour))
+
+        form = find_form(forms, "noidungmadien", "ma_tr")
+        if form is None:
+            raise SubmitError("content form ('noidungmadien', 'ma_tr') not found after choosing the hour")
+        button = form.submit_after("ma_tr")
+        if content == "checking":
+            self.logger.add_log("INFO", "Content is 'checking', form reached, not submitting", tag="HttpSubmitter")
+            return True
+        try:
+            resp = self._send(url, form, button, noidungmadien=content)
+        except requests.RequestException as e:
+            # POST có thể đã tới server: không biết đã lưu hay chưa, không gửi lại
+            self.logger.add_log("WARNING", f"Report '{content}' POST failed ({type(e).__name__}: {e}), result unknown", tag="HttpSubmitter")
+            self.logged_in = False
+            return False
+        if content in resp.text:
+            self.logger.add_log("INFO", f"Report '{content}' submitted for hour {hour}", tag="HttpSubmitter")
+            return True
+        self.logger.add_log("WARNING", f"Report '{content}' not found on the result page", tag="HttpSubmitter")
+        return False
+
+    def login(self):
+        resp = self.client.get(self.login_link)
+        resp.raise_for_status()
+        form = find_form(parse_forms(resp.text), "username", "password")
+        if form is None:
+            raise SubmitError("login form not found")
+        resp = self._send(resp.url, form, form.field("logon"), username=self.user, password=self.password)
+        if find_form(parse_forms(resp.text), "username", "password"):
+            raise SubmitError(f"login rejected for user {self.user}")
+        self.logged_in = True
+        self.logger.add_log("INFO", f"Logged in as {self.user}", tag="HttpSubmitter")
+
+    def open_report_form(self, day: datetime.date) -> tuple[str, list[HtmlForm]]:
+        """
+        GET add_maTV for the day; log in again once if the session expired.
+        Returns the final URL and the forms of the page.
+        """
+        ngay = f"{day.year}/{day.month}/{day.day}"
+        url = urljoin(self.report_link, f"add_maTV.asp?page_type=0&idd=104&ngay={ngay}&ngayxem={ngay}")
+        for _ in range(2):
+            if not self.logged_in:
+                self.login()
+            resp = self.client.get(url)
+            resp.raise_for_status()
+            forms = parse_forms(resp.text)
+            if not find_form(forms, "username", "password"):
+                return resp.url, forms
+            self.logger.add_log("INFO", "Session expired, logging in again", tag="HttpSubmitter")
+            self.logged_in = False
+        raise SubmitError("add_maTV page not reachable after re-login")
+
+    def _submit(self, page_url, form, button, **overrides) -> tuple[str, list[HtmlForm]]:
+        resp = self._send(page_url, form, button, **overrides)
+        return resp.url, parse_forms(resp.text)
+
+    def _send(self, page_url: str, form: HtmlForm, button: dict | None, **overrides) -> requests.Response:
+        target = urljoin(page_url, form.action) if form.action else page_url
+        data = form.values(button, **overrides)
+        if form.method == "post":
+            resp = self.client.post(target, data=data)
+        else:
+            resp = self.client.get(target, params=data)
+        resp.raise_for_status()
+        return resp
+
+_submitter: HttpFormSubmitter | None = None
+
+def submit_report(content: str, now: datetime.datetime | None = None) -> bool:
+    """
+    Submit a report with the configured backend. With REPORT_SUBMITTER="http"
+    the browserless submitter is tried first and selenium_controller is only
+    used when it fails before the report is posted (login, form discovery,
+    connection). A failed POST or a result page without the content is
+    logged, the operators get the same Zalo alert as a failed browser
+    report, and False is returned: the report may already be saved, so it
+    is not submitted a second time.
+    """
+    global _submitter
+    logger = LoggerFactory()
+    if REPORT_SUBMITTER == "http":
+        if _submitter is None:
+            _submitter = HttpFormSubmitter()
+        try:
+            submitted = _submitter.submit_report(content, now)
+        except (requests.RequestException, SubmitError) as e:
+            logger.add_log("WARNING", f"HTTP submit failed ({type(e).__name__}: {e}), falling back to Selenium", tag="HttpSubmitter")
+            _submitter.logged_in = False
+        else:
+            if not submitted:
+                logger.add_log("BUG", f"Report '{content}' not confirmed after the POST, not resubmitting", tag="HttpSubmitter")
+                # import muộn: selenium chỉ cần khi thật sự dùng trình duyệt
+                from automation.selenium_controller import send_zalo_message
+                send_zalo_message("[Web Error] Ma dien bao: :" + content)
+            return submitted
+    from automation.selenium_controller import selenium_controller
+    return selenium_controller(content, now=now)
@@ -2,233 +2,250 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import Select
+from selenium.webdriver.support.ui import Select, WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException
 import time
+import atexit
+import threading
 from urllib.parse import urljoin
 import datetime
-LINK = 'http://madien2.kttvdb.vn/content/users/login.asp?ret_page=../../content/code/'
-LINK_REPORT = "http://madien2.kttvdb.vn/content/code/"
-USER = 'tvtrieuduong'
-PASS = '91376'
+from config import MADIEN_LOGIN_URL, MADIEN_REPORT_URL, MADIEN_USER, MADIEN_PASS
+LINK = MADIEN_LOGIN_URL
+LINK_REPORT = MADIEN_REPORT_URL
+USER = MADIEN_USER
+PASS = MADIEN_PASS
 ZALO_CHAT_NAME ="report_tvtrieuduong"
+WAIT_TIMEOUT = 30      # giây, thời gian chờ tối đa cho mỗi element/trang
+RETRY_DELAY = 10       # giây giữa hai lần thử gửi báo cáo
 
-def login(user: str, password: str, link: str)-> tuple[webdriver.Chrome | None, bool]:
-    """Open Chromium headless, navigate to link, fill credentials, click logon, and return the driver."""
-    print(f"[Login] Starting login process for user: {user}")
-
+def new_chromium_driver(headless: bool = False, profile_dir: str | None = None) -> webdriver.Chrome:
+    """Start a Chromium driver with the options used on the station PC."""
     options = Options()
     options.binary_location = '/usr/bin/chromium-browser'
-    #options.add_argument('--headless')
+    if headless:
+        options.add_argument('--headless')
+    if profile_dir:
+        options.add_argument(f'--user-data-dir={profile_dir}')
+        options.add_argument('--profile-directory=Default')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
     service = Service('/usr/bin/chromedriver')  # updated path
-
-    print("[Login] Initializing Chromium driver (headless)")
     driver = webdriver.Chrome(service=service, options=options)
-    print("[Login] Waiting for driver warmup (2s)")
-    time.sleep(2)
-    driver.set_page_load_timeout(30)
-    print("[Login] Chromium driver initialized")
-
-    try:
-        print(f"[Login] Navigating to {link}")
-        driver.get(link)
-        print("[Login] Page load completed")
-
-        print("[Login] Locating username field")
-        el_user = driver.find_element(By.NAME, 'username')
-        print("[Login] Clearing username field")
+    driver.set_page_load_timeout(WAIT_TIMEOUT)
+    return driver
+
+class BrowserSession:
+    """
+    Long-lived, logged-in browser for the madien2 report form.
+
+    The driver is started lazily and kept alive between reports, so a run
+    only pays for page loads, not for starting Chromium and logging in.
+    Every wait is an explicit WebDriverWait on the element the next step
+    needs (gio, noidungmadien, ma_tr), never a fixed sleep. If the server
+    sent us back to the login page (session expired) the session logs in
+    again; if the browser died it is restarted.
+
+    login_link / report_link / driver_factory can point the session at a
+    local HTML stub of the login and add_maTV pages for testing.
+    """
+    def __init__(self,
+                 user: str = USER,
+                 password: str = PASS,
+                 login_link: str = LINK,
+                 report_link: str = LINK_REPORT,
+                 timeout: float = WAIT_TIMEOUT,
+                 driver_factory=new_chromium_driver):
+        self.user = user
+        self.password = password
+        self.login_link = login_link
+        self.report_link = report_link
+        self.timeout = timeout
+        self.driver_factory = driver_factory
+        self.driver = None
+        self.logged_in = False
+
+    # ---- lifecycle --------------------------------------------------------
+    def start(self):
+        """Return a live driver, restarting the browser if it has died."""
+        if self.driver is not None:
+            try:
+                self.driver.current_url  # ping
+                return self.driver
+            except WebDriverException:
+                print("[Session] Browser is gone, restarting")
+                self.close()
+        print("[Session] Starting browser")
+        self.driver = self.driver_factory()
+        self.logged_in = False
+        return self.driver
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except WebDriverException:
+                pass
+        self.driver = None
+        self.logged_in = False
+
+    def wait(self, condition, timeout: float | None = None):
+        return WebDriverWait(self.driver, timeout or self.timeout).until(condition)
+
+    # ---- steps ------------------------------------------------------------
+    def login(self):
+        """Fill the login form and wait until the browser leaves it."""
+        driver = self.start()
+        print(f"[Login] Logging in as {self.user}")
+        driver.get(self.login_link)
+        el_user = self.wait(EC.presence_of_element_located((By.NAME, 'username')))
         el_user.clear()
-        print("[Login] Entering username")
-        el_user.send_keys(user)
-        print(f"[Login] Username '{user}' entered")
-
-        print("[Login] Locating password field")
+        el_user.send_keys(self.user)
         el_pass = driver.find_element(By.NAME, 'password')
-        print("[Login] Clearing password field")
         el_pass.clear()
-        print("[Login] Entering password")
-        el_pass.send_keys(password)
-        print("[Login] Password entered")
-
-        print("[Login] Locating logon button")
+        el_pass.send_keys(self.password)
         btn = driver.find_element(By.NAME, 'logon')
-        print("[Login] Clicking logon button")
         btn.click()
-        print("[Login] Logon button clicked")
-
-        print("[Login] Waiting for post-login page to load (3s)")
-        time.sleep(3)
-
-        print("[Login] Login successful, returning driver instance")
-        return driver,True
-
-    except TimeoutException:
-        print(f"[Login] Timeout loading page")
-        driver.quit()
-        return None,False
-    except WebDriverException as e:
-        print(f"[Login] WebDriver error")
-        driver.quit()
-        return None,False
-    except Exception as e:
-        print(f"[Login] Unexpected error")
-        driver.quit()
-        return None,False
-        
-def navigate_to_add_matv(driver)-> tuple[webdriver.Chrome | None, bool]:
-    try:
-        today = datetime.date.today().strftime('%Y/%-m/%-d')
-        path = f"add_maTV.asp?page_type=0&idd=104&ngay={today}&ngayxem={today}"
-        print(f"path:{path}")
-        full_url = urljoin(LINK_REPORT, path)
-        print(f"[Navigate] Going to {full_url}")
-        driver.get(full_url)
-        print("[Navigate] Reached add_maTV page")
-        time.sleep(5)
-        return driver,True
-    except TimeoutException:
-        print(f"[Login] Timeout loading page")
-        driver.quit()
-        return None,False
-    except WebDriverException as e:
-        print(f"[Login] WebDriver error")
-        driver.quit()
-        return None,False
-    except Exception as e:
-        print(f"[Login] Unexpected error")
-        driver.quit()
-        return None,False
-
-def select_current_hour_and_confirm(driver)-> tuple[webdriver.Chrome | None, bool]:
-    now = datetime.datetime.now()
-    hour = now.hour if now.hour != 0 else 24
-    print(f"[Select] Current hour: {hour}")
-    try:
-        select_el = driver.find_element(By.NAME, 'gio')
-        select = Select(select_el)
+        # Trang login bị thay thế sau khi submit
+        self.wait(EC.staleness_of(btn))
+        self.logged_in = True
+        print("[Login] Login successful")
+
+    def open_report_form(self, day: datetime.date | None = None):
+        """
+        Open add_maTV for the day and wait for the hour select (gio).
+        Re-login once if the server redirected to the login page.
+        """
+        day = day or datetime.date.today()
+        ngay = f"{day.year}/{day.month}/{day.day}"
+        path = f"add_maTV.asp?page_type=0&idd=104&ngay={ngay}&ngayxem={ngay}"
+        full_url = urljoin(self.report_link, path)
+        for attempt in range(2):
+            if not self.logged_in:
+                self.login()
+            print(f"[Navigate] Going to {full_url}")
+            self.driver.get(full_url)
+            self.wait(EC.any_of(
+                EC.presence_of_element_located((By.NAME, 'gio')),
+                EC.presence_of_element_located((By.NAME, 'username')),
+            ))
+            if self.driver.find_elements(By.NAME, 'gio'):
+                print("[Navigate] Reached add_maTV page")
+                return
+            print("[Navigate] Session expired, logging in again")
+            self.logged_in = False
+        raise TimeoutException("add_maTV page not reachable after re-login")
+
+    def select_hour(self, hour: int):
+        """Select the report hour, confirm, and wait for the content form."""
+        select = Select(self.wait(EC.element_to_be_clickable((By.NAME, 'gio'))))
         select.select_by_value(str(hour))
-        time.sleep(5)
         print(f"[Select] Selected hour option: {hour}")
-        btn_ok = driver.find_element(By.NAME, 'OK')
+        btn_ok = self.driver.find_element(By.NAME, 'OK')
         btn_ok.click()
         print("[Select] Clicked OK button")
-        return driver,True
-    except NoSuchElementException as e:
-        print(f"[Select] Element not found: {e}")
-        driver.quit()
-        return None,False
-
-def fill_content_and_submit(driver, content: str)-> tuple[webdriver.Chrome | None, bool]:
-    try:
-        print(f"[Fill] Locating 'noidungmadien' field")
-        field = driver.find_element(By.NAME, 'noidungmadien')
+        self.wait(EC.presence_of_element_located((By.NAME, 'noidungmadien')))
+        self.wait(EC.presence_of_element_located((By.NAME, 'ma_tr')))
+
+    def fill_and_submit(self, content: str) -> bool:
+        """
+        Enter the report and submit it ("checking" is only filled, not sent).
+        Returns True once the content shows up on the result page.
+        """
+        field = self.wait(EC.element_to_be_clickable((By.NAME, 'noidungmadien')))
         field.clear()
-        print(f"[Fill] Entering content: {content}")
         field.send_keys(content)
-        print("[Fill] Content entered")
-
-        print("[Fill] Locating 'ma_tr' field")
-        ma_tr_el = driver.find_element(By.NAME, 'ma_tr')
-        print("[Fill] Locating submit button relative to 'ma_tr'")
+        print(f"[Fill] Content entered: {content}")
+        ma_tr_el = self.driver.find_element(By.NAME, 'ma_tr')
         submit_btn = ma_tr_el.find_element(By.XPATH, 'following::input[@type="submit"][1]')
-        print("[Fill] Clicking submit button")
-        time.sleep(1)
-        if content != "checking":
-            print("[Fill] Content is not 'checking', clicking submit")
-            submit_btn.click()
-            time.sleep(10)
-            
-            page_source = driver.page_source
-            if content in page_source:
-                print("[Fill] Content found on page. PASS")
-                driver.quit()
-                return None, True
-            else:
-                print("[Fill] Content NOT found on page. FAIL")
-                time.sleep(10)
-                driver.quit()
-                return None, False
-        print(f"[fill] submitted content: {content}")
-        driver.quit()
-        return None,True
-    except NoSuchElementException as e:
-        print(f"[Fill] Element not found: {e}")
-        driver.quit()
-        return None,False
+        if content == "checking":
+            print(f"[Fill] Content is 'checking', not submitting")
+            return True
+        submit_btn.click()
+        try:
+            self.wait(EC.staleness_of(submit_btn))
+            self.wait(lambda driver: content in driver.page_source)
+        except TimeoutException:
+            print("[Fill] Content NOT found on page. FAIL")
+            return False
+        print("[Fill] Content found on page. PASS")
+        return True
+
+    def submit_report(self, content: str, now: datetime.datetime | None = None) -> bool:
+        """Whole flow for one report: form of today, hour of `now` (0h → 24)."""
+        now = now or datetime.datetime.now()
+        hour = now.hour if now.hour != 0 else 24
+        self.open_report_form(now.date())
+        self.select_hour(hour)
+        return self.fill_and_submit(content)
+
+_session: BrowserSession | None = None
+_session_lock = threading.Lock()
+
+def get_session() -> BrowserSession:
+    """Process-wide warm session, closed at interpreter exit."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = BrowserSession()
+            atexit.register(_session.close)
+        return _session
 
 def send_zalo_message(message: str):
     print("[Zalo] Navigating to chat.zalo.me")
-    options = Options()
-    options.binary_location = '/usr/bin/chromium-browser'
-    #options.add_argument('--headless')
-    options.add_argument('--user-data-dir=/home/tuan/.config/chromium')
-    options.add_argument('--profile-directory=Default')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    service = Service('/usr/bin/chromedriver')  # updated path
+    print("[Login] Initializing Chromium driver")
+    driver = new_chromium_driver(profile_dir='/home/tuan/.config/chromium')
+    try:
+        wait = WebDriverWait(driver, 60)
+        driver.get('https://chat.zalo.me')
+        # chờ danh sách chat
+        items = wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'truncate')))
+
+        print(f"[Zalo] Locating chat item: {ZALO_CHAT_NAME}")
+        for item in items:
+            if item.text.strip() == ZALO_CHAT_NAME:
+                item.click()
+                print("[Zalo] Chat selected")
+                break
+        else:
+            print("[Zalo] Chat not found")
+            return
+
+        print("[Zalo] Locating message input container")
+        input_container = wait.until(EC.element_to_be_clickable((By.ID, 'input_line_0')))
+        input_container.click()
+        input_container.send_keys(message)
+        send_btn = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, '[class*="send-msg-btn"]')))
+        send_btn.click()
+        print("[Zalo] Send button clicked")
+        # ô nhập được xoá khi tin nhắn đã gửi đi
+        wait.until(lambda d: not d.find_element(By.ID, 'input_line_0').text.strip())
+        print("[Zalo] Message sent")
+    except (TimeoutException, WebDriverException) as e:
+        print(f"[Zalo] Failed to send message: {type(e).__name__}")
+    finally:
+        driver.quit()
 
-    print("[Login] Initializing Chromium driver (headless)")
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.get('https://chat.zalo.me')
-    time.sleep(20)  # wait for chat list
-
-    print(f"[Zalo] Locating chat item: {ZALO_CHAT_NAME}")
-    items = driver.find_elements(By.CLASS_NAME, 'truncate')
-    for item in items:
-        if item.text.strip() == ZALO_CHAT_NAME:
-            item.click()
-            print("[Zalo] Chat selected")
-            break
-    else:
-        print("[Zalo] Chat not found")
-        return
-
-    time.sleep(3)
-    print("[Zalo] Locating message input container")
-    input_container = driver.find_element(By.ID, 'input_line_0')
-    input_container.click()
-    input_container.send_keys(message)
-    time.sleep(5)
-    send_btn = driver.find_element(By.CSS_SELECTOR, '[class*="send-msg-btn"]')
-    send_btn.click()
-    print("[Zalo] Send button clicked")
-    time.sleep(5)
-    driver.quit()
-    print("[Zalo] Message sent")
-    
-def selenium_controller(ma_dien_bao:str):
+def selenium_controller(ma_dien_bao:str, session: BrowserSession | None = None, now: datetime.datetime | None = None):
+    session = session or get_session()
     stt = False
     times_request = 3
-    while not stt and times_request > 0: 
+    while not stt and times_request > 0:
         print("[Main] Starting script")
-        driver,stt = login(USER, PASS, LINK)
-        if stt == False:
-            print(f"[Main] Report failed, retrying in 60 seconds")
-            time.sleep(30)
+        try:
+            stt = session.submit_report(ma_dien_bao, now)
+        except (TimeoutException, NoSuchElementException, WebDriverException) as e:
+            print(f"[Main] {type(e).__name__}: {e}")
+            stt = False
+        if not stt:
             times_request -= 1
-            continue 
-        driver,stt = navigate_to_add_matv (driver)
-        if stt == False:
-            print(f"[Main] Report failed, retrying in 60 seconds")
-            time.sleep(30)
-            times_request -= 1
-            continue 
-        driver,stt = select_current_hour_and_confirm(driver)
-        if stt == False:
-            print(f"[Main] Report failed, retrying in 60 seconds")
-            time.sleep(30)
-            times_request -= 1
-            continue 
-        driver,stt = fill_content_and_submit(driver, content= ma_dien_bao)
-        if stt == False:
-            print(f"[Main] Report failed, retrying in 60 seconds")
-            time.sleep(30)
-            times_request -= 1
-            continue 
+            # trạng thái trình duyệt không rõ: khởi động lại ở lần thử sau
+            session.close()
+            if times_request > 0:
+                print(f"[Main] Report failed, retrying in {RETRY_DELAY} seconds")
+                time.sleep(RETRY_DELAY)
     if not stt:
         print("[Main] Failed to complete task after multiple attempts")
         send_zalo_message("[Web Error] Ma dien bao: :" + ma_dien_bao)
-    print("[Main] Script completed, quitting driver")
-    times_request = 3
+    print("[Main] Script completed, browser kept for the next run")
+    return stt
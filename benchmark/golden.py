@@ -0,0 +1,101 @@
+"""
+Golden outputs of the pre-optimisation pipeline (baseline commit 083f367)
+on fixed synthetic series, checked by test/test_golden.py.
+
+Regenerate from a checkout of the baseline commit:
+
+    git worktree add /tmp/ref 083f367
+    python benchmark/golden.py --baseline /tmp/ref
+"""
+import io
+import os
+import sys
+import json
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_FILE = os.path.join(ROOT, "test", "golden_baseline.json")
+BASELINE_COMMIT = "083f367"
+
+# (tên, tham số TideConfig); `now` = thời điểm cuối của series
+CASES = (
+    ("4d_default", {"days": 4.0, "seed": 1}),
+    ("4d_spiky", {"days": 4.0, "seed": 2, "spike_rate": 0.04, "channel_fault_rate": 0.02}),
+    ("6d_gappy", {"days": 6.0, "seed": 3, "gap_rate": 0.08, "gap_blocks": 5}),
+    ("2d_calm", {"days": 2.0, "seed": 4, "noise": 2.0, "spike_rate": 0.0}),
+)
+
+def golden_payload(options: dict) -> tuple[list[dict], datetime]:
+    """
+    water_level.php rows of one case, plus two malformed rows that the
+    parser must skip, and the logical time of the run.
+    """
+    from benchmark.synthetic import TideConfig, generate_rows
+    config = TideConfig(**options)
+    rows = generate_rows(config)
+    rows.insert(len(rows) // 3, dict(rows[0], id="999001", created_at="not a time"))
+    rows.insert(len(rows) // 2, dict(rows[0], id="999002", water_lever_0="n/a"))
+    return rows, config.end
+
+def event_key(filtered) -> list[list]:
+    return [[rec.id, rec.date_time.strftime("%Y-%m-%d %H:%M:%S"), kind] for rec, kind in filtered]
+
+def baseline_outputs() -> dict:
+    """
+    Run the baseline parse / outlier filter / trend detection, as its
+    main() did, with datetime.now() frozen at the end of each series.
+    """
+    import data.trend_detected as trend_module
+    from data.data_handler import DataProcessor
+    from data.filter import FilterWaterLevel
+    outputs = {}
+    for name, options in CASES:
+        rows, now = golden_payload(options)
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now
+        trend_module.datetime = FrozenDatetime
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = DataProcessor().process(rows)
+            kept = FilterWaterLevel().detect_outlier_by_median(records)
+            filtered, trend_code, closest_record = trend_module.trend_detected_processes(kept)
+        kept_ids = {id(record) for record in kept}
+        outputs[name] = {
+            "parsed": {
+                "count": len(records),
+                "ids": [record.id for record in records],
+                "first_time": records[0].date_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "last_time": records[-1].date_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "level_sums": [sum(getattr(record, f"water_level_{k}") for record in records) for k in range(3)],
+                "vol_sum": round(sum(record.vol for record in records), 6),
+            },
+            "outlier_indices": [i for i, record in enumerate(records) if id(record) not in kept_ids],
+            "events": event_key(filtered),
+            "trend_code": trend_code,
+            "closest_id": closest_record.id,
+        }
+    return outputs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate test/golden_baseline.json from the baseline code.")
+    parser.add_argument("--baseline", required=True, help=f"checkout of the baseline commit {BASELINE_COMMIT}")
+    parser.add_argument("--output", default=GOLDEN_FILE)
+    args = parser.parse_args(argv)
+    # mã baseline đứng trước: data/, logger/, config của nó được import thay cho bản hiện tại
+    sys.path[:0] = [os.path.abspath(args.baseline), ROOT]
+    output = os.path.abspath(args.output)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # logs/ của baseline
+        outputs = baseline_outputs()
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"baseline": BASELINE_COMMIT, "cases": outputs}, f, indent=1)
+        f.write("\n")
+    print(f"{len(outputs)} cases written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime
+import numpy as np
+from benchmark.synthetic import TideConfig, generate_rows
+from data.data_handler import DataProcessor
+from data.filter import FilterWaterLevel
+from data.trend_detected import detect_absolute_peaks_troughs, check_last_point, filter_peaks_troughs, detect_last_trend
+from data.report_making import make_report
+from data.event_ledger import EventLedger
+from logger.logger import LoggerFactory
+
+STAGES = (
+    "process",
+    "detect_outlier_by_median",
+    "fill_lack_value",
+    "detect_absolute_peaks_troughs",
+    "check_last_point",
+    "filter_peaks_troughs",
+    "make_report",
+)
+DEFAULT_DAYS = (1, 4, 30, 365)
+
+def _timed(func, repeat: int, setup=None) -> dict:
+    """
+    Run func() `repeat` times (setup() before each run, not timed) and
+    return wall-clock statistics in seconds plus the last result.
+    """
+    samples = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        # Các stage in ra màn hình rất nhiều; không tính chi phí terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = func()
+            samples.append(time.perf_counter() - started)
+    samples = np.array(samples)
+    return {
+        "min": float(samples.min()),
+        "median": float(np.median(samples)),
+        "mean": float(samples.mean()),
+        "max": float(samples.max()),
+        "runs": repeat,
+    }, result
+
+def bench_case(config: TideConfig, repeat: int, workdir: str) -> dict:
+    """
+    Time every stage of the pipeline separately on one synthetic series.
+    Each stage gets the output of the previous one, computed once.
+    """
+    rows = generate_rows(config)
+    timings = {}
+
+    timings["process"], series = _timed(lambda: DataProcessor().process(rows), repeat)
+
+    filter_water_level = FilterWaterLevel()
+    timings["detect_outlier_by_median"], keep_mask = _timed(lambda: filter_water_level.detect_outlier_by_median(series), repeat)
+    timings["fill_lack_value"], _ = _timed(lambda: filter_water_level.fill_lack_value(series, keep_mask), repeat)
+    cleaned = series[keep_mask[0]]
+    index = cleaned.time_index
+
+    timings["detect_absolute_peaks_troughs"], (peaks, troughs) = _timed(
+        lambda: detect_absolute_peaks_troughs(cleaned, index=index), repeat)
+    timings["check_last_point"], (peaks, troughs) = _timed(
+        lambda: check_last_point(cleaned, peaks.tolist(), troughs.tolist(), delta=15, index=index), repeat)
+    timings["filter_peaks_troughs"], (peaks, troughs) = _timed(
+        lambda: filter_peaks_troughs(cleaned, peaks.tolist(), troughs.tolist()), repeat)
+
+    filtered = sorted([(cleaned[i], 'peak') for i in peaks] + [(cleaned[i], 'trough') for i in troughs],
+                      key=lambda item: item[0].date_time)
+    with contextlib.redirect_stdout(io.StringIO()):
+        filtered, trend_code, closest_record = detect_last_trend(cleaned, filtered, index=index, now=config.end)
+    events_db = os.path.join(workdir, f"events_{config.days}.sqlite3")
+    # Giờ synoptic: make_report đọc/ghi sổ sự kiện như khi chạy thật
+    report_time = config.end.replace(hour=7, minute=0)
+    ledger = EventLedger(events_db)
+    timings["make_report"], report = _timed(
+        lambda: make_report(list(filtered), trend_code, closest_record, ledger=ledger, now=report_time),
+        repeat, setup=ledger.clear)
+    ledger.close()
+
+    return {
+        "days": config.days,
+        "seed": config.seed,
+        "rows": len(rows),
+        "records_after_filter": len(cleaned),
+        "outliers": int((~keep_mask[0]).sum()),
+        "events": len(filtered),
+        "report": report,
+        "stages": timings,
+        "total_median": sum(stage["median"] for stage in timings.values()),
+    }
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    """
+    Median ratio current/baseline for every (days, stage) present in both.
+    """
+    previous = {case["days"]: case["stages"] for case in baseline.get("cases", [])}
+    lines = []
+    for case in results["cases"]:
+        stages = previous.get(case["days"])
+        if not stages:
+            continue
+        for stage, stats in case["stages"].items():
+            if stage in stages and stages[stage]["median"] > 0:
+                ratio = stats["median"] / stages[stage]["median"]
+                flag = "  <-- slower" if ratio > 1.2 else ""
+                lines.append(f"{case['days']:>6}d {stage:<30} {ratio:6.2f}x{flag}")
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic tidal series.")
+    parser.add_argument("--days", type=float, nargs="*", default=list(DEFAULT_DAYS),
+                        help="series lengths in days (10-minute spacing)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", help="write the JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="earlier JSON results to compare the medians with")
+    parser.add_argument("--log-level", default="WARNING", help="logger level during the run")
+    args = parser.parse_args(argv)
+
+    LoggerFactory().set_level(args.log_level)
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "log_level": args.log_level,
+        "cases": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for days in args.days:
+            config = TideConfig(days=days, seed=args.seed)
+            case = bench_case(config, args.repeat, workdir)
+            results["cases"].append(case)
+            print(f"{days:>6}d {case['rows']:>6} rows  " +
+                  "  ".join(f"{stage}={case['stages'][stage]['median'] * 1000:.1f}ms" for stage in STAGES),
+                  file=sys.stderr)
+    LoggerFactory().flush()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        for line in compare(results, baseline):
+            print(line, file=sys.stderr)
+    return results
+
+if __name__ == "__main__":
+    main()
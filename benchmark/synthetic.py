@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import numpy as np
+
+STEP = timedelta(minutes=10)
+
+@dataclass(frozen=True)
+class Harmonic:
+    amplitude: float    # mm
+    period: float       # giờ
+    phase: float = 0.0  # rad
+
+# Các thành phần triều chính (biên độ điển hình cho trạm ven biển, mm)
+DEFAULT_HARMONICS = (
+    Harmonic(600.0, 12.42),          # M2
+    Harmonic(200.0, 12.00, 0.8),     # S2
+    Harmonic(250.0, 23.93, 1.9),     # K1
+    Harmonic(180.0, 25.82, 2.6),     # O1
+)
+
+@dataclass
+class TideConfig:
+    """
+    Shape of a synthetic station series at 10-minute spacing.
+    """
+    days: float = 4.0
+    mean_level: float = 1500.0          # mm
+    harmonics: tuple[Harmonic, ...] = DEFAULT_HARMONICS
+    noise: float = 8.0                  # độ lệch chuẩn nhiễu, mm
+    spike_rate: float = 0.01            # tỉ lệ điểm bị nhiễu xung
+    spike_amplitude: float = 2000.0     # mm
+    gap_rate: float = 0.02              # tỉ lệ điểm bị mất lẻ tẻ
+    gap_blocks: int = 2                 # số đoạn mất dữ liệu liên tục
+    gap_block_length: int = 12          # số điểm của mỗi đoạn mất
+    channel_offset: tuple[float, float] = (3.0, -4.0)   # lệch hệ thống của kênh 1, 2 so với kênh 0
+    channel_noise: float = 5.0          # nhiễu riêng của kênh 1, 2
+    channel_fault_rate: float = 0.005   # tỉ lệ điểm chỉ một kênh bị lỗi
+    vol: float = 12.6                   # điện áp pin, V
+    serial_number: str = "TD_MW_0011"
+    seed: int = 0
+    end: datetime = field(default_factory=lambda: datetime(2025, 1, 31, 23, 50))
+
+def generate_levels(config: TideConfig) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return (times datetime64[s], levels int64 (3, n)) for the config, with
+    gaps already removed.
+    """
+    rng = np.random.default_rng(config.seed)
+    n = int(round(config.days * 24 * 6))
+    start = np.datetime64(config.end, 's') - np.timedelta64(10 * (n - 1), 'm')
+    times = start + np.arange(n) * np.timedelta64(10, 'm')
+    hours = np.arange(n) / 6.0
+
+    level = np.full(n, config.mean_level)
+    for harmonic in config.harmonics:
+        level += harmonic.amplitude * np.sin(2 * np.pi * hours / harmonic.period + harmonic.phase)
+    level += rng.normal(0.0, config.noise, n)
+
+    levels = np.empty((3, n))
+    levels[0] = level
+    for channel, offset in enumerate(config.channel_offset, start=1):
+        levels[channel] = level + offset + rng.normal(0.0, config.channel_noise, n)
+
+    # Nhiễu xung trên cả ba kênh (lỗi cảm biến chung)
+    spikes = rng.random(n) < config.spike_rate
+    levels[:, spikes] += rng.uniform(-config.spike_amplitude, config.spike_amplitude, spikes.sum())
+    # Lỗi chỉ trên một kênh: các kênh không thống nhất
+    faults = np.flatnonzero(rng.random(n) < config.channel_fault_rate)
+    levels[rng.integers(0, 3, len(faults)), faults] += rng.uniform(-config.spike_amplitude, config.spike_amplitude, len(faults))
+
+    keep = rng.random(n) >= config.gap_rate
+    for start_index in rng.integers(0, max(n - config.gap_block_length, 1), config.gap_blocks if n > 0 else 0):
+        keep[start_index:start_index + config.gap_block_length] = False
+    # điểm cuối luôn có, như một trạm đang hoạt động
+    if n:
+        keep[-1] = True
+    return times[keep], np.clip(np.rint(levels[:, keep]), 0, None).astype(np.int64)
+
+def generate_rows(config: TideConfig) -> list[dict]:
+    """
+    Synthetic payload in the format returned by water_level.php.
+    """
+    times, levels = generate_levels(config)
+    created = np.datetime_as_string(times, unit='s')
+    return [
+        {
+            "id": str(100000 + i),
+            "serial_number": config.serial_number,
+            "created_at": created[i].replace("T", " "),
+            "water_lever_0": str(levels[0, i]),
+            "water_lever_1": str(levels[1, i]),
+            "water_lever_2": str(levels[2, i]),
+            "vol": f"{config.vol:.2f}",
+        }
+        for i in range(len(times))
+    ]
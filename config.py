@@ -4,4 +4,59 @@ TELEGRAM_CHAT_ID = "837647567"
 ZALO_TOKEN = "YOUR_ZALO_TOKEN"
 
 # Water level filter configuration
-DElTA = 50
\ No newline at end of file
+DElTA = 50
+
+# Logger configuration
+LOG_LEVEL = "INFO"                      # DEBUG, INFO, WARNING hoặc BUG
+LOG_TAG_LEVELS = {}                     # mức log riêng theo tag, vd {"DataFetcher": "DEBUG"}
+LOG_RATE_LIMITS = {                     # tag: (số dòng DEBUG/INFO tối đa, trong bao nhiêu giây)
+    "DataProcessor": (200, 60.0),
+}
+
+# Local record cache
+CACHE_DIR = "cache"
+
+# Outbound HTTP
+HTTP_CONNECT_TIMEOUT = 5    # giây
+HTTP_READ_TIMEOUT = 30      # giây
+HTTP_RETRIES = 3            # số lần thử lại cho GET
+HTTP_BACKOFF = 1.0          # giây, nhân đôi sau mỗi lần thử lại
+HTTP_POOL_SIZE = 4
+UPDATE_WATER_URL = "https://donuoctrieuduong.xyz/water_level_api/test/update_water.php"
+
+# Số request song song tối đa khi khoảng thời gian trải qua nhiều bảng tháng
+FETCH_WORKERS = 4
+
+# Station registry: serial_number của cảm biến → mã trạm dùng trong điện báo
+STATIONS = [
+    {"serial_number": "TD_MW_0011", "report_code": "74194"},
+]
+DEFAULT_STATION = "TD_MW_0011"
+
+# Phát hiện xu hướng incremental: chỉ nhanh hơn bản full khi lookback dài
+# (~120 ngày); với lookback 4 ngày đọc/ghi state tốn hơn phần tiết kiệm được
+TREND_INCREMENTAL = False
+TREND_STATE_DIR = "state"
+TREND_VERIFY = False     # True: luôn chạy thêm bản full để so sánh
+
+# madien2 report site
+MADIEN_LOGIN_URL = 'http://madien2.kttvdb.vn/content/users/login.asp?ret_page=../../content/code/'
+MADIEN_REPORT_URL = "http://madien2.kttvdb.vn/content/code/"
+MADIEN_USER = 'tvtrieuduong'
+MADIEN_PASS = '91376'
+REPORT_SUBMITTER = "http"   # "http": gửi form bằng requests, selenium chỉ dùng khi lỗi; "selenium": luôn dùng trình duyệt
+
+# Scheduler
+SCHEDULE_CADENCE_MINUTES = 60   # chu kỳ chạy, phải chia hết một ngày
+SCHEDULE_RUN_TIMEOUT = 45 * 60  # giây; run lâu hơn thì lịch vẫn tiếp tục
+SCHEDULE_MAX_CATCH_UP = 3       # số slot bị lỡ tối đa được chạy bù
+SCHEDULE_STATE_FILE = "state/scheduler.json"  # slot đã chạy gần nhất; "" để không lưu
+
+# Metrics của mỗi lần chạy
+METRICS_DIR = "metrics"     # pipeline.prom (Prometheus textfile) và runs.jsonl
+
+# Kho lưu trữ dữ liệu dạng cột theo tháng (np.memmap); "" để tắt
+ARCHIVE_DIR = "archive"
+
+# Sổ đỉnh/đáy đã phát hiện và đã báo cáo (SQLite, thay cho record_data.json)
+EVENTS_DB = "events.sqlite3"
@@ -0,0 +1,241 @@
+import os
+import struct
+import calendar
+import threading
+from datetime import datetime
+import numpy as np
+from config import ARCHIVE_DIR
+from data.data_handler import WaterSeries, _to_seconds
+from logger.logger import LoggerFactory
+
+MAGIC = b"WLARCH01"
+VERSION = 1
+HEADER_SIZE = 4096                      # một page: các cột bắt đầu ở offset căn page
+HEADER = struct.Struct("<8sIQQHH32s")   # magic, version, capacity, count, year, month, serial
+COUNT_OFFSET = 8 + 4 + 8                # vị trí của count trong header
+# (tên cột, dtype); mọi cột rộng 8 byte
+COLUMNS = (
+    ("times", "datetime64[s]"),
+    ("water_level_0", "int64"),
+    ("water_level_1", "int64"),
+    ("water_level_2", "int64"),
+    ("vol", "float64"),
+    ("ids", "int64"),
+)
+ITEM_SIZE = 8
+
+class SeriesArchive:
+    """
+    Append-only columnar archive of WaterSeries, one file per station per
+    month: <root>/<serial>/<YYYY-MM>.wla.
+
+    File layout: a HEADER_SIZE header (magic, version, capacity, count,
+    year, month, serial) followed by one fixed-width column region per entry
+    of COLUMNS, each `capacity` items long. The capacity is one slot per
+    minute of the month, so the file never grows (unused space stays sparse
+    on disk). Reads map the file with np.memmap and return views: a time
+    range inside one month is zero-copy and located by binary search on the
+    times column.
+
+    Appends are crash-safe: the new rows are written after `count` and
+    fsynced, then the 8-byte count in the header is updated and fsynced.
+    Rows past `count` left by a crash are simply overwritten later. Rows
+    older than the last archived time (late data) or with new values for an
+    archived time (corrections) trigger a merge that rewrites the month to a
+    temporary file and replaces it atomically.
+    """
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        self.logger = LoggerFactory()
+        self._lock = threading.Lock()
+
+    # ---- writing ----------------------------------------------------------
+    def append(self, series: WaterSeries, serial_number: str | None = None) -> int:
+        """
+        Archive the rows of a series (any order, may span months).
+        A row whose timestamp is already archived replaces the archived row
+        if any value differs (corrected on the server), otherwise it is
+        skipped. Returns the number of rows added (replacements not counted).
+        """
+        serial_number = serial_number or series.serial_number
+        if not len(series):
+            return 0
+        if not serial_number:
+            raise ValueError("serial_number is required to archive a series")
+        order = np.argsort(series.times, kind="stable")
+        series = series[order]
+        # bỏ các dòng trùng thời điểm trong chính lô mới (giữ dòng sau cùng)
+        last_of_time = np.append(series.times[1:] != series.times[:-1], True)
+        series = series[last_of_time]
+        months = series.times.astype("datetime64[M]")
+        added = 0
+        with self._lock:
+            for month in np.unique(months):
+                part = series[months == month]
+                year, month_number = int(str(month)[:4]), int(str(month)[5:7])
+                added += self._append_month(serial_number, year, month_number, part)
+        if added:
+            self.logger.add_log("INFO", f"Archive {serial_number}: appended {added} rows", tag="SeriesArchive")
+        return added
+
+    def _append_month(self, serial_number: str, year: int, month: int, part: WaterSeries) -> int:
+        path = self._path(serial_number, year, month)
+        if not os.path.exists(path):
+            self._create(path, serial_number, year, month)
+        header = _read_header(path)
+        columns = _open_columns(path, header, mode="r")
+        archived = columns["times"][:header["count"]]
+        last = archived[-1] if header["count"] else None
+        known = np.isin(part.times, archived) if header["count"] else np.zeros(len(part), dtype=bool)
+        corrected = np.zeros(len(part), dtype=bool)
+        if known.any():
+            # cùng thời điểm nhưng giá trị khác (server sửa dữ liệu): thay dòng cũ
+            stored = _as_series(columns, header["count"], serial_number)[np.searchsorted(archived, part.times[known])]
+            corrected[known] = _rows_differ(stored, part[known])
+        fresh = part[~known]
+        if not len(fresh) and not corrected.any():
+            return 0
+        if corrected.any() or (last is not None and fresh.times[0] <= last):
+            # dữ liệu đến muộn hoặc được sửa: gộp và ghi lại cả tháng
+            old = _as_series(columns, header["count"], serial_number)
+            old = old[~np.isin(old.times, part.times[corrected])]
+            merged = WaterSeries.concat([old, fresh, part[corrected]])
+            del columns, archived, old
+            merged = merged[np.argsort(merged.times, kind="stable")]
+            self._rewrite(path, serial_number, year, month, merged)
+            self.logger.add_log("WARNING", f"Archive {serial_number} {year}-{month:02d}: merged {len(fresh)} late rows, "
+                                           f"replaced {int(corrected.sum())} corrected rows", tag="SeriesArchive")
+            return len(fresh)
+        del columns, archived
+        count = header["count"]
+        if count + len(fresh) > header["capacity"]:
+            raise ValueError(f"Archive {path} is full ({header['capacity']} rows)")
+        with open(path, "r+b") as f:
+            for k, (name, dtype) in enumerate(COLUMNS):
+                f.seek(HEADER_SIZE + (k * header["capacity"] + count) * ITEM_SIZE)
+                f.write(np.ascontiguousarray(getattr(fresh, name), dtype=dtype).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            # commit: chỉ sau khi dữ liệu đã xuống đĩa mới tăng count
+            f.seek(COUNT_OFFSET)
+            f.write(struct.pack("<Q", count + len(fresh)))
+            f.flush()
+            os.fsync(f.fileno())
+        return len(fresh)
+
+    def _create(self, path: str, serial_number: str, year: int, month: int, series: WaterSeries | None = None):
+        """
+        Write a complete month file to a temporary path and move it in place.
+        """
+        capacity = calendar.monthrange(year, month)[1] * 24 * 60
+        count = len(series) if series is not None else 0
+        if count > capacity:
+            raise ValueError(f"{count} rows do not fit a month archive ({capacity})")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, capacity, count, year, month, serial_number.encode()[:32]).ljust(HEADER_SIZE, b"\0"))
+            f.truncate(HEADER_SIZE + len(COLUMNS) * capacity * ITEM_SIZE)
+            if series is not None:
+                for k, (name, dtype) in enumerate(COLUMNS):
+                    f.seek(HEADER_SIZE + k * capacity * ITEM_SIZE)
+                    f.write(np.ascontiguousarray(getattr(series, name), dtype=dtype).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _rewrite(self, path, serial_number, year, month, series: WaterSeries):
+        self._create(path, serial_number, year, month, series)
+
+    # ---- reading ----------------------------------------------------------
+    def read(self, serial_number: str, begin: datetime, end: datetime) -> WaterSeries:
+        """
+        Rows with begin <= time <= end. Within one month the columns are
+        views of the memory-mapped file (no copy); across months they are
+        concatenated.
+        """
+        lo_time, hi_time = _to_seconds(begin, ceil=True), _to_seconds(end)
+        parts = []
+        for year, month in self.months(serial_number):
+            month_start = np.datetime64(f"{year:04d}-{month:02d}", "M").astype("datetime64[s]")
+            month_end = (np.datetime64(f"{year:04d}-{month:02d}", "M") + 1).astype("datetime64[s]")
+            if month_end <= lo_time or month_start > hi_time:
+                continue
+            path = self._path(serial_number, year, month)
+            header = _read_header(path)
+            if not header["count"]:
+                continue
+            columns = _open_columns(path, header, mode="r")
+            times = columns["times"][:header["count"]]
+            lo = int(np.searchsorted(times, lo_time, side="left"))
+            hi = int(np.searchsorted(times, hi_time, side="right"))
+            if hi > lo:
+                parts.append(_as_series(columns, header["count"], serial_number)[lo:hi])
+        if len(parts) == 1:
+            return parts[0]
+        result = WaterSeries.concat(parts)
+        if not len(result):
+            return WaterSeries.empty(serial_number)
+        return result
+
+    def last_time(self, serial_number: str) -> datetime | None:
+        for year, month in reversed(self.months(serial_number)):
+            header = _read_header(self._path(serial_number, year, month))
+            if header["count"]:
+                columns = _open_columns(self._path(serial_number, year, month), header, mode="r")
+                return columns["times"][header["count"] - 1].astype(datetime)
+        return None
+
+    def months(self, serial_number: str) -> list[tuple[int, int]]:
+        directory = os.path.join(self.root, serial_number)
+        if not os.path.isdir(directory):
+            return []
+        months = []
+        for name in os.listdir(directory):
+            if name.endswith(".wla") and len(name) == len("YYYY-MM.wla"):
+                months.append((int(name[:4]), int(name[5:7])))
+        return sorted(months)
+
+    def _path(self, serial_number: str, year: int, month: int) -> str:
+        return os.path.join(self.root, serial_number, f"{year:04d}-{month:02d}.wla")
+
+def _read_header(path: str) -> dict:
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    magic, version, capacity, count, year, month, serial = HEADER.unpack(raw)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} series archive")
+    return {"capacity": capacity, "count": count, "year": year, "month": month,
+            "serial_number": serial.rstrip(b"\0").decode()}
+
+def _open_columns(path: str, header: dict, mode: str = "r") -> dict[str, np.ndarray]:
+    """
+    Map the column regions once and return a typed view per column.
+    """
+    block = np.memmap(path, dtype=np.int64, mode=mode, offset=HEADER_SIZE, shape=(len(COLUMNS), header["capacity"]))
+    return {name: block[k].view(dtype) for k, (name, dtype) in enumerate(COLUMNS)}
+
+def _rows_differ(old: WaterSeries, new: WaterSeries) -> np.ndarray:
+    """
+    Per row: does any archived column differ? (NaN vol counts as equal)
+    """
+    differ = np.zeros(len(old), dtype=bool)
+    for name, dtype in COLUMNS:
+        a = np.asarray(getattr(old, name), dtype=dtype)
+        b = np.asarray(getattr(new, name), dtype=dtype)
+        changed = a != b
+        if name == "vol":
+            changed &= ~(np.isnan(a) & np.isnan(b))
+        differ |= changed
+    return differ
+
+def _as_series(columns: dict[str, np.ndarray], count: int, serial_number: str) -> WaterSeries:
+    return WaterSeries(
+        ids=columns["ids"][:count],
+        serial_number=serial_number,
+        times=columns["times"][:count],
+        water_level_0=columns["water_level_0"][:count],
+        water_level_1=columns["water_level_1"][:count],
+        water_level_2=columns["water_level_2"][:count],
+        vol=columns["vol"][:count],
+    )
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Iterable
 from logger.logger import LoggerFactory
+import numpy as np
 
 @dataclass
 class WaterRecord:
@@ -12,40 +14,379 @@ class WaterRecord:
     water_level_2: int
     vol: float
 
+class TimeIndex:
+    """
+    Sorted datetime64 index over a time-ordered series of records.
+    Window and nearest-time lookups are binary searches instead of scans.
+    """
+    def __init__(self, times):
+        self.times = np.asarray(times, dtype='datetime64[s]')
+
+    @classmethod
+    def from_records(cls, records: list[WaterRecord]) -> "TimeIndex":
+        return cls(np.array([r.date_time for r in records], dtype='datetime64[s]'))
+
+    def __len__(self):
+        return len(self.times)
+
+    def window(self, start: datetime, end: datetime) -> slice:
+        """
+        Return the slice of positions with start <= time <= end.
+        """
+        lo = np.searchsorted(self.times, _to_seconds(start, ceil=True), side="left")
+        hi = np.searchsorted(self.times, _to_seconds(end), side="right")
+        return slice(int(lo), int(hi))
+
+    def windows(self, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized window(): bounds (lo, hi) for many [start, end] ranges at once.
+        starts/ends are datetime64[s] arrays.
+        """
+        lo = np.searchsorted(self.times, np.asarray(starts, dtype='datetime64[s]'), side="left")
+        hi = np.searchsorted(self.times, np.asarray(ends, dtype='datetime64[s]'), side="right")
+        return lo, hi
+
+    def first_at_or_after(self, start: datetime) -> int:
+        """
+        Return the first position with time >= start (len(self) if none).
+        """
+        return int(np.searchsorted(self.times, _to_seconds(start, ceil=True), side="left"))
+
+    def closest(self, when: datetime) -> int:
+        """
+        Return the position closest in time to `when`; ties go to the earlier one.
+        """
+        if len(self.times) == 0:
+            raise ValueError("closest() on an empty TimeIndex")
+        target = np.datetime64(when, 'us')
+        # mọi phần tử <= when nằm trước pos, phần tử > when bắt đầu từ pos
+        pos = int(np.searchsorted(self.times, _to_seconds(when), side="right"))
+        if pos == len(self.times):
+            pos -= 1
+        elif pos > 0 and abs(target - self.times[pos - 1]) <= abs(self.times[pos] - target):
+            pos -= 1
+        # Lấy vị trí đầu tiên nếu có nhiều bản ghi trùng thời gian
+        return int(np.searchsorted(self.times, self.times[pos], side="left"))
+
+def _to_seconds(when, ceil: bool = False) -> np.datetime64:
+    """
+    Convert to datetime64[s] so searchsorted does not cast the whole index
+    to a finer unit; sub-second parts are floored (or ceiled).
+    """
+    value = np.datetime64(when)
+    seconds = value.astype('datetime64[s]')
+    if ceil and seconds < value:
+        seconds += np.timedelta64(1, 's')
+    return seconds
+
+LEVEL_CHANNELS = ('water_level_0', 'water_level_1', 'water_level_2')
+
+class WaterSeries:
+    """
+    Columnar (struct-of-arrays) form of a time-ordered list of WaterRecord.
+    Every field is a contiguous numpy array; slicing returns views and
+    boolean/integer masks return compact copies, so pipeline stages work on
+    arrays directly. WaterRecord objects are only built on demand (indexing
+    with an int, or to_records()).
+    """
+    def __init__(self, ids, serial_number: str, times, water_level_0, water_level_1, water_level_2, vol):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.serial_number = serial_number
+        self.times = np.asarray(times, dtype='datetime64[s]')
+        self.water_level_0 = np.asarray(water_level_0, dtype=np.int64)
+        self.water_level_1 = np.asarray(water_level_1, dtype=np.int64)
+        self.water_level_2 = np.asarray(water_level_2, dtype=np.int64)
+        self.vol = np.asarray(vol, dtype=np.float64)
+        self._time_index = None
+
+    @classmethod
+    def empty(cls, serial_number: str = "") -> "WaterSeries":
+        return cls([], serial_number, [], [], [], [], [])
+
+    @classmethod
+    def from_records(cls, records: list[WaterRecord]) -> "WaterSeries":
+        return cls(
+            ids=[r.id for r in records],
+            serial_number=records[0].serial_number if records else "",
+            times=np.array([r.date_time for r in records], dtype='datetime64[s]'),
+            water_level_0=[r.water_level_0 for r in records],
+            water_level_1=[r.water_level_1 for r in records],
+            water_level_2=[r.water_level_2 for r in records],
+            vol=[r.vol for r in records],
+        )
+
+    @classmethod
+    def concat(cls, parts: list["WaterSeries"]) -> "WaterSeries":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        return cls(
+            ids=np.concatenate([p.ids for p in parts]),
+            serial_number=parts[0].serial_number,
+            times=np.concatenate([p.times for p in parts]),
+            water_level_0=np.concatenate([p.water_level_0 for p in parts]),
+            water_level_1=np.concatenate([p.water_level_1 for p in parts]),
+            water_level_2=np.concatenate([p.water_level_2 for p in parts]),
+            vol=np.concatenate([p.vol for p in parts]),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        """
+        series[i] → WaterRecord; series[slice | mask | index array] → WaterSeries.
+        """
+        if isinstance(key, (int, np.integer)):
+            return self.record(int(key))
+        return WaterSeries(
+            ids=self.ids[key],
+            serial_number=self.serial_number,
+            times=self.times[key],
+            water_level_0=self.water_level_0[key],
+            water_level_1=self.water_level_1[key],
+            water_level_2=self.water_level_2[key],
+            vol=self.vol[key],
+        )
+
+    def __repr__(self):
+        if not len(self):
+            return f"WaterSeries(serial_number={self.serial_number!r}, n=0)"
+        return (f"WaterSeries(serial_number={self.serial_number!r}, n={len(self)}, "
+                f"from={self.times[0]}, to={self.times[-1]})")
+
+    def channel(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+    def levels(self) -> np.ndarray:
+        """
+        Return the three water_level_* channels stacked as a (3, n) array.
+        """
+        return np.vstack([self.water_level_0, self.water_level_1, self.water_level_2])
+
+    def date_time(self, i: int) -> datetime:
+        return self.times[i].item()
+
+    def record(self, i: int) -> WaterRecord:
+        return WaterRecord(
+            id=int(self.ids[i]),
+            serial_number=self.serial_number,
+            date_time=self.times[i].item(),
+            water_level_0=int(self.water_level_0[i]),
+            water_level_1=int(self.water_level_1[i]),
+            water_level_2=int(self.water_level_2[i]),
+            vol=float(self.vol[i]),
+        )
+
+    def to_records(self) -> list[WaterRecord]:
+        return [self.record(i) for i in range(len(self))]
+
+    @property
+    def time_index(self) -> "TimeIndex":
+        if self._time_index is None:
+            self._time_index = TimeIndex(self.times)
+        return self._time_index
+
+def as_series(records) -> WaterSeries:
+    """
+    Accept either a WaterSeries or a list[WaterRecord] and return a WaterSeries.
+    """
+    if isinstance(records, WaterSeries):
+        return records
+    return WaterSeries.from_records(list(records))
+
+SERIES_COLUMNS = (
+    ("ids", np.int64),
+    ("times", "datetime64[s]"),
+    ("water_level_0", np.int64),
+    ("water_level_1", np.int64),
+    ("water_level_2", np.int64),
+    ("vol", np.float64),
+)
+
+class SeriesBuilder:
+    """
+    Growable typed column buffers a WaterSeries is assembled into, part by
+    part. The capacity doubles when full (amortised O(1) per row); build()
+    returns views of the filled part, no final concatenation.
+    """
+    def __init__(self, serial_number: str = "", capacity: int = 4096):
+        self.serial_number = serial_number
+        self.size = 0
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in SERIES_COLUMNS}
+
+    def __len__(self):
+        return self.size
+
+    def append(self, part: WaterSeries):
+        n = len(part)
+        if not n:
+            return
+        if not self.serial_number:
+            self.serial_number = part.serial_number
+        needed = self.size + n
+        capacity = len(self.columns["ids"])
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity)
+            for name, dtype in SERIES_COLUMNS:
+                grown = np.empty(capacity, dtype=dtype)
+                grown[:self.size] = self.columns[name][:self.size]
+                self.columns[name] = grown
+        for name, _ in SERIES_COLUMNS:
+            self.columns[name][self.size:needed] = getattr(part, name)
+        self.size = needed
+
+    def build(self) -> WaterSeries:
+        return WaterSeries(serial_number=self.serial_number,
+                           **{name: self.columns[name][:self.size] for name, _ in SERIES_COLUMNS})
+
+STREAM_BATCH_ROWS = 4096
+
 class DataProcessor:
     def __init__(self):
         self.logger = LoggerFactory()
-        self.buffer: list[WaterRecord] = []
+        self.buffer: WaterSeries = WaterSeries.empty()
     def clear(self):
         """
-        Clear the buffer of WaterRecord instances.
+        Clear the buffered WaterSeries.
         """
-        self.buffer.clear()
+        self.buffer = WaterSeries.empty()
         self.logger.add_log("INFO", "Buffer cleared", tag="DataProcessor")
-    def process(self, data):
+    def process(self, data) -> WaterSeries:
         """
-        Convert list of JSON dicts into WaterRecord instances, buffer them,
-        and log each step.
+        Convert list of JSON dicts into a columnar WaterSeries and append it
+        to the buffer.
+
+        The key schema (water_lever_* / water_level_*) is detected once per
+        payload and every column is parsed in bulk. If the bulk parse fails
+        (missing keys, bad timestamps, ...) the payload is parsed row by row
+        and the malformed rows are reported as one index list.
         """
         if not isinstance(data, list):
             self.logger.add_log("WARNING", "Input data is not a list", tag="DataProcessor")
-            return []
+            return WaterSeries.empty()
+
+        try:
+            parsed = _parse_bulk(data)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            self.logger.add_log("WARNING", f"Bulk parse failed ({type(e).__name__}: {e}), parsing row by row", tag="DataProcessor")
+            parsed, malformed = _parse_rows(data)
+            if malformed:
+                self.logger.add_log("BUG", f"Failed to parse {len(malformed)}/{len(data)} records, indices: {malformed}", tag="DataProcessor")
+        self.logger.add_log("DEBUG", "Parsed %d records: %s", len(parsed), parsed, tag="DataProcessor")
+        self.buffer = WaterSeries.concat([self.buffer, parsed])
+        self.logger.add_log("INFO", f"Total records buffered: {len(self.buffer)}", tag="DataProcessor")
+        return self.buffer
+
+    def process_stream(self, rows: Iterable[dict], batch_rows: int = STREAM_BATCH_ROWS) -> WaterSeries:
+        """
+        Same result as process(list(rows)) without holding every row as a
+        dict: rows are consumed in batches of `batch_rows`, each batch is
+        parsed in bulk (row by row if that fails, see process) and appended
+        to a SeriesBuilder. Meant for an iterator such as
+        network.json_stream.iter_json_array over an HTTP response.
+        """
+        builder = SeriesBuilder()
+        malformed: list[int] = []
+        fallbacks = 0
+        batch: list = []
+        offset = 0
 
-        for index, item in enumerate(data):
+        def flush():
+            nonlocal fallbacks
             try:
-                record = WaterRecord(
-                    id=int(item.get("id", 0)),
-                    serial_number=item.get("serial_number", ""),
-                    date_time=datetime.strptime(item.get("created_at", ""), "%Y-%m-%d %H:%M:%S"),
-                    water_level_0=int(item.get("water_lever_0", item.get("water_level_0", 0))),
-                    water_level_1=int(item.get("water_lever_1", item.get("water_level_1", 0))),
-                    water_level_2=int(item.get("water_lever_2", item.get("water_level_2", 0))),
-                    vol=float(item.get("vol", 0))
-                )
-                self.buffer.append(record)
-                self.logger.add_log("INFO", f"Buffered record[{index}]: {record}", tag="DataProcessor")
-            except Exception as e:
-                self.logger.add_log("BUG", f"Failed to parse record[{index}]: {e}", tag="DataProcessor")
+                parsed = _parse_bulk(batch)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                fallbacks += 1
+                parsed, bad = _parse_rows(batch)
+                malformed.extend(offset + index for index in bad)
+            builder.append(parsed)
 
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                flush()
+                offset += len(batch)
+                batch = []
+        if batch:
+            flush()
+            offset += len(batch)
+
+        if fallbacks:
+            self.logger.add_log("WARNING", f"Bulk parse failed for {fallbacks} batch(es), parsed them row by row", tag="DataProcessor")
+        if malformed:
+            self.logger.add_log("BUG", f"Failed to parse {len(malformed)}/{offset} records, indices: {malformed}", tag="DataProcessor")
+        parsed = builder.build()
+        self.logger.add_log("DEBUG", "Parsed %d records: %s", len(parsed), parsed, tag="DataProcessor")
+        self.buffer = WaterSeries.concat([self.buffer, parsed]) if len(self.buffer) else parsed
         self.logger.add_log("INFO", f"Total records buffered: {len(self.buffer)}", tag="DataProcessor")
-        return self.buffer
\ No newline at end of file
+        return self.buffer
+
+TIME_LENGTH = len("YYYY-mm-dd HH:MM:SS")
+
+def _level_keys(item: dict) -> list[str]:
+    """
+    API cũ trả về water_lever_*, API mới trả về water_level_*.
+    """
+    return [f"water_lever_{i}" if f"water_lever_{i}" in item else f"water_level_{i}" for i in range(3)]
+
+def _parse_bulk(data: list[dict]) -> WaterSeries:
+    """
+    Parse a homogeneous payload column by column. Raises on the first
+    row that does not match the schema of data[0].
+    """
+    n = len(data)
+    if not n:
+        return WaterSeries.empty()
+    key_0, key_1, key_2 = _level_keys(data[0])
+    created = [item["created_at"] for item in data]
+    # numpy cũng nhận "YYYY-mm-dd" hay "...THH:MM"; strptime thì không
+    if any(len(text) != TIME_LENGTH for text in created):
+        raise ValueError("created_at not in '%Y-%m-%d %H:%M:%S' format")
+    times = np.array(created, dtype='datetime64[s]')
+    if np.isnat(times).any():
+        raise ValueError("empty created_at")
+    return WaterSeries(
+        ids=np.fromiter((item["id"] for item in data), dtype=np.int64, count=n),
+        serial_number=data[0].get("serial_number", ""),
+        times=times,
+        water_level_0=np.fromiter((item[key_0] for item in data), dtype=np.int64, count=n),
+        water_level_1=np.fromiter((item[key_1] for item in data), dtype=np.int64, count=n),
+        water_level_2=np.fromiter((item[key_2] for item in data), dtype=np.int64, count=n),
+        vol=np.fromiter((item["vol"] for item in data), dtype=np.float64, count=n),
+    )
+
+def _parse_rows(data: list) -> tuple[WaterSeries, list[int]]:
+    """
+    Row by row parse (tolerant: missing fields default to 0). Returns the
+    parsed series and the indices of the rows that could not be parsed.
+    """
+    ids, serials, times, level_0, level_1, level_2, vols = [], [], [], [], [], [], []
+    malformed = []
+    for index, item in enumerate(data):
+        try:
+            row = (
+                int(item.get("id", 0)),
+                item.get("serial_number", ""),
+                datetime.strptime(item.get("created_at", ""), "%Y-%m-%d %H:%M:%S"),
+                int(item.get("water_lever_0", item.get("water_level_0", 0))),
+                int(item.get("water_lever_1", item.get("water_level_1", 0))),
+                int(item.get("water_lever_2", item.get("water_level_2", 0))),
+                float(item.get("vol", 0)),
+            )
+        except Exception:
+            malformed.append(index)
+            continue
+        for column, value in zip((ids, serials, times, level_0, level_1, level_2, vols), row):
+            column.append(value)
+
+    parsed = WaterSeries(
+        ids=ids,
+        serial_number=serials[0] if serials else "",
+        times=np.array(times, dtype='datetime64[s]'),
+        water_level_0=level_0,
+        water_level_1=level_1,
+        water_level_2=level_2,
+        vol=vols,
+    )
+    return parsed, malformed
@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import argparse
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Tuple
+from config import EVENTS_DB
+from data.data_handler import WaterRecord
+from logger.logger import LoggerFactory
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+KINDS = ("peak", "trough")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    station      TEXT    NOT NULL,
+    event_time   TEXT    NOT NULL,          -- 'YYYY-mm-dd HH:MM:SS', sắp xếp được như chuỗi
+    kind         TEXT    NOT NULL CHECK (kind IN ('peak', 'trough')),
+    record_id    INTEGER,
+    water_level  INTEGER NOT NULL,
+    first_seen   TEXT    NOT NULL,
+    reported_at  TEXT,                      -- NULL: đã thấy nhưng chưa đưa vào điện báo
+    PRIMARY KEY (station, event_time, kind)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_reported ON events (station, reported_at);
+"""
+
+@dataclass(frozen=True)
+class LedgerEvent:
+    station: str
+    event_time: datetime
+    kind: str
+    record_id: int | None
+    water_level: int
+    first_seen: datetime
+    reported_at: datetime | None
+
+class EventLedger:
+    """
+    History of detected peaks/troughs in SQLite (WAL mode), keyed by
+    (station, event_time, kind) instead of raw record ids, which collide
+    across the monthly tables.
+
+    The primary key is a B-tree on (station, event_time, kind): "already
+    seen?" lookups and "events since T" range scans are O(log n) however
+    many years are stored; events_reported serves "reported since T".
+    Writes are batched in one transaction; WAL lets readers (the CLI) run
+    while the pipeline writes, and a crash never leaves a half-written file.
+    """
+    def __init__(self, path: str = EVENTS_DB):
+        self.path = path
+        self.logger = LoggerFactory()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # một connection cho mỗi thread (sqlite3 không chia sẻ connection giữa các thread)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- write ------------------------------------------------------------
+    def clear(self, station: str | None = None) -> int:
+        """
+        Delete the events of one station, or of every station.
+        """
+        conn = self._connect()
+        with conn:
+            if station is None:
+                return conn.execute("DELETE FROM events").rowcount
+            return conn.execute("DELETE FROM events WHERE station = ?", (station,)).rowcount
+
+    def record(self, station: str, events: Iterable[Tuple[WaterRecord, str]], seen_at: datetime,
+               reported: Iterable[Tuple[WaterRecord, str]] = ()) -> int:
+        """
+        Upsert a batch of events seen at `seen_at`; those also in `reported`
+        get reported_at = seen_at (kept if already set). Returns the batch size.
+        """
+        reported_keys = {(rec.date_time, kind) for rec, kind in reported}
+        seen = seen_at.strftime(TIME_FORMAT)
+        rows = [
+            (station, rec.date_time.strftime(TIME_FORMAT), kind, rec.id, rec.water_level_0, seen,
+             seen if (rec.date_time, kind) in reported_keys else None)
+            for rec, kind in events
+        ]
+        if not rows:
+            return 0
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO events (station, event_time, kind, record_id, water_level, first_seen, reported_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (station, event_time, kind) DO UPDATE SET
+                    record_id = excluded.record_id,
+                    water_level = excluded.water_level,
+                    reported_at = COALESCE(events.reported_at, excluded.reported_at)
+                """,
+                rows,
+            )
+        return len(rows)
+
+    # ---- read -------------------------------------------------------------
+    def known(self, station: str, events: Iterable[Tuple[WaterRecord, str]]) -> set[Tuple[datetime, str]]:
+        """
+        Keys (event_time, kind) of the given events already in the ledger.
+        One primary-key range scan over the span of the batch.
+        """
+        events = list(events)
+        if not events:
+            return set()
+        times = [rec.date_time for rec, _ in events]
+        wanted = {(rec.date_time.strftime(TIME_FORMAT), kind) for rec, kind in events}
+        rows = self._connect().execute(
+            "SELECT event_time, kind FROM events WHERE station = ? AND event_time BETWEEN ? AND ?",
+            (station, min(times).strftime(TIME_FORMAT), max(times).strftime(TIME_FORMAT)),
+        ).fetchall()
+        return {(datetime.strptime(t, TIME_FORMAT), kind) for t, kind in rows if (t, kind) in wanted}
+
+    def events(self, station: str | None = None, begin: datetime | None = None, end: datetime | None = None,
+               kind: str | None = None, reported_only: bool = False, limit: int | None = None) -> List[LedgerEvent]:
+        """
+        Events with begin <= event_time <= end (either bound optional),
+        ordered by station and time.
+        """
+        clauses, params = [], []
+        if station is not None:
+            clauses.append("station = ?")
+            params.append(station)
+        if begin is not None:
+            clauses.append("event_time >= ?")
+            params.append(begin.strftime(TIME_FORMAT))
+        if end is not None:
+            clauses.append("event_time <= ?")
+            params.append(end.strftime(TIME_FORMAT))
+        if kind is not None:
+            if kind not in KINDS:
+                raise ValueError(f"kind must be one of {KINDS}")
+            clauses.append("kind = ?")
+            params.append(kind)
+        if reported_only:
+            clauses.append("reported_at IS NOT NULL")
+        sql = "SELECT station, event_time, kind, record_id, water_level, first_seen, reported_at FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY station, event_time, kind"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [
+            LedgerEvent(station_, _parse(event_time), kind_, record_id, water_level, _parse(first_seen),
+                        _parse(reported_at) if reported_at else None)
+            for station_, event_time, kind_, record_id, water_level, first_seen, reported_at
+            in self._connect().execute(sql, params)
+        ]
+
+def _parse(text: str) -> datetime:
+    return datetime.strptime(text, TIME_FORMAT)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List peaks/troughs stored in the event ledger.")
+    parser.add_argument("--db", default=EVENTS_DB)
+    parser.add_argument("--station")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="e.g. 2025-01-01 or 2025-01-01T07:00")
+    parser.add_argument("--until", type=datetime.fromisoformat)
+    parser.add_argument("--kind", choices=KINDS)
+    parser.add_argument("--reported", action="store_true", help="only events that went into a report")
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    events = EventLedger(args.db).events(args.station, args.since, args.until, args.kind, args.reported, args.limit)
+    for event in events:
+        reported = event.reported_at.strftime("%Y-%m-%d %H:%M") if event.reported_at else "-"
+        print(f"{event.station}  {event.event_time:%Y-%m-%d %H:%M}  {event.kind:<6}  {event.water_level:>5}  "
+              f"id={event.record_id}  reported={reported}")
+    print(f"{len(events)} events")
+
+if __name__ == "__main__":
+    main()
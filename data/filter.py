@@ -1,147 +1,206 @@
-from datetime import datetime,timedelta
-from scipy.signal import savgol_filter
 from logger.logger import LoggerFactory
-from data.data_handler import WaterRecord
+from data.data_handler import WaterRecord, WaterSeries, LEVEL_CHANNELS, as_series
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from config import DElTA
-from statistics import median
 WINDOW = 7
 THRESH = 300
 MAX_WATER_LEVEL = 9000  # Maximum water level to consider
+MISSING_VALUE = -9999
+
+def rolling_median_keep_mask(values: np.ndarray, window: int = WINDOW, thresh: int = THRESH) -> np.ndarray:
+    """
+    Vectorized rolling-median spike test over one or more channels.
+
+    values: array (n,) hoặc (k, n). Với mỗi index i, so sánh giá trị với median
+    của các điểm lân cận (không tính chính nó):
+      - i < half            → chỉ lấy phải: [i+1, i+window)
+      - i >= n - half       → chỉ lấy trái: [i-window, i)
+      - còn lại             → half điểm bên trái + half điểm bên phải
+    Trả về mask bool cùng shape: True = giữ, False = outlier (|x - median| > thresh).
+    """
+    values = np.asarray(values)
+    single = values.ndim == 1
+    values = np.atleast_2d(values)
+    k, n = values.shape
+    half = window // 2
+    span = 2 * half + 1
+    med = np.full((k, n), np.nan)
+
+    # Trường hợp bình thường → một lần cho toàn bộ mảng
+    if n >= span:
+        win = sliding_window_view(values, span, axis=1)
+        neighbors = np.delete(win, half, axis=2)
+        med[:, half:n - half] = np.median(neighbors, axis=2)
+    # Biên trái/phải: tối đa 2*half điểm, giữ nguyên cách lấy lân cận cũ
+    for i in range(min(half, n)):
+        neighbors = values[:, i + 1:min(n, i + window)]
+        if neighbors.shape[1]:
+            med[:, i] = np.median(neighbors, axis=1)
+    for i in range(max(half, n - half), n):
+        neighbors = values[:, max(0, i - window):i]
+        if neighbors.shape[1]:
+            med[:, i] = np.median(neighbors, axis=1)
+
+    # Không có lân cận (median NaN) → giữ nguyên
+    with np.errstate(invalid='ignore'):
+        keep = ~(np.abs(values - med) > thresh)
+    return keep[0] if single else keep
+
+def validate_chain(levels: np.ndarray, max_delta: np.ndarray, usable: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Chuỗi kiểm tra của fill_lack_value, trả về (accepted, channel):
+      - bản ghi i được so với water_level_0 ĐÃ NHẬN của bản ghi i-1 (sau fallback);
+        kênh đầu tiên (0, 1, 2, chỉ các kênh usable) nằm trong max_delta[i-1]
+        được nhận, channel[i] là kênh đó;
+      - bản ghi sau một bản ghi bị loại (hoặc -9999) được nhận không kiểm tra;
+      - bản ghi có water_level_0 = -9999 luôn bị loại.
+    Trường hợp thường (bản ghi trước nhận bằng kênh 0, kênh 0 của bản ghi này
+    hợp lệ) được tính bằng mask; chỉ các đoạn bất thường chạy vòng lặp, từ
+    điểm bất thường tới khi chuỗi trở lại trường hợp thường.
+    """
+    n = levels.shape[1]
+    sentinel = levels[0] == MISSING_VALUE
+    normal = ~sentinel
+    normal[1:] &= (np.abs(np.diff(levels[0])) <= max_delta) & usable[0, 1:]
+    accepted = normal.copy()
+    channel = np.zeros(n, dtype=np.intp)
+
+    irregular = np.flatnonzero(~normal)
+    k = 0
+    while k < len(irregular):
+        i = int(irregular[k])
+        while i < n:
+            if i == 0 or not accepted[i - 1]:
+                accepted[i], channel[i] = not sentinel[i], 0
+            else:
+                reference = levels[channel[i - 1], i - 1]
+                close = (np.abs(levels[:, i] - reference) <= max_delta[i - 1]) & usable[:, i]
+                channel[i] = int(np.argmax(close)) if close.any() else 0
+                accepted[i] = bool(close.any()) and not sentinel[i]
+            # trở lại trường hợp thường: các bản ghi sau đã đúng theo mask
+            if accepted[i] and channel[i] == 0 and (i + 1 >= n or normal[i + 1]):
+                break
+            i += 1
+        k = int(np.searchsorted(irregular, i + 1))
+    return accepted, channel
+
 class FilterWaterLevel:
     def __init__(self):
         self.delta = DElTA
         self.logger = LoggerFactory()
     
 
-    def detect_outlier_by_median(self, records: list[WaterRecord]) -> list[WaterRecord]:
-        window=WINDOW
-        thresh=THRESH
-        cleaned = []
-        half = window // 2
-        water_before = [r.water_level_0 for r in records]
-        self.logger.add_log("INFO",f"Before detect outlines by median data: {water_before}")
-        #pdb.set_trace()  # Debugging breakpoint
-        for i in range(len(records)):
-            neighbors = []
-            # Trường hợp đầu tiên → lấy phải và không lấy trái
-            if i < half:
-                #self.logger.add_log("INFO", f"Processing left border, index: {i}", tag="FilterWaterLevel")
-                right = min(len(records), i + window)
-                neighbors = records[i+1:right]
-            # Trường hợp cuối cùng → lấy trái và không lấy phải
-            elif i >= len(records) - half:
-                #self.logger.add_log("INFO", f"Processing right border, index: {i}", tag="FilterWaterLevel")
-                left = max(0, i - window)
-                neighbors = records[left:i]
-            # Trường hợp bình thường → lấy trái và phải
-            else:
-                #self.logger.add_log("INFO", f"Processing middle, index: {i}", tag="FilterWaterLevel")
-                left = i - half
-                right = i + half + 1
-                neighbors = records[left:i] + records[i+1:right]
-
-            if not neighbors:
-                self.logger.add_log("BUG", f"No neighbors found for index {i}, keeping original record", tag="FilterWaterLevel")
-                cleaned.append(records[i])  # không có gì để so, giữ nguyên
-                continue
-            
-            list_median = [getattr(it, 'water_level_0') for it in neighbors]
-            med = median( list_median)
-            if abs( getattr(records[i],'water_level_0') - med) > thresh:
-                self.logger.add_log("WARNING", f"Outlier detected at index {i}, value: {getattr(records[i],'water_level_0')}, median: {med}", tag="FilterWaterLevel")
-                #cleaned.append(None)  # hoặc giá trị thay thế
-            else:
-                #self.logger.add_log("INFO", f"Added at index {i} is within threshold, value: {getattr(records[i],'water_level_0')}, median: {med}", tag="FilterWaterLevel")
-                cleaned.append(records[i])
-        water_after = [r.water_level_0 for r in cleaned]
-        self.logger.add_log("INFO",f"After detect outlines by median data: {water_after}")
-        self.logger.add_log("INFO", f"Data after fill, total records: {len(cleaned)}", tag="FilterWaterLevel")
-        return cleaned
+    def detect_outlier_by_median(self, records: WaterSeries | list[WaterRecord]) -> np.ndarray:
+        """
+        Flag spikes on all three water_level_* channels in one call.
+        Returns a boolean keep-mask of shape (3, n), one row per channel in
+        LEVEL_CHANNELS order; apply row 0 with series[mask[0]] to drop the
+        outliers of the primary channel.
+        """
+        series = as_series(records)
+        keep = rolling_median_keep_mask(series.levels(), window=WINDOW, thresh=THRESH)
+        outliers = np.flatnonzero(~keep[0])
+        if outliers.size:
+            self.logger.add_log("WARNING", f"Outliers detected at index {outliers.tolist()}, values: {series.water_level_0[outliers].tolist()}", tag="FilterWaterLevel")
+        self.logger.add_log(
+            "INFO",
+            f"Outliers per channel: {dict(zip(LEVEL_CHANNELS, (~keep).sum(axis=1).tolist()))}, "
+            f"records kept: {int(keep[0].sum())}/{len(series)}",
+            tag="FilterWaterLevel"
+        )
+        return keep
     
-    def fill_lack_value(self, records: list[WaterRecord]) -> list[WaterRecord]:
+    def fill_lack_value(self, records: WaterSeries | list[WaterRecord], keep_mask: np.ndarray | None = None) -> WaterSeries:
         """
-        Detect and fill missing 10-minute intervals in a list of WaterRecord.
+        Detect and fill missing 10-minute intervals in a WaterSeries.
         Validate water levels against delta and interpolate missing entries.
+
+        - Gaps are computed from full timestamps (np.diff), so gaps longer than
+          an hour are counted correctly.
+        - A record is valid when one of its channels (water_level_0, then _1,
+          then _2) is within delta * steps of the water_level_0 accepted for
+          the previous record (after its own fallback); the first matching
+          channel replaces water_level_0 (sensor fallback), see validate_chain.
+          A record following a rejected one is accepted.
+        - keep_mask: optional (3, n) mask from detect_outlier_by_median;
+          channels flagged as outliers are not used for the fallback.
+        - Rejected records and records already at -9999 are dropped, and every
+          missing slot of the 10-minute grid between the remaining records is
+          filled by linear interpolation (np.interp) of levels and vol.
         """
-        
-        #pdb.set_trace()  # Debugging breakpoint
-        if not records:
+        series = as_series(records)
+        if not len(series):
             print("No records to filter")
             self.logger.add_log("WARNING", "No records to filter", tag="FilterWaterLevel")
-            return []
+            return WaterSeries.empty()
         # Ensure sorted
-        
-        new_records = sorted(records, key=lambda r: r.date_time)
-        if(new_records != records):
+        order = np.argsort(series.times, kind='stable')
+        if np.any(order != np.arange(len(series))):
             self.logger.add_log("BUG", "Records were not sorted, sorting them now", tag="FilterWaterLevel")
-            self.logger.add_log("BUG",f"original data get from server: {records}", tag="FilterWaterLevel")
-            self.logger.add_log("BUG", f"sorted data: {new_records}", tag="FilterWaterLevel")
             print("Records were not sorted, sorting them now")
-            records = new_records
-        filled = []
-        for i in range(len(records) - 1):
-            current = records[i]
-            if getattr(current, 'water_level_0') == -9999:
-                self.logger.add_log("WARNING", f"Record {current} has water_level_0 set to -9999, skipping", tag="FilterWaterLevel")
-                print(f"Skipping record {current} with water_level_0 = -9999")
-                continue
-            next_rec = records[i + 1]
-            filled.append(current)
-            interval = next_rec.date_time.minute - current.date_time.minute
-            if interval < 0:
-                interval += 60
-            steps = int(interval // 10)
-            self.logger.add_log("INFO", f"Processing record[{i+1}]: current: {current}, next: {next_rec}, interval: {interval} minutes, steps: {steps}", tag="FilterWaterLevel")
-            print(f"Processing record[{i+1}]: {current}, next: {next_rec}, interval: {interval} minutes, steps: {steps}")
-            max_delta = self.delta * (steps if steps > 1 else 1)
-            # Validate next_rec
-            valid = False
-            for attr in ['water_level_0', 'water_level_1', 'water_level_2']:
-                curr_val = getattr(current, 'water_level_0')
-                next_val = getattr(next_rec, attr)
-                if abs(next_val - curr_val) <= max_delta:
-                    if attr != 'water_level_0':
-                        setattr(next_rec, 'water_level_0', next_val)
-                        self.logger.add_log("WARNING", f"water_level_0 adjusted to {next_val} from {attr}", tag="FilterWaterLevel")
-                        print(f"Adjusted water_level_0 using {attr}: {next_val}")
-                    valid = True
-                    break
+            series = series[order]
+            if keep_mask is not None:
+                keep_mask = keep_mask[:, order]
+
+        levels = series.levels()
+        times = series.times
+        step = np.timedelta64(10, 'm')
+
+        # 1) Validate each record against the accepted water_level_0 of the previous one
+        steps = (np.diff(times) // step).astype(np.int64)
+        max_delta = self.delta * np.maximum(steps, 1)
+        usable = keep_mask if keep_mask is not None else np.ones(levels.shape, dtype=bool)
+        accepted, channel = validate_chain(levels, max_delta, usable)
+
+        # Sensor fallback: first channel within range replaces water_level_0
+        level_0 = levels[channel, np.arange(len(series))]
+        fallback = np.flatnonzero(accepted & (channel != 0))
+        if fallback.size:
+            self.logger.add_log("WARNING", f"water_level_0 replaced by fallback channel at index {fallback.tolist()}", tag="FilterWaterLevel")
+        dropped = np.flatnonzero(~accepted)
+        if dropped.size:
+            self.logger.add_log("WARNING", f"Dropped {dropped.size} out-of-range records at index {dropped.tolist()}", tag="FilterWaterLevel")
+
+        kept = series[accepted]
+        kept.water_level_0 = level_0[accepted]
+        if not len(kept):
+            self.logger.add_log("WARNING", "No valid records left after validation", tag="FilterWaterLevel")
+            return kept
 
-            if not valid:
-                self.logger.add_log("WARNING", f"Element {next_rec} is out of range, setting to -9999", tag="FilterWaterLevel")
-                print(f"Set water_level_0/1/2 at index {i+1} to -9999")
-                for attr in ['water_level_0', 'water_level_1', 'water_level_2']:
-                    setattr(next_rec, attr, -9999)
-            else :
-                self.logger.add_log("INFO", f"Element {next_rec} is OK", tag="FilterWaterLevel")            # Insert missing
-            if steps != 1: self.logger.add_log("WARNING", f"There are {steps} missing records between {current.date_time} and {next_rec.date_time}", tag="FilterWaterLevel")
-            for step in range(1, steps):
-                self.logger.add_log("INFO", f"--------------Start inserting record at step {step} \ {steps}-----------------", tag="FilterWaterLevel")
-                missing_time = current.date_time + timedelta(minutes=10 * step)
-                fraction = step / steps
-                # Interpolation for each level
-                def interpolate(curr, next_):
-                    val_next = next_ if next_ != -9999 else curr
-                    return int(val_next * fraction + curr * (1 - fraction))
+        # 2) Missing slots on the 10-minute grid between kept records
+        slots = (np.diff(kept.times) // step).astype(np.int64)
+        missing = np.maximum(slots - 1, 0)
+        total = int(missing.sum())
+        if total == 0:
+            self.logger.add_log("INFO", f"Filtering complete, total records: {len(kept)}", tag="FilterWaterLevel")
+            return kept
+        gap_starts = np.flatnonzero(missing)
+        self.logger.add_log(
+            "WARNING",
+            f"Filling {total} missing records after {[str(t) for t in kept.times[gap_starts]]}",
+            tag="FilterWaterLevel"
+        )
+        # offset m = 1..missing[j] for every gap j, flattened
+        owner = np.repeat(np.arange(len(missing)), missing)
+        offset = np.arange(total) - np.repeat(np.cumsum(missing) - missing, missing) + 1
+        missing_times = kept.times[owner] + offset * step
 
-                wl0 = interpolate(current.water_level_0, next_rec.water_level_0)
-                wl2 = wl1 = wl0
-                vol = next_rec.vol * fraction + current.vol * (1 - fraction)
-                
-                new_rec = WaterRecord(
-                    id=-1,
-                    serial_number=current.serial_number,
-                    date_time=missing_time,
-                    water_level_0=wl0,
-                    water_level_1=wl1,
-                    water_level_2=wl2,
-                    vol=vol
-                )
-                self.logger.add_log("INFO", f"Finish inserting missing record at {missing_time}: {new_rec}", tag="FilterWaterLevel")
-                print(f"Inserted missing record at {missing_time}: {new_rec}")
-                filled.append(new_rec)
-        filled.append(records[-1])
+        # 3) Linear interpolation on the grid
+        x = kept.times.astype(np.int64)
+        xi = missing_times.astype(np.int64)
+        wl = np.interp(xi, x, kept.water_level_0).astype(np.int64)
+        vol = np.interp(xi, x, kept.vol)
+        inserted = WaterSeries(
+            ids=np.full(total, -1),
+            serial_number=kept.serial_number,
+            times=missing_times,
+            water_level_0=wl,
+            water_level_1=wl,
+            water_level_2=wl,
+            vol=vol,
+        )
+        filled = WaterSeries.concat([kept, inserted])
+        filled = filled[np.argsort(filled.times, kind='stable')]
         self.logger.add_log("INFO", f"Filtering complete, total records: {len(filled)}", tag="FilterWaterLevel")
-        self.logger.add_log("INFO", f"Filtered data: {filled}", tag="FilterWaterLevel")
-        return filled
\ No newline at end of file
+        return filled
@@ -0,0 +1,238 @@
+import os
+from datetime import datetime
+from typing import List, Tuple
+import numpy as np
+from config import TREND_STATE_DIR, TREND_INCREMENTAL, TREND_VERIFY
+from data.data_handler import WaterRecord, WaterSeries, as_series
+from data.trend_detected import (
+    REFINE_MARGIN,
+    find_relative_peaks_troughs,
+    relative_extrema_reach,
+    refine_extrema_indices,
+    unique_absolute_indices,
+    finish_trend_detection,
+    trend_detected_processes,
+)
+from logger.logger import LoggerFactory
+
+STATE_VERSION = 2
+_HEADER_SIZE = 8
+_NO_TIME = np.iinfo(np.int64).min  # NaT: cửa sổ ±90' bị cắt ở biên → refine lại
+
+class IncrementalTrendDetector:
+    """
+    Incremental version of trend_detected_processes for one station.
+
+    Smoothing + relative peak/trough detection and the ±90' refinement are
+    the part of the full recompute that grows with the lookback. The
+    relative decision at index i only depends on values[i - reach .. i + reach]
+    (reach = window_sg // 2 + 2) and the refinement only on the ±90' around
+    it, so between runs we persist, per kind, the times of the settled
+    relative peaks/troughs (i < n - reach) with their refined absolute
+    times, plus the last `tail` samples of the processed series.
+
+    The state does not grow with the lookback beyond the candidates, and
+    the next run only:
+      - checks continuity on the tail (same times and values at the end of
+        the previous run, window start not moved backwards),
+      - recomputes a head segment (the window start moved) and the tail
+        segment after the settled region,
+      - refines the candidates whose ±90' window was clipped or is new.
+    The last-point check and event filters then run over all candidates as
+    in the full recompute, so the result is identical. Backfilled data
+    before the tail is not detected: RecordCache resets the state when rows
+    older than its watermark arrive or a range is invalidated. Anything
+    else unexpected (no state, changed parameters, changed tail, too little
+    overlap) falls back to a full recompute. verify=True always runs the
+    full recompute as well, logs any mismatch and returns the full result.
+    """
+    def __init__(self, serial_number: str, state_dir: str = TREND_STATE_DIR,
+                 window_sg: int = 23, delta_sg: int = 3, verify: bool = False):
+        self.serial_number = serial_number
+        self.state_path = os.path.join(state_dir, f"trend_{serial_number}.npy")
+        self.window_sg = window_sg
+        self.delta_sg = delta_sg
+        self.verify = verify
+        self.reach = relative_extrema_reach(window_sg)
+        self.tail = 2 * self.reach
+        self.logger = LoggerFactory()
+
+    def process(self, records: WaterSeries | List[WaterRecord], now: datetime | None = None) -> Tuple[List[Tuple[WaterRecord, str]], str, WaterRecord]:
+        series = as_series(records)
+        candidates = self._candidates(series)
+        absolute_peaks, absolute_troughs = unique_absolute_indices(series, candidates[0][1], candidates[1][1])
+        result = finish_trend_detection(series, absolute_peaks, absolute_troughs, now=now)
+
+        if self.verify:
+            full = trend_detected_processes(series, now=now)
+            if _result_key(full) != _result_key(result):
+                self.logger.add_log("BUG", f"Incremental trend mismatch for {self.serial_number}: incremental={_result_key(result)}, full={_result_key(full)}", tag="IncrementalTrend")
+                candidates = self._full_candidates(series)
+                result = full
+            else:
+                self.logger.add_log("INFO", f"Incremental trend verified for {self.serial_number}", tag="IncrementalTrend")
+
+        self._save_state(series, candidates)
+        return result
+
+    def reset(self):
+        """
+        Forget the persisted state; the next run is a full recompute.
+        """
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def _full_candidates(self, series: WaterSeries) -> List[Tuple[np.ndarray, np.ndarray]]:
+        peaks, troughs = find_relative_peaks_troughs(series.water_level_0, self.window_sg, self.delta_sg)
+        return [(peaks, refine_extrema_indices(series, peaks, 'peak')),
+                (troughs, refine_extrema_indices(series, troughs, 'trough'))]
+
+    def _candidates(self, series: WaterSeries) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (relative indices, absolute indices) for peaks then troughs, in the
+        order the full recompute produces them (before removing duplicates).
+        """
+        state = self._load_state()
+        reason, overlap = self._check_state(state, series)
+        if reason:
+            self.logger.add_log("INFO", f"Full trend recompute for {self.serial_number}: {reason}", tag="IncrementalTrend")
+            return self._full_candidates(series)
+
+        values = series.water_level_0
+        times = series.times
+        reach = self.reach
+        # Quyết định tại i ∈ [trusted_start, trusted_end) lấy lại từ state
+        trusted_start, trusted_end = reach, overlap - reach
+        head = find_relative_peaks_troughs(values[:trusted_start + reach], self.window_sg, self.delta_sg)
+        tail_start = trusted_end - reach
+        tail = find_relative_peaks_troughs(values[tail_start:], self.window_sg, self.delta_sg)
+
+        # Cửa sổ ±90' không bị cắt ở đầu series thì absolute đã lưu vẫn đúng
+        reusable_from = times[0] + REFINE_MARGIN
+        candidates = []
+        for kind, head_idx, (cached_rel, cached_abs), tail_idx in zip(('peak', 'trough'), head, state["candidates"], tail):
+            lo, hi = np.searchsorted(cached_rel, times[[trusted_start, trusted_end]], side="left")
+            cached_rel, cached_abs = cached_rel[lo:hi], cached_abs[lo:hi]
+            cached_idx = np.searchsorted(times, cached_rel)
+            relative = np.concatenate((
+                head_idx[head_idx < trusted_start],
+                cached_idx,
+                tail_idx[tail_idx + tail_start >= trusted_end] + tail_start,
+            )).astype(int)
+
+            absolute = np.empty(len(relative), dtype=int)
+            known = np.zeros(len(relative), dtype=bool)
+            n_head = int(np.count_nonzero(head_idx < trusted_start))
+            reuse = ~np.isnat(cached_abs) & (cached_rel >= reusable_from)
+            known[n_head:n_head + len(cached_rel)] = reuse
+            absolute[known] = np.searchsorted(times, cached_abs[reuse])
+            absolute[~known] = refine_extrema_indices(series, relative[~known], kind)
+            candidates.append((relative, absolute))
+
+        self.logger.add_log(
+            "INFO",
+            lambda: f"Incremental trend for {self.serial_number}: reused [{trusted_start}, {trusted_end}) of {len(series)}, "
+                    f"recomputed {trusted_start + reach} head + {len(series) - tail_start} tail samples",
+            tag="IncrementalTrend"
+        )
+        return candidates
+
+    def _check_state(self, state, series: WaterSeries) -> Tuple[str | None, int]:
+        """
+        Return (why the state cannot be used or None, number of samples of
+        `series` that the previous run already processed). Only looks at
+        the tail of the previous run, never at the whole overlap.
+        """
+        if state is None:
+            return "no saved state", 0
+        if state["window_sg"] != self.window_sg or state["delta_sg"] != self.delta_sg:
+            return "detector parameters changed", 0
+        if len(series) == 0:
+            return "empty series", 0
+        times = series.times
+        if times[0] < state["first_time"]:
+            return "window start moved backwards", 0
+        overlap = int(np.searchsorted(times, state["last_time"], side="right"))
+        if overlap - 2 * self.reach <= self.reach:
+            return "not enough overlap with the previous run", 0
+        tail_times, tail_values = state["tail_times"], state["tail_values"]
+        size = min(len(tail_times), overlap)
+        if not (np.array_equal(times[overlap - size:overlap], tail_times[len(tail_times) - size:])
+                and np.array_equal(series.water_level_0[overlap - size:overlap], tail_values[len(tail_values) - size:])):
+            return "data changed since the previous run", 0
+        for cached_rel, cached_abs in state["candidates"]:
+            # các mốc thời gian đã lưu phải còn trong series (không bị xoá/chèn giữa chừng)
+            kept = cached_rel[cached_rel >= times[0]]
+            if len(kept) and not np.array_equal(times[np.minimum(np.searchsorted(times, kept), overlap - 1)], kept):
+                return "saved peaks/troughs no longer in the series", 0
+        return None, overlap
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return None
+        try:
+            data = np.load(self.state_path)
+            version, window_sg, delta_sg, first_time, last_time, tail, n_peaks, n_troughs = data[:_HEADER_SIZE].tolist()
+            if version != STATE_VERSION:
+                return None
+            sizes = (tail, tail, n_peaks, n_peaks, n_troughs, n_troughs)
+            if len(data) != _HEADER_SIZE + sum(sizes):
+                raise ValueError(f"unexpected state size {len(data)}")
+            parts = np.split(data[_HEADER_SIZE:], np.cumsum(sizes)[:-1])
+            to_times = lambda part: part.astype("datetime64[s]")
+            return {
+                "window_sg": window_sg,
+                "delta_sg": delta_sg,
+                "first_time": np.datetime64(first_time, "s"),
+                "last_time": np.datetime64(last_time, "s"),
+                "tail_times": to_times(parts[0]),
+                "tail_values": parts[1].view(np.float64),
+                "candidates": [(to_times(parts[2]), to_times(parts[3])), (to_times(parts[4]), to_times(parts[5]))],
+            }
+        except (OSError, ValueError) as e:
+            self.logger.add_log("BUG", f"Cannot read trend state {self.state_path}: {e}", tag="IncrementalTrend")
+            return None
+
+    def _save_state(self, series: WaterSeries, candidates: List[Tuple[np.ndarray, np.ndarray]]):
+        """
+        One int64 array: header, tail times, tail values (float64 bits),
+        then per kind the settled relative times and their absolute times
+        (_NO_TIME if the ±90' window was clipped by either end of the series).
+        """
+        times = series.times.astype(np.int64)
+        n = len(times)
+        # Chỉ lưu các relative peak/trough đã ổn định (không còn phụ thuộc dữ liệu mới)
+        settled_end = n - self.reach
+        margin = int(REFINE_MARGIN / np.timedelta64(1, "s"))
+        parts = []
+        for relative, absolute in candidates:
+            settled = relative < settled_end
+            rel_times = times[relative[settled]]
+            abs_times = times[absolute[settled]]
+            clipped = (rel_times - margin < times[0]) | (rel_times + margin > times[-1])
+            parts.append((rel_times, np.where(clipped, _NO_TIME, abs_times)))
+        tail = min(self.tail, n)
+        header = [STATE_VERSION, self.window_sg, self.delta_sg, times[0], times[-1], tail, len(parts[0][0]), len(parts[1][0])]
+        data = np.concatenate((
+            np.array(header, dtype=np.int64),
+            times[n - tail:],
+            np.ascontiguousarray(series.water_level_0[n - tail:], dtype=np.float64).view(np.int64),
+            parts[0][0], parts[0][1], parts[1][0], parts[1][1],
+        ))
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp.npy"
+        np.save(tmp_path, data)
+        os.replace(tmp_path, self.state_path)
+
+def detect_trend(serial_number: str, records: WaterSeries | List[WaterRecord], now: datetime | None = None) -> Tuple[List[Tuple[WaterRecord, str]], str, WaterRecord]:
+    """
+    trend_detected_processes, or IncrementalTrendDetector.process when
+    TREND_INCREMENTAL is on.
+    """
+    if TREND_INCREMENTAL:
+        return IncrementalTrendDetector(serial_number, verify=TREND_VERIFY).process(records, now=now)
+    return trend_detected_processes(records, now=now)
+
+def _result_key(result):
+    filtered, trend_code, closest_record = result
+    return [(rec.id, rec.date_time, kind) for rec, kind in filtered], trend_code, closest_record.id
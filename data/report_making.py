@@ -3,81 +3,56 @@ from datetime import datetime
 from typing import List, Tuple, Set
 from logger.logger import LoggerFactory
 from datetime import timedelta
-import json
+from data.event_ledger import EventLedger
 SERIAL_NUMBER = "74194"
+SYNOPTIC_HOURS = (1, 7, 13, 19)  # giờ gửi điện báo đầy đủ
 
-import os
-from typing import List, Tuple
+def is_synoptic_hour(when: datetime) -> bool:
+    return when.hour in SYNOPTIC_HOURS
 
-
-    
-def load_last_events(filename: str = "record_data.json") -> Tuple[Set[int], Set[int]]:
-    """
-    1. Opens filename and reads its entire contents as a string.
-    2. Parses JSON: expects {"peaks": [id,...], "troughs":[id,...]}.
-    3. Returns two sets of ints.
-    """
-    if not os.path.exists(filename):
-        return set(), set()
-    with open(filename, "r") as f:
-        data_str = f.read()
-    data = json.loads(data_str)
-    return set(data.get("peaks", [])), set(data.get("troughs", []))
-
-
-def update_peaks_troughs_json(
+def update_peaks_troughs_ledger(
     filtered_new: List[Tuple[WaterRecord, str]],
-    filename: str = "record_data.json"
+    station: str,
+    ledger: EventLedger,
+    now: datetime | None = None,
 ) -> List[Tuple[WaterRecord, str]]:
     """
-    - Loads last-run peaks/troughs from JSON.
-    - Filters out any rec.id already seen in the appropriate category.
-    - Saves THIS runs peaks & troughs (fresh lists) back to JSON.
+    - Keeps candidates of the last 8 hours not yet in the event ledger
+      (key: station, event time, kind).
+    - Records every candidate of this run in one batch, marking the
+      returned ones as reported.
     - Returns only the new events.
     """
-    # 1) Load last-run sets
-    last_peaks, last_troughs = load_last_events(filename)
-    
-    # 2) Sort incoming events by datetime
+    now = now or datetime.now()
+    # 1) Sort incoming events by datetime
     sorted_candidates = sorted(filtered_new, key=lambda x: x[0].date_time)
 
-    # 3) Keep only those within the last 8 hours
-    cutoff = datetime.now() - timedelta(hours=8)
+    # 2) Keep only those within the last 8 hours
+    cutoff = now - timedelta(hours=8)
     recent_candidates = [
         (rec, kind)
         for rec, kind in sorted_candidates
         if rec.date_time > cutoff
     ]
 
-    # 4) Filter for genuinely new
+    # 3) Filter for genuinely new
+    known = ledger.known(station, recent_candidates)
     new_events: List[Tuple[WaterRecord, str]] = []
     for rec, kind in recent_candidates:
-        if kind == "peak" and rec.id not in last_peaks:
+        if (rec.date_time, kind) not in known:
             new_events.append((rec, kind))
-        elif kind == "trough" and rec.id not in last_troughs:
-            new_events.append((rec, kind))
-        else: 
+        else:
             LoggerFactory().add_log(
                 "INFO",
-                f"Skipping {kind} at {rec.date_time.strftime('%Y-%m-%d %H:%M')} with ID {rec.id} already seen in file record_data.",
+                f"Skipping {kind} at {rec.date_time.strftime('%Y-%m-%d %H:%M')} with ID {rec.id} already in the event ledger.",
                 tag="ReportMaking"
             )
             print(
-                f"Skipping {kind} at {rec.date_time.strftime('%Y-%m-%d %H:%M')} with ID {rec.id} already seenin file record_data."
+                f"Skipping {kind} at {rec.date_time.strftime('%Y-%m-%d %H:%M')} with ID {rec.id} already in the event ledger."
             )
 
-    # 5) Prepare fresh lists for saving (overwrite)
-    fresh_peaks   = [rec.id for rec, kind in filtered_new if kind == "peak"]
-    fresh_troughs = [rec.id for rec, kind in filtered_new if kind == "trough"]
-
-    # 6) Write JSON file (not appending)
-    with open(filename, "w") as f:
-        json.dump(
-            {"peaks": fresh_peaks, "troughs": fresh_troughs},
-            f,
-            indent=2
-        )
-
+    # 4) Record this run's events (one transaction)
+    ledger.record(station, filtered_new, seen_at=now, reported=new_events)
     return new_events
 
 
@@ -85,7 +60,13 @@ def make_report(
     filtered: List[Tuple[WaterRecord,str]],
     trend_code:  str,
     closest_record: WaterRecord,
+    report_code: str = SERIAL_NUMBER,
+    ledger: EventLedger | None = None,
+    now: datetime | None = None,
+    station: str | None = None,
 ) -> str:
+    now = now or datetime.now()  # thời điểm logic của báo cáo
+    station = station or closest_record.serial_number
     print("Start Making report")
     LoggerFactory().add_log("INFO", f"Start Making report:", tag="ReportMaking")
     trend_code += f"{closest_record.water_level_0 // 10:04d}"
@@ -107,11 +88,11 @@ def make_report(
     #         filtered_new.append((rec, kind))
             
     # 1) Check old reported peaks and troughs
-    if(datetime.now().hour == 1 or datetime.now().hour == 7 or datetime.now().hour == 13 or datetime.now().hour == 19):
-        filtered = update_peaks_troughs_json(filtered)
+    if is_synoptic_hour(now):
+        filtered = update_peaks_troughs_ledger(filtered, station, ledger or EventLedger(), now=now)
     else:
         # Lọc bỏ các peak/trough cũ hơn 6.5 giờ so với thời điểm hiện tại
-        Tmin = datetime.now() - timedelta(hours=6, minutes=30)
+        Tmin = now - timedelta(hours=6, minutes=30)
         filtered_new: List[Tuple[WaterRecord, str]] = []
         for rec, kind in filtered:
             if rec.date_time < Tmin:
@@ -143,8 +124,8 @@ def make_report(
             print(f"add trough at {rec[0].date_time.strftime('%H:%M')} → Water_Level(0) = {rec[0].water_level_0}")
     # 2) Create report string
     print("Creating report string:")
-    ch = f"{datetime.now().day:02d}{datetime.now().hour:02d}"
-    parts = [str(SERIAL_NUMBER), "22", ch]
+    ch = f"{now.day:02d}{now.hour:02d}"
+    parts = [str(report_code), "22", ch]
     parts.append(str(trend_code))
     if peaks_and_troughs_str:
         parts.append(peaks_and_troughs_str)
@@ -0,0 +1,130 @@
+from functools import lru_cache
+import numpy as np
+
+# Same tolerance as scipy.ndimage when it decides a filter is symmetric
+SYMMETRY_TOLERANCE = np.finfo(np.float64).eps
+
+@lru_cache(maxsize=None)
+def savgol_coefficients(window_length: int, polyorder: int) -> np.ndarray:
+    """
+    Savitzky–Golay smoothing coefficients, identical to
+    scipy.signal.savgol_coeffs(window_length, polyorder). Cached per
+    (window_length, polyorder); the returned array is read-only.
+    """
+    if window_length % 2 == 0 or window_length < 1:
+        raise ValueError("window_length must be a positive odd integer")
+    if polyorder >= window_length:
+        raise ValueError("polyorder must be less than window_length.")
+    half = window_length // 2
+    # cùng cách tính như scipy (least squares, vị trí đảo chiều cho convolution)
+    positions = np.arange(-half, window_length - half, dtype=float)[::-1]
+    design = positions ** np.arange(polyorder + 1).reshape(-1, 1)
+    target = np.zeros(polyorder + 1)
+    target[0] = 1.0
+    coeffs = np.linalg.lstsq(design, target, rcond=None)[0]
+    coeffs.setflags(write=False)
+    return coeffs
+
+def _filter_interior(values: np.ndarray, coeffs: np.ndarray) -> np.ndarray:
+    """
+    Filter output at [half, n - half), summed in the same order as
+    scipy.ndimage.convolve1d so the result is bit-identical (one
+    np.correlate rounds differently in ~half of the samples, enough to
+    flip the `center == win_max` ties of find_peaks_custom).
+    """
+    half = len(coeffs) // 2
+    n = len(values)
+    weights = coeffs[::-1]
+    center = values[half:n - half]
+    # 1: đối xứng, -1: phản đối xứng, 0: tổng quát (như ndimage)
+    symmetry = 0
+    if all(abs(weights[half + j] - weights[half - j]) <= SYMMETRY_TOLERANCE for j in range(1, half + 1)):
+        symmetry = 1
+    elif all(abs(weights[half + j] + weights[half - j]) <= SYMMETRY_TOLERANCE for j in range(1, half + 1)):
+        symmetry = -1
+    if symmetry:
+        combine = np.add if symmetry > 0 else np.subtract
+        out = center * weights[half]
+        for j in range(half, 0, -1):
+            out += combine(values[half - j:n - half - j], values[half + j:n - half + j]) * weights[half - j]
+    else:
+        out = values[2 * half:] * weights[2 * half]
+        for j in range(-half, half):
+            out += values[half + j:n - half + j] * weights[half + j]
+    return out
+
+def _fit_edge(values: np.ndarray, window_start: int, window_stop: int, interp_start: int, interp_stop: int,
+              polyorder: int) -> np.ndarray:
+    # mode='interp': fit một đa thức bậc polyorder trên cửa sổ ở biên rồi nội suy
+    poly_coeffs = np.polyfit(np.arange(0, window_stop - window_start), values[window_start:window_stop], polyorder)
+    return np.polyval(poly_coeffs, np.arange(interp_start - window_start, interp_stop - window_start))
+
+def savgol_smooth(values: np.ndarray, window_length: int, polyorder: int) -> np.ndarray:
+    """
+    Same output as scipy.signal.savgol_filter(values, window_length,
+    polyorder) with the default mode='interp', without importing
+    scipy.signal: cached coefficients for the interior, a polynomial fit
+    over the first/last window_length samples for the edges.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    coeffs = savgol_coefficients(window_length, polyorder)
+    n = len(values)
+    if window_length > n:
+        raise ValueError("If mode is 'interp', window_length must be less than or equal to the size of x.")
+    half = window_length // 2
+    smoothed = np.empty(n)
+    smoothed[half:n - half] = _filter_interior(values, coeffs)
+    smoothed[:half] = _fit_edge(values, 0, window_length, 0, half, polyorder)
+    smoothed[n - half:] = _fit_edge(values, n - window_length, n, n - half, n, polyorder)
+    return smoothed
+
+class SavgolSmoother:
+    """
+    Savitzky–Golay smoothing of a series that grows at the end.
+
+        smoother = SavgolSmoother(5, 1)
+        smoother.smooth(values)        # full pass, result cached
+        smoother.append(new_values)    # == savgol_smooth(concat(values, new_values), 5, 1)
+
+    Before window_length samples have been appended the result is empty.
+
+    Output i only depends on values[i - half .. i + half], except the last
+    `half` outputs (polynomial edge fit over the last window). Appending
+    therefore only recomputes those plus the new samples, from the last
+    window_length - 1 old inputs onwards.
+
+    Not used by the pipeline yet: the trend window also drops samples at
+    the start every run, and IncrementalTrendDetector re-smooths only its
+    head and tail segments with savgol_smooth.
+    """
+    def __init__(self, window_length: int, polyorder: int):
+        savgol_coefficients(window_length, polyorder)  # kiểm tra tham số sớm
+        self.window_length = window_length
+        self.polyorder = polyorder
+        self.values = np.empty(0)
+        self.smoothed = np.empty(0)
+
+    def smooth(self, values: np.ndarray) -> np.ndarray:
+        self.values = np.asarray(values, dtype=np.float64).copy()
+        self.smoothed = savgol_smooth(self.values, self.window_length, self.polyorder)
+        return self.smoothed
+
+    def append(self, new_values: np.ndarray) -> np.ndarray:
+        new_values = np.asarray(new_values, dtype=np.float64)
+        n_prev = len(self.values)
+        if n_prev < self.window_length:
+            values = np.concatenate((self.values, new_values))
+            if len(values) < self.window_length:
+                # chưa đủ một cửa sổ: chỉ giữ lại, chưa làm mượt được
+                self.values, self.smoothed = values, np.empty(0)
+                return self.smoothed
+            return self.smooth(values)
+        if not len(new_values):
+            return self.smoothed
+        half = self.window_length // 2
+        self.values = np.concatenate((self.values, new_values))
+        # output < n_prev - half không đổi; tính lại từ đó, đoạn bắt đầu sớm hơn half mẫu
+        start = n_prev - 2 * half
+        tail = savgol_smooth(self.values[start:], self.window_length, self.polyorder)
+        self.smoothed = np.concatenate((self.smoothed[:n_prev - half], tail[half:]))
+        return self.smoothed
@@ -1,11 +1,12 @@
 from typing import List, Tuple
-from data.data_handler import WaterRecord 
+from data.data_handler import WaterRecord, WaterSeries, TimeIndex, as_series
 from logger.logger import LoggerFactory
 from typing import Tuple
-from scipy.signal import find_peaks,savgol_filter
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
 from collections import defaultdict
 import numpy as np
 from data.filter import FilterWaterLevel
+from data.smoothing import savgol_smooth
 from datetime import datetime
 from datetime import timedelta
 
@@ -22,24 +23,35 @@ def find_peaks_custom(signal: np.ndarray, windows: int, delta: int) -> np.ndarra
     Trả về:
     - numpy array các chỉ số i là peak
     """
-    if windows % 2 == 0:
-        raise ValueError("window must be an odd integer")
-    
+    if windows % 2 == 0 or windows < 3:
+        raise ValueError("window must be an odd integer >= 3")
+
+    signal = np.asarray(signal)
     half = windows // 2
-    peaks = []
-    
-    # Chạy từ half đến len(signal)-half-1
-    for i in range(half, len(signal) - half):
-        win = signal[i-half: i+half+1]  # Cửa sổ hiện tại
-        win_left = signal[i-half: i]
-        win_right = signal[i+1: i+half+1]
-        # kiểm tra i có phải max trong cửa sổ và độ nhô ≥ delta
-        if signal[i] == win.max() and (signal[i] - win_left.min()) >= delta and (signal[i] - win_right.min()) >= delta:
-            peaks.append(i)
-            LoggerFactory().add_log("INFO",f"Peak detected at index {i} with value {signal[i]}", tag="PeakDetection")   
-            print(f"Peak detected at index {i} with value {signal[i]}")
-             
-    return np.array(peaks, dtype=int)
+    n = len(signal)
+    if n < windows:
+        return np.array([], dtype=int)
+
+    # Rolling max của cửa sổ đầy đủ (căn giữa tại i) và rolling min của
+    # nửa cửa sổ; nửa trái [i-half, i) có tâm tại i-half+half//2,
+    # nửa phải (i, i+half] có tâm tại i+1+half//2.
+    win_max  = maximum_filter1d(signal, size=windows, mode='nearest')
+    half_min = minimum_filter1d(signal, size=half, mode='nearest')
+
+    # Chỉ xét i trong [half, n-half) như trước
+    idx       = np.arange(half, n - half)
+    center    = signal[idx]
+    left_min  = half_min[idx - half + half // 2]
+    right_min = half_min[idx + 1 + half // 2]
+
+    # i là max trong cửa sổ và độ nhô ≥ delta so với hai phía
+    is_peak = (center == win_max[idx]) \
+        & ((center - left_min) >= delta) \
+        & ((center - right_min) >= delta)
+    peaks = idx[is_peak]
+    LoggerFactory().add_log("INFO", f"Detected {peaks.size} peaks in {n} samples", tag="PeakDetection")
+
+    return peaks.astype(int)
 def write_chart(raw_value:np.ndarray ,
                 smooth_value:np.ndarray,
                 peaks:np.ndarray,
@@ -59,119 +71,137 @@ def write_chart(raw_value:np.ndarray ,
     plt.title("Chart of Water Level with Peaks and Troughs")
     plt.show()
     
-def detect_absolute_peaks_troughs(
-    records: List[WaterRecord],
+REFINE_MARGIN = np.timedelta64(90, 'm')
+
+def refine_extrema_indices(
+    series: WaterSeries,
+    relative_indices: np.ndarray,
+    kind: str,
+    index: TimeIndex | None = None,
+) -> np.ndarray:
+    """
+    Với mỗi relative peak/trough, tìm absolute peak/trough trong cửa sổ ±90'.
+    Biên cửa sổ của tất cả các điểm được tìm bằng một lần searchsorted.
+    Trả về một absolute index cho mỗi relative index (chưa loại trùng).
+    """
+    if index is None:
+        index = series.time_index
+    relative_indices = np.asarray(relative_indices, dtype=int)
+    pick = np.argmax if kind == 'peak' else np.argmin
+    values = series.water_level_0
+    rel_times = series.times[relative_indices]
+    lo, hi = index.windows(rel_times - REFINE_MARGIN, rel_times + REFINE_MARGIN)
+    absolute = np.empty(len(relative_indices), dtype=int)
+    for k, (start, stop) in enumerate(zip(lo.tolist(), hi.tolist())):
+        absolute[k] = start + int(pick(values[start:stop]))
+    return absolute
+
+def _unique_in_order(series: WaterSeries, absolute: np.ndarray, kind: str) -> List[int]:
+    """
+    Bỏ các absolute index trùng, giữ thứ tự xuất hiện.
+    """
+    seen = set()
+    unique = []
+    for abs_index in absolute.tolist():
+        if abs_index in seen:
+            continue
+        seen.add(abs_index)
+        unique.append(abs_index)
+    if len(unique) != len(absolute):
+        LoggerFactory().add_log("WARNING", f"Found {len(absolute) - len(unique)} duplicate {kind}s, skipping.", tag="ReportMaking")
+    LoggerFactory().add_log(
+        "INFO",
+        lambda: f"Absolute {kind}s: {[(series.date_time(i).strftime('%Y-%m-%d %H:%M'), int(series.water_level_0[i])) for i in unique]}",
+        tag="ReportMaking"
+    )
+    return unique
+
+SMOOTH_WINDOW = 5
+SMOOTH_POLYORDER = 1
+
+def find_relative_peaks_troughs(
+    values: np.ndarray,
     window_sg:  int     = 23,
-    delta_sg:   int = 3
+    delta_sg:   int = 3,
 ) -> Tuple[np.ndarray, np.ndarray]:
-    
-    # 1) Chuẩn bị times/values
-    times_np  = np.array([r.date_time for r in records], dtype='datetime64[m]')
-    values_np = np.array([r.water_level_0 for r in records])
+    """
+    Làm mượt (Savitzky–Golay) rồi tìm relative peaks/troughs trên values.
+    Quyết định tại index i chỉ phụ thuộc values[i - reach .. i + reach]
+    với reach = window_sg // 2 + SMOOTH_WINDOW // 2 (xem relative_extrema_reach).
+    """
+    # Lọc dữ liệu, loại bỏ gai
+    smoothed_value = savgol_smooth(values, window_length=SMOOTH_WINDOW, polyorder=SMOOTH_POLYORDER)
 
-    # 2) Lọc dữ liệu, loại bỏ gai
-    
-    smoothed_value = savgol_filter(values_np, window_length=5, polyorder=1)
-    
-    # 3) Tìm relative peaks/troughs
     peaks   = find_peaks_custom(smoothed_value,
                         windows     = window_sg,
                         delta       = delta_sg)
     troughs = find_peaks_custom(    -smoothed_value,
                         windows     = window_sg,
                         delta       = delta_sg)
-    
-    absolute_peaks_indices   =[]
-    absolute_troughs_indices =[]
+    return peaks, troughs
 
-    # 4) Với mỗi relative-peak, tìm absolute-peak trong window ±90’
-    for idx in peaks:
-        rec = records[idx]
-        LoggerFactory().add_log("INFO", f"Relative peak at: {rec.date_time.strftime('%Y-%m-%d %H:%M')}  →  {rec.water_level_0}", tag="ReportMaking")
-        
-
-        left_border    = rec.date_time - timedelta(minutes=90)
-        right_border   = rec.date_time + timedelta(minutes=90)
-        window_indices = [
-            idx
-            for idx, r in enumerate(records)
-            if left_border <= r.date_time <= right_border
-        ]
+def relative_extrema_reach(window_sg: int = 23) -> int:
+    return window_sg // 2 + SMOOTH_WINDOW // 2
+
+def detect_absolute_peaks_troughs(
+    records: WaterSeries | List[WaterRecord],
+    window_sg:  int     = 23,
+    delta_sg:   int = 3,
+    index: TimeIndex | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
     
-        if window_indices:
-            abs_peak_index = max(
-                window_indices,
-                key=lambda i: records[i].water_level_0
-            )
-            is_duplicate = False
-            for peak_indices in absolute_peaks_indices:
-                if abs_peak_index == peak_indices:
-                    LoggerFactory().add_log(
-                        "WARNING",
-                        f"Found duplicate peak at {records[abs_peak_index].date_time.strftime('%Y-%m-%d %H:%M')}, skipping.",
-                        tag="ReportMaking"
-                    )
-                    is_duplicate = True
-                    print(f"Found duplicate peak at {records[abs_peak_index].date_time.strftime('%Y-%m-%d %H:%M')}, skipping.")
-                    break
-            if not is_duplicate:
-                absolute_peaks_indices.append(abs_peak_index)
-                LoggerFactory().add_log(
-                    "INFO",
-                    f"Absolute peak at: {records[abs_peak_index].date_time.strftime('%Y-%m-%d %H:%M')}  →  {records[abs_peak_index].water_level_0}",
-                    tag="ReportMaking"
-                )
-                print(f"Absolute peak at: {records[abs_peak_index].date_time.strftime('%Y-%m-%d %H:%M')}  →  {records[abs_peak_index].water_level_0}")
+    # 1) Chuẩn bị times/values
+    series = as_series(records)
+    if index is None:
+        index = series.time_index
 
+    # 2) Lọc dữ liệu, loại bỏ gai
+    # 3) Tìm relative peaks/troughs
+    peaks, troughs = find_relative_peaks_troughs(series.water_level_0, window_sg, delta_sg)
+    return refine_peaks_troughs(series, peaks, troughs, index=index)
+
+def refine_peaks_troughs(
+    series: WaterSeries,
+    peaks: np.ndarray,
+    troughs: np.ndarray,
+    index: TimeIndex | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Từ relative peaks/troughs (index) tìm absolute peaks/troughs trong ±90'.
+    """
+    if index is None:
+        index = series.time_index
+    # 4) Với mỗi relative-peak, tìm absolute-peak trong window ±90’
     # 5) Tương  với troughs
-    for idx in troughs:
-        rec = records[idx]
-        LoggerFactory().add_log("INFO", f"Relative trough at: {rec.date_time.strftime('%Y-%m-%d %H:%M')}  →  {rec.water_level_0}", tag="ReportMaking")
-        print(f"Relative trough at: {rec.date_time.strftime('%Y-%m-%d %H:%M')}  →  {rec.water_level_0}")
-
-        left_border    = rec.date_time - timedelta(minutes=90)
-        right_border   = rec.date_time + timedelta(minutes=90)
-        window_indices = [
-            idx
-            for idx, r in enumerate(records)
-            if left_border <= r.date_time <= right_border
-        ]
-    
-        if window_indices:
-            abs_trough_index = min(
-                window_indices,
-                key=lambda i: records[i].water_level_0
-            )
-            is_duplicate = False
-            for trough_indices in absolute_troughs_indices:
-                if abs_trough_index == trough_indices:
-                    LoggerFactory().add_log(
-                        "WARNING",
-                        f"Found duplicate trough at {records[abs_trough_index].date_time.strftime('%Y-%m-%d %H:%M')}, skipping.",
-                        tag="ReportMaking"
-                    )
-                    print(f"Found duplicate trough at {records[abs_trough_index].date_time.strftime('%Y-%m-%d %H:%M')}, skipping.")
-                    is_duplicate = True
-                    break
-            if not is_duplicate:
-                absolute_troughs_indices.append(abs_trough_index)
-                LoggerFactory().add_log(
-                    "INFO",
-                    f"Absolute trough at: {records[abs_trough_index].date_time.strftime('%Y-%m-%d %H:%M')}  →  {records[abs_trough_index].water_level_0}",
-                    tag="ReportMaking"
-                )
-                print(f"Absolute trough at: {records[abs_trough_index].date_time.strftime('%Y-%m-%d %H:%M')}  →  {records[abs_trough_index].water_level_0}")   
+    return unique_absolute_indices(
+        series,
+        refine_extrema_indices(series, peaks, 'peak', index),
+        refine_extrema_indices(series, troughs, 'trough', index),
+    )
+
+def unique_absolute_indices(
+    series: WaterSeries,
+    absolute_peaks: np.ndarray,
+    absolute_troughs: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bỏ các absolute peaks/troughs trùng (giữ thứ tự), như cuối refine_peaks_troughs.
+    """
+    absolute_peaks_indices   = _unique_in_order(series, np.asarray(absolute_peaks, dtype=int), 'peak')
+    absolute_troughs_indices = _unique_in_order(series, np.asarray(absolute_troughs, dtype=int), 'trough')
     return np.array( absolute_peaks_indices), np.array(absolute_troughs_indices)
 
     
 def detect_last_trend(
-    all_records: List[WaterRecord],
-    filtered : List[Tuple[WaterRecord, str]]
+    all_records: WaterSeries | List[WaterRecord],
+    filtered : List[Tuple[WaterRecord, str]],
+    index: TimeIndex | None = None,
+    now: datetime | None = None,
     ) -> str:
-    closest_record = min(
-        all_records,
-        key=lambda record: abs((record.date_time -  datetime.now()).total_seconds())
-        )
+    series = as_series(all_records)
+    if index is None:
+        index = series.time_index
+    closest_record = series[index.closest(now or datetime.now())]
     LoggerFactory().add_log("INFO", f"Closest record: {closest_record}", tag="ReportMaking")
     print(f"Closest record: {closest_record}")
 
@@ -183,7 +213,7 @@ def detect_last_trend(
     else:
         LoggerFactory().add_log("INFO", f"No events found, using closest record: {closest_record}", tag="ReportMaking")
         print(f"No events found, using closest record: {closest_record}")
-        if closest_record.water_level_0 > all_records[0].water_level_0:
+        if closest_record.water_level_0 > series.water_level_0[0]:
             trend_code = "2" # uptrend
         else:
             trend_code = "1"  # downtrend
@@ -207,21 +237,28 @@ def find_peak_last_point(arr: np.ndarray, delta: int = 10) -> int:
     return -1
 
 
+def _summarize_points(series: WaterSeries, indices: List[int]) -> List[Tuple[str, int]]:
+    return [(series.date_time(r).strftime('%Y-%m-%d %H:%M'), int(series.water_level_0[r])) for r in indices]
+
 def check_last_point(
-    records: List[WaterRecord],
+    records: WaterSeries | List[WaterRecord],
     absolute_peaks: List[int],
     absolute_troughs: List[int],
-    delta: int
+    delta: int,
+    index: TimeIndex | None = None,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Kiểm tra điểm cuối cùng và có thể thêm vào absolute_peaks hoặc absolute_troughs,
     rồi log và print trước khi trả về.
 
-    - records: danh sách WaterRecord đã sắp xếp theo date_time tăng dần
+    - records: WaterSeries (hoặc danh sách WaterRecord) đã sắp xếp theo thời gian tăng dần
     - absolute_peaks: danh sách các peak tuyệt đối hiện tại
     - absolute_troughs: danh sách các trough tuyệt đối hiện tại
     - delta: ngưỡng độ nhô so với đáy/cuội
+    - index: TimeIndex dùng chung của records (tạo mới nếu không truyền)
     """
+    series = as_series(records)
+    values = series.water_level_0
     # 1) Kết hợp & sort để kiểm tra khoảng 3h
 
     list_all_peaks_troughts_indice = sorted(
@@ -230,16 +267,15 @@ def check_last_point(
         key=lambda x: x[0]
     )
 
-    last_rec  = records[-1]
-    last_time = last_rec.date_time
-    last_variable   = last_rec.water_level_0
+    last_time = series.date_time(-1)
+    last_variable   = values[-1]
 
     # Nếu đã có peak/trough trong 3h, log và trả về luôn
     if list_all_peaks_troughts_indice:
-        last_pt_time = records[list_all_peaks_troughts_indice[-1][0]].date_time # lấy thời gian của peak/trough cuối cùng
+        last_pt_time = series.date_time(list_all_peaks_troughts_indice[-1][0]) # lấy thời gian của peak/trough cuối cùng
         if (last_time - last_pt_time) < timedelta(hours=3):
-            summary_peaks   = [(records[r].date_time.strftime('%Y-%m-%d %H:%M'), records[r].water_level_0) for r in absolute_peaks]
-            summary_troughs = [(records[r].date_time.strftime('%Y-%m-%d %H:%M'), records[r].water_level_0) for r in absolute_troughs]
+            summary_peaks   = _summarize_points(series, absolute_peaks)
+            summary_troughs = _summarize_points(series, absolute_troughs)
             LoggerFactory().add_log(
                 "INFO",
                 f"Found new point within 3h. Peaks: {summary_peaks}, Troughs: {summary_troughs}",
@@ -250,17 +286,15 @@ def check_last_point(
 
     # Xác định window 3h, Trường hợp không có peak hoặc trough nào 
     window_start = last_time - timedelta(hours=3)
-    rec_3h = next((r for r in records if r.date_time >= window_start), records[0])
-
+    if index is None:
+        index = series.time_index
 
     inner_start = window_start + timedelta(minutes=30)
     inner_end   = last_time     - timedelta(minutes=30)
-    window_recs = [idx for (idx, r) in enumerate(records) if window_start <= r.date_time] # lọc các bản ghi trong khoảng 3h, trừ 30 phút đầu và cuối
+    first_in_window = index.first_at_or_after(window_start) # các bản ghi trong khoảng 3h là series[first_in_window:]
 
     # Nếu không có bản ghi trong window, log và trả về
-    if not window_recs:
-        summary_peaks   = [(records[r].date_time.strftime('%Y-%m-%d %H:%M'), records[r].water_level_0) for r in absolute_peaks]
-        summary_troughs = [(records[r].date_time.strftime('%Y-%m-%d %H:%M'), records[r].water_level_0) for r in absolute_troughs]
+    if first_in_window >= len(series):
         LoggerFactory().add_log(
             "INFO",
             f"Not found data during 3h from : {last_time}",
@@ -272,23 +306,20 @@ def check_last_point(
 
     # Tìm candidate và thêm nếu vượt delta
     
-    candidate = max(
-        window_recs, 
-        key=lambda r: records[r].water_level_0)
+    window_values = values[first_in_window:]
+    candidate = first_in_window + int(np.argmax(window_values))
     # Tìm peak tuyệt đối trong khoảng 30 phút trước và sau
-    if abs(records[candidate].water_level_0 - last_variable) > delta and inner_start < records[candidate].date_time <inner_end:
+    if abs(values[candidate] - last_variable) > delta and inner_start < series.date_time(candidate) <inner_end:
         # Chỉ thêm nếu candidate nằm trong khoảng 30 phút trước và sau:
         absolute_peaks.append(candidate)
     # Tương tự với troughs
-    candidate = min(
-        window_recs, 
-        key=lambda r: records[r].water_level_0)
-    if abs( records[candidate].water_level_0 - last_variable) > delta and inner_start < records[candidate].date_time <inner_end:
+    candidate = first_in_window + int(np.argmin(window_values))
+    if abs(values[candidate] - last_variable) > delta and inner_start < series.date_time(candidate) <inner_end:
         absolute_troughs.append(candidate)
 
     # Cuối cùng: log + print summary rồi return
-    summary_peaks   = [(records[r].date_time.strftime('%Y-%m-%d %H:%M'), records[r].water_level_0) for r in absolute_peaks]
-    summary_troughs = [(records[r].date_time.strftime('%Y-%m-%d %H:%M'), records[r].water_level_0) for r in absolute_troughs]
+    summary_peaks   = _summarize_points(series, absolute_peaks)
+    summary_troughs = _summarize_points(series, absolute_troughs)
     LoggerFactory().add_log(
         "INFO",
         f"Updated points. Peaks: {summary_peaks}, Troughs: {summary_troughs}",
@@ -298,68 +329,95 @@ def check_last_point(
     
     return  np.array(absolute_peaks), np.array(absolute_troughs)
 
-def remove_duplicate_peaks_troughts( records: List[WaterRecord],
-    absolute_peaks: List[WaterRecord],
-    absolute_troughs: List[WaterRecord],
+PEAK, TROUGH = 1, -1
+
+class EventTable:
+    """
+    Peak/trough candidates as parallel arrays sorted by index (a peak
+    before a trough at the same index, like the old stable sort):
+    index into the series, kind (PEAK/TROUGH) and water_level_0.
+    """
+    def __init__(self, index: np.ndarray, kind: np.ndarray, value: np.ndarray):
+        self.index = index
+        self.kind = kind
+        self.value = value
+
+    @classmethod
+    def from_indices(cls, values: np.ndarray, peaks, troughs) -> "EventTable":
+        peaks = np.asarray(peaks, dtype=int).ravel()
+        troughs = np.asarray(troughs, dtype=int).ravel()
+        index = np.concatenate((peaks, troughs))
+        kind = np.concatenate((np.full(len(peaks), PEAK, dtype=np.int8), np.full(len(troughs), TROUGH, dtype=np.int8)))
+        order = np.argsort(index, kind="stable")
+        index, kind = index[order], kind[order]
+        return cls(index, kind, values[index])
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def group_starts(self, breaks: np.ndarray) -> np.ndarray:
+        """
+        Start position of every group, given breaks[k] = True when event
+        k + 1 does not belong to the group of event k.
+        """
+        return np.concatenate(([0], np.flatnonzero(breaks) + 1))
+
+    def best_of_groups(self, starts: np.ndarray, take_max: np.ndarray) -> np.ndarray:
+        """
+        Position of the highest (take_max) or lowest event of every group;
+        the first one on ties, like max()/min() over the group.
+        """
+        n = len(self)
+        lengths = np.diff(np.append(starts, n))
+        target = np.where(take_max, np.maximum.reduceat(self.value, starts), np.minimum.reduceat(self.value, starts))
+        is_best = self.value == np.repeat(target, lengths)
+        return np.minimum.reduceat(np.where(is_best, np.arange(n), n), starts)
+
+    def split(self, positions: np.ndarray, kinds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(peaks, troughs) indices of the events at `positions` labelled `kinds`."""
+        return self.index[positions[kinds == PEAK]], self.index[positions[kinds == TROUGH]]
+
+def remove_duplicate_peaks_troughts( records: WaterSeries | List[WaterRecord],
+    absolute_peaks: List[int],
+    absolute_troughs: List[int],
 ) ->Tuple[np.ndarray, np.ndarray]:
     """
     Lọc các peak/trough tuyệt đối để đảm bảo không có hai peak hoặc hai trough
     xuất hiện liên tiếp nhau.
 
     Tham số:
-    - absolute_peaks: danh sách WaterRecord của các peak tuyệt đối
-    - absolute_troughs: danh sách WaterRecord của các trough tuyệt đối
+    - absolute_peaks: danh sách index của các peak tuyệt đối
+    - absolute_troughs: danh sách index của các trough tuyệt đối
 
     Trả về:
-    - List[ (record, 'peak'|'trough') ] đã được lọc và sắp xếp theo thời gian
+    - (peaks, troughs) index đã được lọc
     """
+    values = as_series(records).water_level_0
     # 1) Kết hợp rồi sort theo thời gian
-    list_all_peaks_troughts_indice = sorted(
-        [(r, 'peak')   for r in absolute_peaks] +
-        [(r, 'trough') for r in absolute_troughs],
-        key=lambda x: x[0]
-    )
-    # 2) Duyệt và gộp những nhóm cùng loại liên tiếp
-    filtered: List[Tuple[int, str]] = []
-    i = 0
-    n = len(list_all_peaks_troughts_indice)
-
-    while i < n:
-        rec_i = list_all_peaks_troughts_indice[i][0]
-        type_i =list_all_peaks_troughts_indice[i][1]
-        # nhóm bắt đầu tại i
-        group = [rec_i]
-        j = i + 1
-        # thu thập hết nhóm cùng type
-        while j < n and list_all_peaks_troughts_indice[j][1] == type_i:
-            group.append(list_all_peaks_troughts_indice[j][0])
-            j += 1
-        # nếu là peak, chọn peak cao nhất; nếu trough, chọn trough thấp nhất
-        if len(group) > 1 and type_i == 'peak':
-            best = max(group, key=lambda r: records[r].water_level_0)
-            filtered.append((best, type_i))
-            LoggerFactory().add_log("WARNING",f"Found dubplicate peak, choose the best: {best}")
-        elif len(group) > 1:
-            best = min(group, key=lambda r: records[r].water_level_0)
-            LoggerFactory().add_log("WARNING",f"Found dubplicate trough, choose the best: {best}")
-            filtered.append((best, type_i))
-        else:
-            # nếu chỉ có một bản ghi trong nhóm, thêm vào filtered
-            filtered.append((group[0], type_i))
-            LoggerFactory().add_log("INFO",f"Adding single record: {group[0]} as {type_i}")
-        # tiếp tục từ sau nhóm
-        i = j
-    absolute_peaks_filtered =[r for r, _ in filtered if _ == 'peak']
-    absolute_troughs_filtered = [r for r, _ in filtered if _ == 'trough']
-    LoggerFactory().add_log("INFO",f"Filtered peaks: {absolute_peaks_filtered}")
-    LoggerFactory().add_log("INFO",f"Filtered troughs: {absolute_troughs_filtered}")
-    print(f"Filtered peaks: {absolute_peaks_filtered}")
-    print(f"Filtered troughs: {absolute_troughs_filtered}")
+    events = EventTable.from_indices(values, absolute_peaks, absolute_troughs)
+    if not len(events):
+        absolute_peaks_filtered = absolute_troughs_filtered = np.array([], dtype=int)
+    else:
+        # 2) Mỗi nhóm cùng loại liên tiếp giữ một event:
+        #    nhóm peak chọn peak cao nhất, nhóm trough chọn trough thấp nhất
+        starts = events.group_starts(np.diff(events.kind) != 0)
+        kinds = events.kind[starts]
+        best = events.best_of_groups(starts, kinds == PEAK)
+        absolute_peaks_filtered, absolute_troughs_filtered = events.split(best, kinds)
+        sizes = np.diff(np.append(starts, len(events)))
+        for kind, name in ((PEAK, "peak"), (TROUGH, "trough")):
+            duplicated = (sizes > 1) & (kinds == kind)
+            if duplicated.any():
+                LoggerFactory().add_log("WARNING", f"Found {int(duplicated.sum())} duplicate {name} groups, choose the best: {events.index[best[duplicated]].tolist()}")
+    LoggerFactory().add_log("INFO",f"Filtered peaks: {absolute_peaks_filtered.tolist()}")
+    LoggerFactory().add_log("INFO",f"Filtered troughs: {absolute_troughs_filtered.tolist()}")
+    print(f"Filtered peaks: {absolute_peaks_filtered.tolist()}")
+    print(f"Filtered troughs: {absolute_troughs_filtered.tolist()}")
     
-    return np.array(absolute_peaks_filtered), np.array(absolute_troughs_filtered)
+    return absolute_peaks_filtered, absolute_troughs_filtered
 
 def remove_closed_peaks_troughts(
-    records: List[WaterRecord],
+    records: WaterSeries | List[WaterRecord],
     absolute_peaks: np.ndarray,
     absolute_troughs: np.ndarray,
     height: int,
@@ -376,115 +434,94 @@ def remove_closed_peaks_troughts(
           * khác      → bỏ nhóm
     """
 
+    values = as_series(records).water_level_0
+
     # 1) Kết hợp và sort theo index
-    events: List[Tuple[int, str]] = [
-        (int(idx), 'peak')   for idx in absolute_peaks
-    ] + [
-        (int(idx), 'trough') for idx in absolute_troughs
-    ]
-    events.sort(key=lambda x: x[0])
-
-    new_peaks = []
-    new_troughs = []
-    n = len(events)
-    n_rec = len(records)
-    i = 0
-
-    # 2) Quét tuần tự, gom nhóm bất kể loại
-    while i < n:
-        idx0, kind0 = events[i]
-        group = [idx0]
-        j = i + 1
-
-        # Gom nhóm khi idx cách nhau ≤ width và value chênh ≤ height
-        while j < n:
-            idxj, _ = events[j]
-            if idxj - group[-1] <= width and \
-               abs(records[idxj].water_level_0 - records[group[-1]].water_level_0) <= height:
-                group.append(idxj)
-                j += 1
-            else:
-                break
-
-        # 3) Xử lý nhóm
-        if len(group) == 1:
-            # đơn lẻ: thêm trực tiếp theo kind0
-            if kind0 == 'peak':
-                new_peaks.append(group[0])
-            else:
-                new_troughs.append(group[0])
-
-        else:  # nhóm nhiều phần tử
-            left, right = group[0], group[-1]
-            # xác định biên trái/phải trong giới hạn array
-            delta_t = width // 2
-            left_b = max(0, left - delta_t)
-            right_b = min(n_rec - 1, right + delta_t)
-
-            # a = left_value - left_boundary_value
-            a = records[left].water_level_0 - records[left_b].water_level_0
-            # b = right_value - right_boundary_value
-            b = records[right].water_level_0 - records[right_b].water_level_0
-
-            if a > 0 and b > 0:
-                # nhóm peak → chọn max
-                best = max(group, key=lambda ix: records[ix].water_level_0)
-                new_peaks.append(best)
-
-            elif a < 0 and b < 0:
-                # nhóm trough → chọn min
-                best = min(group, key=lambda ix: records[ix].water_level_0)
-                new_troughs.append(best)
-
-            # else: bỏ cả nhóm
-
-        # chuyển tới nhóm tiếp theo
-        i = j
+    events = EventTable.from_indices(values, absolute_peaks, absolute_troughs)
+    if not len(events):
+        return np.array([], dtype=int), np.array([], dtype=int)
+    n_rec = len(values)
+
+    # 2) Gom nhóm bất kể loại: event nối vào nhóm của event liền trước khi
+    #    idx cách nhau ≤ width và value chênh ≤ height
+    linked = (np.diff(events.index) <= width) & (np.abs(np.diff(events.value)) <= height)
+    starts = events.group_starts(~linked)
+    ends = np.append(starts[1:], len(events)) - 1
+
+    # 3) Xử lý nhóm: biên trái/phải trong giới hạn array
+    left, right = events.index[starts], events.index[ends]
+    delta_t = width // 2
+    left_b = np.maximum(0, left - delta_t)
+    right_b = np.minimum(n_rec - 1, right + delta_t)
+    # a = left_value - left_boundary_value, b = right_value - right_boundary_value
+    a = values[left] - values[left_b]
+    b = values[right] - values[right_b]
+    kinds = np.where(starts == ends, events.kind[starts],               # đơn lẻ: giữ theo kind
+             np.where((a > 0) & (b > 0), PEAK,                          # nhóm peak → chọn max
+             np.where((a < 0) & (b < 0), TROUGH, 0))).astype(np.int8)   # nhóm trough → min, khác: bỏ
+    best = events.best_of_groups(starts, kinds == PEAK)
+    new_peaks, new_troughs = events.split(best, kinds)
 
     return (
-        np.array(new_peaks,   dtype=int),
-        np.array(new_troughs, dtype=int),
+        new_peaks.astype(int),
+        new_troughs.astype(int),
     )
 
 
     
-def filter_peaks_troughs( records: List[WaterRecord],
-    absolute_peaks: List[WaterRecord],
-    absolute_troughs: List[WaterRecord],
+def filter_peaks_troughs( records: WaterSeries | List[WaterRecord],
+    absolute_peaks: List[int],
+    absolute_troughs: List[int],
 ) -> Tuple[np.ndarray, np.ndarray]:
+    records = as_series(records)
     absolute_peaks_filtered,absolute_troughs_filtered = remove_duplicate_peaks_troughts(records, absolute_peaks, absolute_troughs)
     absolute_peaks_after_remove_closeer, absolute_troughts_after_remove_closeer = remove_closed_peaks_troughts(records, absolute_peaks_filtered.tolist(),absolute_troughs_filtered.tolist(),height= 50,width= 40)
     # write_chart(
-    #     raw_value = np.array([r.water_level_0 for r in records], dtype='int'),
-    #     smooth_value =  np.array([r.water_level_0 for r in records], dtype='int'),
+    #     raw_value = records.water_level_0,
+    #     smooth_value = records.water_level_0,
     #     peaks =      absolute_peaks_after_remove_closeer,
     #     troughs =    absolute_troughts_after_remove_closeer
     # )
     return absolute_peaks_after_remove_closeer, absolute_troughts_after_remove_closeer
 def trend_detected_processes(
-    all_records: List[WaterRecord],
-) -> Tuple[List[WaterRecord], List[WaterRecord], str]:
+    all_records: WaterSeries | List[WaterRecord],
+    now: datetime | None = None,
+) -> Tuple[List[Tuple[WaterRecord, str]], str, WaterRecord]:
     """
-    Xử lý phát hiện xu hướng và đỉnh/đáy từ danh sách bản ghi.
-    Trả về danh sách đỉnh, đáy và mã xu hướng.
+    Xử lý phát hiện xu hướng và đỉnh/đáy từ chuỗi dữ liệu (WaterSeries).
+    Trả về danh sách (WaterRecord, 'peak'|'trough'), mã xu hướng và bản ghi gần nhất
+    (gần `now`, mặc định là thời điểm hiện tại).
+    WaterRecord chỉ được tạo cho các đỉnh/đáy cần đưa vào báo cáo.
     """
-    raw_data = [r.water_level_0 for r in all_records]
-    print(f"Raw data: {raw_data}")
+    series = as_series(all_records)
     # 1) Phát hiện đỉnh/đáy
-    absolute_peakss_indices, absolute_troughs_indices = detect_absolute_peaks_troughs(all_records)
-    absolute_peaks_indices, absolute_troughs_indices = check_last_point(all_records, absolute_peakss_indices.tolist(), absolute_troughs_indices.tolist(), delta=15)
-    absolute_peaks_indices,absolute_troughs_indices  = filter_peaks_troughs( all_records,absolute_peaks_indices.tolist(), absolute_troughs_indices.tolist())
+    absolute_peakss_indices, absolute_troughs_indices = detect_absolute_peaks_troughs(series, index=series.time_index)
+    return finish_trend_detection(series, absolute_peakss_indices, absolute_troughs_indices, now=now)
+
+def finish_trend_detection(
+    series: WaterSeries,
+    absolute_peakss_indices: np.ndarray,
+    absolute_troughs_indices: np.ndarray,
+    now: datetime | None = None,
+) -> Tuple[List[Tuple[WaterRecord, str]], str, WaterRecord]:
+    """
+    Các bước sau detect_absolute_peaks_troughs: kiểm tra điểm cuối, lọc
+    đỉnh/đáy và xác định xu hướng. Dùng chung cho chế độ full và incremental.
+    """
+    index = series.time_index
+    absolute_peaks_indices, absolute_troughs_indices = check_last_point(series, absolute_peakss_indices.tolist(), absolute_troughs_indices.tolist(), delta=15, index=index)
+    absolute_peaks_indices,absolute_troughs_indices  = filter_peaks_troughs( series,absolute_peaks_indices.tolist(), absolute_troughs_indices.tolist())
     filtered = [
-        (all_records[i], 'peak')   for i in absolute_peaks_indices
+        (series[i], 'peak')   for i in absolute_peaks_indices
     ] + [
-        (all_records[i], 'trough') for i in absolute_troughs_indices
+        (series[i], 'trough') for i in absolute_troughs_indices
     ]
     filtered.sort(key=lambda x: x[0].date_time)  # Sắp xếp theo thời gian
     # Log and print results
-    LoggerFactory().add_log("INFO", f"Raw data: {raw_data}", tag="ReportMaking")
-    LoggerFactory().add_log("INFO", f"Absolute peaks: {[all_records[r].date_time.strftime('%Y-%m-%d %H:%M') for r in absolute_peaks_indices]}", tag="ReportMaking")
-    LoggerFactory().add_log("INFO", f"Absolute troughs: {[all_records[r].date_time.strftime('%Y-%m-%d %H:%M') for r in absolute_troughs_indices]}", tag="ReportMaking")
+    LoggerFactory().add_log("DEBUG", lambda: f"Raw data: {series.water_level_0.tolist()}", tag="ReportMaking")
+    LoggerFactory().add_log("INFO", f"Absolute peaks: {[series.date_time(r).strftime('%Y-%m-%d %H:%M') for r in absolute_peaks_indices]}", tag="ReportMaking")
+    LoggerFactory().add_log("INFO", f"Absolute troughs: {[series.date_time(r).strftime('%Y-%m-%d %H:%M') for r in absolute_troughs_indices]}", tag="ReportMaking")
     print(f"Filtered peaks/troughs: {filtered}")
     # 2) Phát hiện xu hướng
-    filtered, trend_code ,closest_record= detect_last_trend(all_records, filtered)
-    return filtered, trend_code, closest_record
\ No newline at end of file
+    filtered, trend_code ,closest_record= detect_last_trend(series, filtered, index=index, now=now)
+    return filtered, trend_code, closest_record
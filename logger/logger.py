@@ -1,6 +1,15 @@
 import os
+import time
+import queue
+import atexit
 import threading
 from datetime import datetime
+from config import LOG_LEVEL, LOG_TAG_LEVELS, LOG_RATE_LIMITS
+
+LOG_DIR = "logs"
+QUEUE_SIZE = 10000  # số dòng log tối đa chờ ghi
+BATCH_SIZE = 500    # số dòng tối đa cho một lần write()
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "BUG": 40}
 
 class LoggerFactory:
     _instance = None
@@ -10,26 +19,216 @@ class LoggerFactory:
         with cls._lock:
             if cls._instance is None:
                 print("[LoggerFactory] Creating global singleton logger instance")
-                cls._instance = super().__new__(cls)
+                instance = super().__new__(cls)
+                instance._queue = queue.Queue(maxsize=QUEUE_SIZE)
+                instance._writer = None
+                instance._file = None
+                instance._file_date = None
+                instance._state_lock = threading.Lock()
+                instance._queue_lock = threading.Lock()  # close() chặn enqueue cho tới khi writer dừng
+                instance._default_level = LEVELS[LOG_LEVEL]
+                instance._tag_levels = {tag: LEVELS[level] for tag, level in LOG_TAG_LEVELS.items()}
+                instance._rate_limits = {}
+                instance._sampling = {}
+                for tag, (max_lines, per_seconds) in LOG_RATE_LIMITS.items():
+                    instance.set_rate_limit(tag, max_lines, per_seconds)
+                atexit.register(instance.close)
+                cls._instance = instance
             #else:
             #    print("[LoggerFactory] Reusing global logger instance")
             return cls._instance
 
-    def add_log(self, log_type, content, tag="MyApp"):
-        if log_type not in ["INFO", "BUG", "WARNING"]:
-            raise ValueError("Invalid log type. Use INFO, BUG, or WARNING")
+    def add_log(self, log_type, content, *args, tag=None):
+        """
+        Queue one log line.
+
+        content có thể là:
+          - chuỗi thường,
+          - chuỗi kiểu %-format kèm args: add_log("DEBUG", "Data: %s", data, tag=...),
+          - callable không tham số trả về chuỗi: add_log("DEBUG", lambda: f"...", tag=...).
+        Việc format chỉ chạy khi dòng log thực sự được ghi (qua được level,
+        sampling và rate limit của tag).
+        Cách gọi cũ add_log(level, content, tag) vẫn được hiểu là tag khi
+        content không có %; args thừa khác thì báo TypeError.
+        """
+        if log_type not in LEVELS:
+            raise ValueError("Invalid log type. Use DEBUG, INFO, BUG, or WARNING")
+        templated = isinstance(content, str) and "%" in content
+        if tag is None:
+            if len(args) == 1 and isinstance(args[0], str) and isinstance(content, str) and not templated:
+                tag, args = args[0], ()
+            else:
+                tag = "MyApp"
+        if args and not templated:
+            raise TypeError(f"add_log() got {len(args)} format args but content has no %-placeholder")
+        if not self.is_enabled(log_type, tag):
+            return
+        note = None
+        if LEVELS[log_type] < LEVELS["WARNING"]:
+            allowed, note = self._admit(tag)
+            if not allowed:
+                return
+
+        if callable(content):
+            content = content()
+        elif args:
+            content = content % args
 
         now = datetime.now()
-        date_str = now.strftime("%Y-%m-%d")
-        time_str = now.strftime("%Y-%m-%d %H:%M:%S")
-        filename = f"logs/{date_str}.txt"
-        os.makedirs("logs", exist_ok=True)
-
-        def write():
-            log_entry = f"[{time_str}] [{log_type}] [{tag}] {content}\r\n"
-            #print(f"[LoggerFactory] Writing log to {filename}: {log_entry.strip()}")
-            with open(filename, "a", encoding="utf-8") as file:
-                file.write(log_entry)
-
-        thread = threading.Thread(target=write)
-        thread.start()
+        stamp = now.strftime('%Y-%m-%d %H:%M:%S')
+        with self._queue_lock:
+            self._ensure_writer()
+            if note:
+                self._queue.put((now, f"[{stamp}] [WARNING] [{tag}] {note}\r\n"))
+            # Queue có giới hạn: nếu writer không kịp ghi thì put() sẽ chờ
+            self._queue.put((now, f"[{stamp}] [{log_type}] [{tag}] {content}\r\n"))
+
+    def is_enabled(self, log_type, tag="MyApp") -> bool:
+        """
+        True if a line of this level and tag passes the minimum level; use it to
+        guard expensive work done only for logging.
+        """
+        return LEVELS[log_type] >= self._tag_levels.get(tag, self._default_level)
+
+    def set_level(self, log_type, tag=None):
+        """
+        Set the minimum level written for one tag, or the default level when tag is None.
+        """
+        if log_type not in LEVELS:
+            raise ValueError("Invalid log type. Use DEBUG, INFO, BUG, or WARNING")
+        if tag is None:
+            self._default_level = LEVELS[log_type]
+        else:
+            self._tag_levels[tag] = LEVELS[log_type]
+
+    def set_rate_limit(self, tag, max_lines, per_seconds=60.0):
+        """
+        Write at most max_lines DEBUG/INFO lines of this tag per per_seconds;
+        the number of suppressed lines is reported when the next window opens.
+        max_lines=None removes the limit.
+        """
+        with self._state_lock:
+            if max_lines is None:
+                self._rate_limits.pop(tag, None)
+            else:
+                self._rate_limits[tag] = {"max": max_lines, "period": per_seconds,
+                                          "start": time.monotonic(), "count": 0, "dropped": 0}
+
+    def set_sampling(self, tag, every):
+        """
+        Write only one of every `every` DEBUG/INFO lines of this tag (1 or None = all).
+        """
+        with self._state_lock:
+            if not every or every <= 1:
+                self._sampling.pop(tag, None)
+            else:
+                self._sampling[tag] = {"every": every, "seen": 0}
+
+    def _admit(self, tag):
+        """
+        Apply sampling and rate limit of the tag. Returns (allowed, note) where
+        note reports lines suppressed in the previous window.
+        """
+        with self._state_lock:
+            sampling = self._sampling.get(tag)
+            if sampling is not None:
+                sampling["seen"] += 1
+                if (sampling["seen"] - 1) % sampling["every"]:
+                    return False, None
+            limit = self._rate_limits.get(tag)
+            if limit is None:
+                return True, None
+            note = None
+            now = time.monotonic()
+            if now - limit["start"] >= limit["period"]:
+                if limit["dropped"]:
+                    note = f"Rate limit: suppressed {limit['dropped']} lines of tag {tag}"
+                limit["start"], limit["count"], limit["dropped"] = now, 0, 0
+            if limit["count"] >= limit["max"]:
+                limit["dropped"] += 1
+                return False, None
+            limit["count"] += 1
+            return True, note
+
+    def flush(self):
+        """
+        Block until every queued line has been written to disk.
+        """
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """
+        Flush pending lines, stop the writer thread and close the log file.
+        add_log() calls from other threads wait until the writer has stopped,
+        so no line is queued behind the stop marker; they then start a new
+        writer.
+        """
+        with self._queue_lock, self._lock:
+            writer = self._writer
+            if writer is None or not writer.is_alive():
+                return
+            self._queue.put(None)
+            writer.join()
+            self._writer = None
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name="LoggerWriter", daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        """
+        Writer thread: gom các dòng đang chờ thành batch, mỗi batch một lần
+        write() vào file của ngày tương ứng, đổi file khi qua nửa đêm.
+        """
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            try:
+                for item in batch:
+                    if item is None:
+                        running = False
+                        continue
+                    when, line = item
+                    if self._file_date != when.date() and lines:
+                        self._write(lines)
+                        lines = []
+                    self._open_for(when)
+                    lines.append(line)
+                if lines:
+                    self._write(lines)
+            except OSError as e:
+                print(f"[LoggerFactory] Failed to write log: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        self._close_file()
+
+    def _open_for(self, when: datetime):
+        if self._file is not None and self._file_date == when.date():
+            return
+        self._close_file()
+        os.makedirs(LOG_DIR, exist_ok=True)
+        filename = os.path.join(LOG_DIR, f"{when.strftime('%Y-%m-%d')}.txt")
+        self._file = open(filename, "a", encoding="utf-8", newline="")
+        self._file_date = when.date()
+
+    def _write(self, lines):
+        self._file.write("".join(lines))
+        self._file.flush()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_date = None
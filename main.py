@@ -1,80 +1,123 @@
+import sys
+from start_up.import_profiler import ImportProfiler
+# phải cài trước mọi import khác để đo được cả chi phí khởi động
+import_profiler = ImportProfiler().start() if "--profile-imports" in sys.argv else None
 from network.fetcher import DataFetcher
 from data.data_handler import DataProcessor
 from logger.logger import LoggerFactory
 # from notify.telegram_bot import TelegramNotifier
-from automation.selenium_controller import selenium_controller
+from automation.http_submitter import submit_report
 from data.filter import FilterWaterLevel
-from data.trend_detected import *
-from data.report_making import make_report
+from data.report_making import make_report, is_synoptic_hour
+from pipeline.stations import get_station
+from pipeline.scheduler import Scheduler
+from pipeline.metrics import RunMetrics
 import requests
-import time
-from datetime import datetime, timedelta
+from network.http_client import HttpClient
+from config import UPDATE_WATER_URL
+import argparse
+import multiprocessing
+from datetime import datetime
 
 #from startup.auto_start import AutoStartManager
 logger = LoggerFactory()
 fetcher = DataFetcher()
 processor = DataProcessor()
 filterWaterLevel = FilterWaterLevel()
+station = get_station()
 def run_every_hour(task_func):
+    """
+    Run task_func(slot_time) at every full hour, each run in its own process
+    (killed after SCHEDULE_RUN_TIMEOUT), see pipeline.scheduler.Scheduler.
+    """
+    Scheduler(task_func).run_forever()
 
-    while True:
-        now = datetime.now()
-        # Tính thời điểm đầu giờ kế tiếp
-        next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-        wait_seconds = (next_hour - now).total_seconds()
-        print(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] waiting time {wait_seconds:.0f}s for next task...")
-        time.sleep(wait_seconds)
-        #time.sleep(1)
-        # Gọi hàm nhiệm vụ
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Running task...")
-        try:
-            task_func()
-        except Exception as e:
-            print(f"Error: {e}")
-            
-def main():
+def main(now: datetime | None = None):
+    """
+    One pipeline run for the logical time `now` (default: current time).
+    Per-stage timings and counters are written by pipeline.metrics.
+    """
+    now = now or datetime.now()
+    metrics = RunMetrics(station.serial_number, now)
     try:
         logger.add_log("INFO", "**********************START MAIN APP**********************", tag="Main")
-        data = fetcher.fetch()
+        with metrics.stage("fetch") as stage:
+            data = fetcher.fetch(station.serial_number, now=now)
+            stage["records_out"] = len(data)
         if not data:
             logger.add_log("WARNING", "No data fetched", tag="Main")
+            metrics.fail("No data fetched")
             return
         # data = fetcher.fetch_test()  # Uncomment for testing
-        result = processor.process(data)
+        with metrics.stage("parse") as stage:
+            result = processor.process(data)
+            stage["records_in"], stage["records_out"] = len(data), len(result)
         if not result:
             logger.add_log("WARNING", "No records processed", tag="Main")
             print("No records processed")
+            metrics.fail("No records processed")
             return
-        result = filterWaterLevel.detect_outlier_by_median(result)
-        for i in result:
-            logger.add_log("INFO", f"Record: {i}", tag="Main")
-            print(f"Record: {i}")
-        filtered,trend_code, closest_record = trend_detected_processes(result)
-        report = make_report( filtered,trend_code, closest_record)
+        with metrics.stage("outlier") as stage:
+            keep_mask = filterWaterLevel.detect_outlier_by_median(result)
+            stage["records_in"] = len(result)
+            result = result[keep_mask[0]]
+            stage["records_out"] = len(result)
+            stage["outliers"] = stage["records_in"] - stage["records_out"]
+        logger.add_log("INFO", f"Records after outlier filter: {result}", tag="Main")
+        print(f"Records after outlier filter: {result}")
+        # import muộn: scipy.ndimage chỉ cần khi đã có dữ liệu để phân tích
+        from data.incremental_trend import detect_trend
+        with metrics.stage("trend") as stage:
+            filtered,trend_code, closest_record = detect_trend(station.serial_number, result, now=now)
+            stage["records_in"], stage["events"] = len(result), len(filtered)
+        with metrics.stage("report") as stage:
+            report = make_report( filtered,trend_code, closest_record, report_code=station.report_code, now=now, station=station.serial_number)
+            stage["events"] = len(filtered)
         print(f"Report: {report}")
         logger.add_log("INFO", f"report:{report}", tag="Main")
-        if(datetime.now().hour == 1 or datetime.now().hour == 7 or datetime.now().hour == 13 or datetime.now().hour == 19):
-            report
-        else:
+        if not is_synoptic_hour(now):
             report = "checking"
         payload = {'text': report}
-        selenium_controller(report)
+        with metrics.stage("submit") as stage:
+            stage["ok"] = int(bool(submit_report(report, now=now)))
         try:
-            response = requests.post("https://donuoctrieuduong.xyz/water_level_api/test/update_water.php", json=payload)
-            response.raise_for_status()  # ném exception nếu status != 2xx
+            with metrics.stage("update_water"):
+                response = HttpClient.default().post(UPDATE_WATER_URL, json=payload)
+                response.raise_for_status()  # ném exception nếu status != 2xx
             processor.clear()  # Xoá bộ đệm sau khi xử lý xong
             # Nếu API trả về JSON, parse và trả về
             return response.json()
         except requests.RequestException as e:
             print(f"Request failed: {e}")
+            metrics.fail(f"update_water: {e}")
             processor.clear()  # Xoá bộ đệm sau khi xử lý xong
             return None
         
     except Exception as e:
         logger.add_log("BUG", str(e), tag="Main")
+        metrics.fail(str(e))
         processor.clear()
+    finally:
+        metrics.write()
+        logger.flush()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Fetch, analyse and submit one water level report.")
+    parser.add_argument("--profile-imports", action="store_true",
+                        help="print the cost of every import (startup and lazy) after the run")
+    parser.add_argument("--forever", action="store_true",
+                        help="keep running and report at every slot (pipeline.scheduler) instead of once, e.g. from cron")
+    args = parser.parse_args()
  #   startup.add_to_startup()
-    #run_every_hour(main)
-    main()
+    if args.forever:
+        try:
+            run_every_hour(main)
+        except KeyboardInterrupt:
+            print("Scheduler stopped")
+    else:
+        main()
+    if import_profiler is not None:
+        import_profiler.stop()
+        print(import_profiler.report(), file=sys.stderr)
+    logger.close()
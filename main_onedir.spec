@@ -0,0 +1,50 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Onedir variant of main.spec: the interpreter and libraries stay unpacked
+# in dist/main/, so start-up skips the one-file self-extraction to a temp dir.
+# The plotting stack is only used by the chart debug helpers and is left out;
+# selenium stays in (lazy fallback of automation.http_submitter).
+#
+#     pyinstaller main_onedir.spec
+#     dist/main/main --profile-imports
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['matplotlib', 'tkinter', '_tkinter', 'PIL', 'IPython', 'test_peak'],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='main',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
@@ -1,68 +1,161 @@
 import requests
 import json
-from config import API_URL
+from datetime import datetime, timedelta
+from config import API_URL, FETCH_WORKERS, DEFAULT_STATION, ARCHIVE_DIR
+from logger.logger import LoggerFactory
+from network.record_cache import RecordCache
+from network.http_client import HttpClient
+from network.range_planner import TableRequest, plan_table_requests, merge_by_time, merge_series_by_time
+from network.json_stream import iter_json_array, CHUNK_SIZE
+from data.data_handler import DataProcessor, WaterSeries
+from data.archive import SeriesArchive
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import orjson  # tuỳ chọn: parse JSON nhanh hơn nhiều so với json chuẩn
+except ImportError:
+    orjson = None
 MINUTE_DEVIDE = 60*24*4
+
+def decode_json(content: bytes):
+    """
+    Decode a JSON payload with orjson when installed, else the stdlib json.
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
 class DataFetcher:
-    def fetch(self):
+    def __init__(self, cache: RecordCache | None = None, client: HttpClient | None = None,
+                 archive: SeriesArchive | None = None):
+        self.cache = cache if cache is not None else RecordCache()
+        self.client = client if client is not None else HttpClient.default()
+        # Kho lưu trữ lâu dài; ARCHIVE_DIR rỗng thì không lưu
+        self.archive = archive if archive is not None else (SeriesArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None)
+
+    def fetch(self, serial_number: str = DEFAULT_STATION, now: datetime | None = None):
         """
-        Fetch water level data, splitting across month boundary if needed,
-        print and log fetched data.
+        Fetch water level data of one station for the last MINUTE_DEVIDE minutes.
+        Only rows newer than the local cache watermark are requested from the
+        server; they are merged into the cache by id, data older than the
+        lookback is evicted, and the whole window is returned from the cache.
+        New rows are also appended to the long-term SeriesArchive.
+        `now` is the end of the window (default: current time).
         """
-        from datetime import datetime, timedelta
-        from logger.logger import LoggerFactory
-
         logger = LoggerFactory()
-        now = datetime.now()
+        now = now or datetime.now()
         begin = now - timedelta(minutes=MINUTE_DEVIDE) # time range for fetching data
-        serial_number = "TD_MW_0011"
 
-        def build_params(dt_start, dt_end):
-            table_name = f"water_level_{dt_end.month:02d}_{dt_end.year}"
-            return {
-                'table_name': table_name,
-                'serial_number': serial_number,
-                'date_begin': f"{dt_start.year}-{dt_start.month}-{dt_start.day} {dt_start.hour}:{dt_start.minute}:{dt_start.second}",
-                'date_end': f"{dt_end.year}-{dt_end.month}-{dt_end.day} {dt_end.hour}:{dt_end.minute}:{dt_end.second}"
-            }
+        synced_until = self.cache.last_timestamp(serial_number)
+        fetch_begin = begin if synced_until is None or synced_until < begin else synced_until
+        logger.add_log("INFO", f"Cache watermark: {synced_until}, fetching from {fetch_begin}", tag="DataFetcher")
 
-        def fetch_range(dt_start, dt_end):
-            params = build_params(dt_start, dt_end)
-            print(f"[DataFetcher] Requesting: {params}")
-            logger.add_log("INFO", f"Request params: {params}", tag="DataFetcher")
-            resp = requests.get(API_URL, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-            #print(f"[DataFetcher] Received {len(data)} records")
-            logger.add_log("INFO", f"API: {API_URL}?{requests.compat.urlencode(params)}", tag="DataFetcher")
-            logger.add_log("INFO", f"Received {len(data)} records", tag="DataFetcher")
-            logger.add_log("INFO", f"Data: {data}", tag="DataFetcher")
-            return data
-
-        # Single or split request
-        if begin.month == now.month:
-            data_pack = fetch_range(begin, now)
-        else:
-            if(begin.month == 12):
-                data_pack_1_end_date = datetime( year=begin.year - 1, month=12, day=31, hour=23, minute=59, second=59)
-                data_pack_1_begin_date = begin
-                data_pack_2_begin_date = now.replace(month=1, year=now.year, day=1, hour=0, minute=0, second=0)
-                data_pack_2_end_date = now
-            elif ( begin.month == 1 or begin.month == 3 or begin.month == 5 or begin.month == 7 or begin.month == 8 or begin.month == 10 ):
-                data_pack_1_end_date = begin.replace(day=31, hour=23, minute=59, second=59)
-                data_pack_1_begin_date = begin
-                data_pack_2_begin_date = now.replace(day=1, hour=0, minute=0, second=0)
-                data_pack_2_end_date = now
-            else:
-                data_pack_1_end_date = begin.replace(day=30, hour=23, minute=59, second=59)
-                data_pack_1_begin_date = begin
-                data_pack_2_begin_date = now.replace(day=1, hour=0, minute=0, second=0)
-                data_pack_2_end_date = now
-                
-            data_pack1 = fetch_range(data_pack_1_begin_date, data_pack_1_end_date)
-            data_pack2 = fetch_range(data_pack_2_begin_date, data_pack_2_end_date)
-            data_pack= data_pack1 + data_pack2
+        new_rows = self.fetch_between(serial_number, fetch_begin, now)
+        self.cache.merge(serial_number, new_rows)
+        self.archive_rows(serial_number, new_rows)
+        self.cache.evict(serial_number, begin)
+        data_pack = self.cache.load(serial_number, begin, now)
+        logger.add_log("INFO", f"Returning {len(data_pack)} records from cache ({len(new_rows)} fetched)", tag="DataFetcher")
         return data_pack
 
+    def fetch_between(self, serial_number, begin, now):
+        """
+        Fetch rows of [begin, now] from the server: one request per monthly
+        table (see plan_table_requests), run concurrently, then merged by
+        created_at with rows repeated inside a table (same id) removed.
+        """
+        plan = plan_table_requests(begin, now)
+        if not plan:
+            return []
+        if len(plan) == 1:
+            return merge_by_time([self.fetch_table(serial_number, plan[0])])
+        workers = min(len(plan), FETCH_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="DataFetcher") as pool:
+            parts = list(pool.map(lambda request: self.fetch_table(serial_number, request), plan))
+        return merge_by_time(parts)
+
+    def fetch_series_between(self, serial_number, begin, now) -> WaterSeries:
+        """
+        Streaming counterpart of fetch_between for long ranges (backfill):
+        each monthly table is parsed straight from the response into a
+        WaterSeries (see fetch_table_series), then the parts are merged by
+        time with rows repeated inside a table removed, like merge_by_time.
+        """
+        plan = plan_table_requests(begin, now)
+        if not plan:
+            return WaterSeries.empty(serial_number)
+        if len(plan) == 1:
+            return merge_series_by_time([self.fetch_table_series(serial_number, plan[0])])
+        workers = min(len(plan), FETCH_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="DataFetcher") as pool:
+            parts = list(pool.map(lambda request: self.fetch_table_series(serial_number, request), plan))
+        return merge_series_by_time(parts)
+
+    def archive_rows(self, serial_number, rows):
+        """
+        Append fetched rows to the long-term archive. Failures are logged:
+        archiving must never break a run.
+        """
+        if self.archive is None or not rows:
+            return 0
+        try:
+            return self.archive.append(DataProcessor().process(rows), serial_number)
+        except (OSError, ValueError) as e:
+            LoggerFactory().add_log("BUG", f"Cannot archive {len(rows)} rows of {serial_number}: {e}", tag="DataFetcher")
+            return 0
+
+    def fetch_table(self, serial_number, request: TableRequest):
+        """
+        Fetch one monthly table range, print and log fetched data.
+        """
+        logger = LoggerFactory()
+        params = _table_params(serial_number, request)
+        print(f"[DataFetcher] Requesting: {params}")
+        logger.add_log("INFO", f"Request params: {params}", tag="DataFetcher")
+        resp = self.client.get(API_URL, params=params)
+        resp.raise_for_status()
+        data = decode_json(resp.content)
+        logger.add_log("DEBUG", lambda: f"API: {API_URL}?{requests.compat.urlencode(params)}", tag="DataFetcher")
+        logger.add_log("INFO", f"Received {len(data)} records from {request.table_name}", tag="DataFetcher")
+        logger.add_log("DEBUG", "Data: %s", data, tag="DataFetcher")
+        return data
+
+    def fetch_table_series(self, serial_number, request: TableRequest) -> WaterSeries:
+        """
+        Fetch one monthly table range as a WaterSeries without materialising
+        the payload: the response is read with stream=True, decoded item by
+        item (iter_json_array) and parsed in batches into typed column
+        buffers (DataProcessor.process_stream).
+        """
+        logger = LoggerFactory()
+        params = _table_params(serial_number, request)
+        print(f"[DataFetcher] Requesting (stream): {params}")
+        logger.add_log("INFO", f"Request params: {params}", tag="DataFetcher")
+        received = 0
+
+        def chunks(resp):
+            nonlocal received
+            for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                received += len(chunk)
+                yield chunk
+
+        resp = self.client.get(API_URL, params=params, stream=True)
+        try:
+            resp.raise_for_status()
+            series = DataProcessor().process_stream(iter_json_array(chunks(resp)))
+        finally:
+            resp.close()
+        logger.add_log("INFO", f"Received {len(series)} records ({received} bytes) from {request.table_name}", tag="DataFetcher")
+        return series
+
     def fetch_test(self, file_path="test/data_test.txt"):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
\ No newline at end of file
+        with open(file_path, "rb") as f:
+            return decode_json(f.read())
+
+def _table_params(serial_number, request: TableRequest) -> dict:
+    dt_start, dt_end = request.begin, request.end
+    return {
+        'table_name': request.table_name,
+        'serial_number': serial_number,
+        'date_begin': f"{dt_start.year}-{dt_start.month}-{dt_start.day} {dt_start.hour}:{dt_start.minute}:{dt_start.second}",
+        'date_end': f"{dt_end.year}-{dt_end.month}-{dt_end.day} {dt_end.hour}:{dt_end.minute}:{dt_end.second}"
+    }
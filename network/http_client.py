@@ -0,0 +1,141 @@
+import time
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+import requests
+from requests.adapters import HTTPAdapter
+from config import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF, HTTP_POOL_SIZE
+from logger.logger import LoggerFactory
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0  # giây
+
+@dataclass
+class RequestStat:
+    method: str
+    url: str
+    status: int | None
+    elapsed: float      # giây, tính cả các lần retry
+    attempts: int
+    bytes: int
+
+class HttpClient:
+    """
+    Shared HTTP client for every outbound call.
+
+    - one pooled requests.Session (keep-alive, no new TCP/TLS handshake per call)
+    - (connect, read) timeouts on every request
+    - GET is retried on connection errors, timeouts and 429/5xx with
+      exponential backoff and jitter; POST is sent once (not idempotent)
+    - per-request latency, size and attempts are kept in `stats`; running
+      totals over every client of the process are kept in `HttpClient.totals`
+    """
+    _default = None
+    _default_lock = threading.Lock()
+    totals = {"requests": 0, "bytes": 0, "retries": 0, "errors": 0}
+    _totals_lock = threading.Lock()
+
+    def __init__(self,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = HTTP_READ_TIMEOUT,
+                 retries: int = HTTP_RETRIES,
+                 backoff: float = HTTP_BACKOFF,
+                 pool_size: int = HTTP_POOL_SIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.logger = LoggerFactory()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats: deque[RequestStat] = deque(maxlen=1000)
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "HttpClient":
+        """
+        Process-wide client shared by the fetcher and the report POST.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def get(self, url: str, params=None, **kwargs) -> requests.Response:
+        """
+        GET with retries; the last response (or exception) is returned (raised)
+        once the retries are used up.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                resp = self.session.get(url, params=params, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt > self.retries:
+                    self._record("GET", url, None, started, attempt, 0)
+                    raise
+                self._sleep_before_retry(attempt, f"{type(e).__name__}: {e}", url)
+                continue
+            if resp.status_code in RETRY_STATUS and attempt <= self.retries:
+                resp.close()
+                self._sleep_before_retry(attempt, f"HTTP {resp.status_code}", url)
+                continue
+            self._record("GET", url, resp.status_code, started, attempt, self._size(resp, kwargs))
+            return resp
+
+    def post(self, url: str, data=None, json=None, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        try:
+            resp = self.session.post(url, data=data, json=json, **kwargs)
+        except requests.RequestException:
+            self._record("POST", url, None, started, 1, 0)
+            raise
+        self._record("POST", url, resp.status_code, started, 1, self._size(resp, kwargs))
+        return resp
+
+    def close(self):
+        self.session.close()
+
+    def snapshot(self) -> list[RequestStat]:
+        with self._stats_lock:
+            return list(self.stats)
+
+    @classmethod
+    def totals_snapshot(cls) -> dict[str, int]:
+        """
+        Copy of the process-wide counters; diff two snapshots to get the
+        traffic of a stage.
+        """
+        with cls._totals_lock:
+            return dict(cls.totals)
+
+    def _sleep_before_retry(self, attempt: int, reason: str, url: str):
+        delay = min(MAX_BACKOFF, self.backoff * (2 ** (attempt - 1)))
+        delay += random.uniform(0, delay)  # jitter
+        self.logger.add_log("WARNING", f"GET {url} failed ({reason}), retry {attempt}/{self.retries} in {delay:.1f}s", tag="HttpClient")
+        time.sleep(delay)
+
+    def _record(self, method, url, status, started, attempts, size):
+        stat = RequestStat(method, url, status, time.perf_counter() - started, attempts, size)
+        with self._stats_lock:
+            self.stats.append(stat)
+        with HttpClient._totals_lock:
+            totals = HttpClient.totals
+            totals["requests"] += 1
+            totals["bytes"] += size
+            totals["retries"] += attempts - 1
+            totals["errors"] += status is None or status >= 400
+        self.logger.add_log("INFO", f"{method} {url} → {status} in {stat.elapsed * 1000:.0f} ms ({attempts} attempt(s), {size} bytes)", tag="HttpClient")
+
+    @staticmethod
+    def _size(resp: requests.Response, kwargs) -> int:
+        # Với stream=True không đọc body ở đây; dùng Content-Length nếu có
+        if kwargs.get("stream"):
+            return int(resp.headers.get("Content-Length") or 0)
+        return len(resp.content)
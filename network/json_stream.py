@@ -0,0 +1,109 @@
+import json
+import codecs
+from typing import Iterable, Iterator
+
+CHUNK_SIZE = 64 * 1024
+# Một item (một dòng của bảng) chưa giải mã được quá mức này → payload hỏng
+MAX_ITEM_SIZE = 4 * CHUNK_SIZE
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = ",]" + _WHITESPACE
+
+def iter_json_array(chunks: Iterable[bytes], encoding: str = "utf-8",
+                    max_item_size: int = MAX_ITEM_SIZE) -> Iterator:
+    """
+    Yield the items of a top-level JSON array one at a time while the
+    bytes arrive, e.g. from resp.iter_content() or a file read in chunks.
+
+    Only the item being decoded and the unread tail of the current chunk
+    are held in memory, never the whole payload. Items are decoded with
+    the stdlib scanner (json.JSONDecoder.raw_decode); an item split across
+    chunks is retried once more bytes have arrived. A number or literal is
+    only taken once the delimiter after it has arrived ("1." + "5" is 1.5).
+    Raises ValueError if the payload is not a JSON array, or if an item
+    still cannot be decoded after max_item_size characters.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ""
+    pos = 0
+    state = "start"          # start → item → comma → ... → end
+    chunks = iter(chunks)
+    exhausted = False
+    while True:
+        # Bỏ khoảng trắng; hết buffer thì đọc thêm
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buffer):
+            if exhausted:
+                break
+            buffer = buffer[pos:] + _next_text(chunks, text_decoder)
+            pos = 0
+            if not buffer:
+                exhausted = True
+                buffer = text_decoder.decode(b"", final=True)
+            continue
+
+        char = buffer[pos]
+        if state == "start":
+            if buffer.startswith("\ufeff", pos):
+                pos += 1
+                continue
+            if char != "[":
+                raise ValueError(f"Expected a JSON array, got {char!r}")
+            pos += 1
+            state = "first"
+        elif state in ("first", "item"):
+            if char == "]" and state == "first":
+                state = "end"
+                pos += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+                end = None
+            # số/literal chỉ xong khi đã thấy ký tự phân cách sau nó ("1." còn chờ "5")
+            if end is None or not (exhausted or isinstance(item, (dict, list, str))
+                                   or (end < len(buffer) and buffer[end] in _DELIMITERS)):
+                # item chưa nhận đủ: đọc thêm rồi thử lại, nhưng không giữ mãi phần còn lại của payload
+                if len(buffer) - pos > max_item_size:
+                    raise ValueError(f"JSON array item not decodable within {max_item_size} characters: {buffer[pos:pos + 80]!r}...")
+                more = _next_text(chunks, text_decoder)
+                if not more:
+                    exhausted = True
+                    more = text_decoder.decode(b"", final=True)
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            pos = end
+            state = "comma"
+            yield item
+        elif state == "comma":
+            if char == ",":
+                state = "item"
+            elif char == "]":
+                state = "end"
+            else:
+                raise ValueError(f"Expected ',' or ']' at offset {pos}, got {char!r}")
+            pos += 1
+        else:
+            raise ValueError(f"Extra data after the JSON array: {char!r}")
+    if state != "end":
+        raise ValueError("Truncated JSON array")
+
+def _next_text(chunks: Iterator[bytes], text_decoder) -> str:
+    """
+    Text of the next non-empty chunk, "" once the chunks are exhausted.
+    """
+    for chunk in chunks:
+        if chunk:
+            text = text_decoder.decode(chunk)
+            if text:
+                return text
+    return ""
+
+def iter_file_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
@@ -0,0 +1,76 @@
+import heapq
+import calendar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import numpy as np
+from network.record_cache import parse_created_at, table_name_for
+from data.data_handler import WaterSeries
+
+@dataclass(frozen=True)
+class TableRequest:
+    table_name: str
+    begin: datetime
+    end: datetime
+
+def plan_table_requests(begin: datetime, end: datetime) -> list[TableRequest]:
+    """
+    Split [begin, end] into one request per monthly table water_level_MM_YYYY.
+    Each month segment ends at the last second of the month
+    (calendar.monthrange), the next one starts at 00:00:00 of day 1.
+    """
+    if end < begin:
+        return []
+    plan = []
+    start = begin
+    while True:
+        last_day = calendar.monthrange(start.year, start.month)[1]
+        month_end = datetime(start.year, start.month, last_day, 23, 59, 59)
+        if end <= month_end:
+            plan.append(TableRequest(table_name_for(start), start, end))
+            return plan
+        plan.append(TableRequest(table_name_for(start), start, month_end))
+        start = month_end + timedelta(seconds=1)
+
+def _row_time(row: dict) -> datetime:
+    try:
+        return parse_created_at(row)
+    except (TypeError, ValueError):
+        return datetime.min  # dòng lỗi để DataProcessor báo cáo, không làm hỏng merge
+
+def merge_by_time(parts: list[list[dict]]) -> list[dict]:
+    """
+    k-way merge of per-table row lists by created_at. Ids restart in every
+    monthly table, so a row is only a duplicate if its id was already
+    emitted from the same part (table).
+    """
+    keyed = []
+    for part, rows in enumerate(parts):
+        items = [(_row_time(row), part, row) for row in rows]
+        items.sort(key=lambda item: item[0])  # thường đã sắp xếp sẵn, O(n)
+        keyed.append(items)
+    merged = []
+    seen = set()
+    for _, part, row in heapq.merge(*keyed, key=lambda item: item[0]):
+        key = (part, row.get("id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(row)
+    return merged
+
+def merge_series_by_time(parts: list[WaterSeries]) -> WaterSeries:
+    """
+    merge_by_time for parsed parts: stable sort by time (ties keep the
+    order of the parts), then only the first row of every (part, id) is kept.
+    """
+    part_of_row = np.repeat(np.arange(len(parts)), [len(p) for p in parts])
+    series = WaterSeries.concat(parts)
+    if not len(series):
+        return series
+    order = np.argsort(series.times, kind="stable")
+    series, part_of_row = series[order], part_of_row[order]
+    keys = np.stack((part_of_row, series.ids.astype(np.int64)), axis=1)
+    _, first = np.unique(keys, axis=0, return_index=True)
+    if len(first) == len(series):
+        return series
+    return series[np.sort(first)]
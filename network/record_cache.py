@@ -0,0 +1,189 @@
+import os
+import json
+import threading
+from datetime import datetime
+from config import CACHE_DIR
+from logger.logger import LoggerFactory
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def parse_created_at(row: dict) -> datetime:
+    return datetime.strptime(row.get("created_at", ""), TIME_FORMAT)
+
+def table_name_for(when: datetime) -> str:
+    return f"water_level_{when.month:02d}_{when.year}"
+
+class RecordCache:
+    """
+    Persistent cache of raw rows returned by water_level.php.
+
+    Layout: <root>/<serial_number>/<table_name>.json holds {id: row} for one
+    month table, and <root>/<serial_number>/meta.json keeps the sync
+    watermark (`synced_until`): everything before it is known to be cached,
+    so the next fetch only asks the server for rows after it.
+    Files are replaced atomically (write to .tmp, then os.replace), so a crash
+    never leaves a half-written cache file.
+    """
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+        self.logger = LoggerFactory()
+        self._lock = threading.Lock()
+
+    # ---- public API -------------------------------------------------------
+    def last_timestamp(self, serial_number: str) -> datetime | None:
+        """
+        Return the sync watermark of a station, or None if nothing is cached.
+        """
+        value = self._read_json(self._meta_path(serial_number)).get("synced_until")
+        return datetime.strptime(value, TIME_FORMAT) if value else None
+
+    def merge(self, serial_number: str, rows: list[dict]) -> int:
+        """
+        Merge fetched rows by id into their month table files and advance the
+        watermark to the newest row. Returns the number of ids not seen before.
+        New or changed rows older than the watermark (late data) also reset
+        the incremental trend state of the station.
+        """
+        by_table: dict[str, list[tuple[datetime, dict]]] = {}
+        for row in rows:
+            try:
+                when = parse_created_at(row)
+            except (TypeError, ValueError):
+                self.logger.add_log("WARNING", "Skipping row without valid created_at: %s", row, tag="RecordCache")
+                continue
+            by_table.setdefault(table_name_for(when), []).append((when, row))
+        if not by_table:
+            return 0
+
+        added = 0
+        late = 0
+        newest = None
+        with self._lock:
+            synced = self.last_timestamp(serial_number)
+            for table, items in by_table.items():
+                path = self._table_path(serial_number, table)
+                cached = self._read_json(path)
+                for when, row in items:
+                    key = str(row.get("id"))
+                    if key not in cached:
+                        added += 1
+                    if synced is not None and when < synced and cached.get(key) != row:
+                        late += 1
+                    cached[key] = row
+                    newest = when if newest is None or when > newest else newest
+                self._write_json(path, cached)
+            if synced is None or newest > synced:
+                self._write_meta(serial_number, newest)
+        self.logger.add_log("INFO", f"Cache {serial_number}: merged {len(rows)} rows, {added} new", tag="RecordCache")
+        if late:
+            self.logger.add_log("WARNING", f"Cache {serial_number}: {late} rows older than the watermark {synced}", tag="RecordCache")
+            self._reset_trend(serial_number)
+        return added
+
+    def load(self, serial_number: str, begin: datetime, end: datetime) -> list[dict]:
+        """
+        Return cached rows with begin <= created_at <= end, sorted by created_at.
+        """
+        selected = []
+        for table in self._tables(serial_number):
+            for row in self._read_json(self._table_path(serial_number, table)).values():
+                when = parse_created_at(row)
+                if begin <= when <= end:
+                    selected.append((when, row))
+        selected.sort(key=lambda item: item[0])
+        return [row for _, row in selected]
+
+    def evict(self, serial_number: str, before: datetime) -> int:
+        """
+        Drop rows older than `before`; table files left empty are deleted.
+        """
+        removed = 0
+        with self._lock:
+            for table in self._tables(serial_number):
+                path = self._table_path(serial_number, table)
+                cached = self._read_json(path)
+                kept = {key: row for key, row in cached.items() if parse_created_at(row) >= before}
+                removed += len(cached) - len(kept)
+                if not kept:
+                    os.remove(path)
+                elif len(kept) != len(cached):
+                    self._write_json(path, kept)
+        if removed:
+            self.logger.add_log("INFO", f"Cache {serial_number}: evicted {removed} rows older than {before}", tag="RecordCache")
+        return removed
+
+    def invalidate(self, serial_number: str, begin: datetime, end: datetime | None = None) -> int:
+        """
+        Forget rows with begin <= created_at <= end (end=None: up to now) and
+        move the watermark back to `begin`, so the next fetch downloads the
+        range again. Use it when the server backfills late data. The
+        incremental trend state of the station is reset as well.
+        """
+        removed = 0
+        with self._lock:
+            for table in self._tables(serial_number):
+                path = self._table_path(serial_number, table)
+                cached = self._read_json(path)
+                kept = {}
+                for key, row in cached.items():
+                    when = parse_created_at(row)
+                    if when >= begin and (end is None or when <= end):
+                        continue
+                    kept[key] = row
+                removed += len(cached) - len(kept)
+                if len(kept) != len(cached):
+                    self._write_json(path, kept)
+            synced = self.last_timestamp(serial_number)
+            if synced is not None and synced > begin:
+                self._write_meta(serial_number, begin)
+        self.logger.add_log("WARNING", f"Cache {serial_number}: invalidated {removed} rows from {begin} to {end or 'now'}", tag="RecordCache")
+        self._reset_trend(serial_number)
+        return removed
+
+    def _reset_trend(self, serial_number: str):
+        """
+        The incremental trend state only checks the tail of the previous run,
+        so rows changed before it would go unnoticed: force a full recompute.
+        """
+        # import muộn: data.incremental_trend kéo theo scipy
+        from data.incremental_trend import IncrementalTrendDetector
+        IncrementalTrendDetector(serial_number).reset()
+
+    # ---- files ------------------------------------------------------------
+    def _station_dir(self, serial_number: str) -> str:
+        return os.path.join(self.root, serial_number)
+
+    def _meta_path(self, serial_number: str) -> str:
+        return os.path.join(self._station_dir(serial_number), "meta.json")
+
+    def _table_path(self, serial_number: str, table: str) -> str:
+        return os.path.join(self._station_dir(serial_number), f"{table}.json")
+
+    def _tables(self, serial_number: str) -> list[str]:
+        directory = self._station_dir(serial_number)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(directory)
+                      if name.startswith("water_level_") and name.endswith(".json"))
+
+    def _write_meta(self, serial_number: str, synced_until: datetime):
+        self._write_json(self._meta_path(serial_number), {"synced_until": synced_until.strftime(TIME_FORMAT)})
+
+    def _read_json(self, path: str) -> dict:
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.add_log("BUG", f"Cannot read cache file {path}: {e}", tag="RecordCache")
+            return {}
+
+    def _write_json(self, path: str, data: dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
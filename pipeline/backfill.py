@@ -0,0 +1,163 @@
+import io
+import os
+import json
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from data.data_handler import DataProcessor, WaterSeries
+from data.filter import FilterWaterLevel
+from data.archive import SeriesArchive
+from data.event_ledger import EventLedger
+from data.trend_detected import trend_detected_processes
+from data.report_making import make_report, is_synoptic_hour
+from logger.logger import LoggerFactory
+from network.fetcher import DataFetcher, MINUTE_DEVIDE
+from network.json_stream import iter_json_array, iter_file_chunks
+from pipeline.stations import Station, get_station
+
+LOOKBACK = timedelta(minutes=MINUTE_DEVIDE)
+
+# Series của cả khoảng, gán một lần cho mỗi worker process (initializer)
+_series: WaterSeries | None = None
+
+def _init_worker(series: WaterSeries, log_level: str):
+    global _series
+    _series = series
+    LoggerFactory().set_level(log_level)
+
+def analyze_slot(now: datetime, series: WaterSeries | None = None):
+    """
+    Outlier filter + trend detection on the lookback window ending at `now`,
+    exactly as main() would have seen it at that time.
+    Returns (now, records in window, filtered events, trend_code, closest_record).
+    """
+    series = series if series is not None else _series
+    window = series[series.time_index.window(now - LOOKBACK, now)]
+    if not len(window):
+        return now, 0, None, None, None
+    with contextlib.redirect_stdout(io.StringIO()):
+        keep_mask = FilterWaterLevel().detect_outlier_by_median(window)
+        window = window[keep_mask[0]]
+        filtered, trend_code, closest_record = trend_detected_processes(window, now=now)
+    return now, len(window), filtered, trend_code, closest_record
+
+def hourly_slots(start: datetime, end: datetime, cadence: timedelta = timedelta(hours=1)) -> list[datetime]:
+    """Slot times in [start, end], aligned like the scheduler (to midnight)."""
+    midnight = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    slot = midnight + -((midnight - start) // cadence) * cadence
+    slots = []
+    while slot <= end:
+        slots.append(slot)
+        slot += cadence
+    return slots
+
+class Backfill:
+    """
+    Regenerate the report of every slot of a past date range.
+
+    The rows of [start - lookback, end] are fetched once (streamed, or read
+    from a saved payload, or from the local SeriesArchive) into one WaterSeries,
+    and every slot analyses its own 4-day window of that series with an
+    injected `now`. Slots are
+    fanned out over a process pool (the series is sent once per worker).
+    make_report then runs in slot order with a private events file, so the
+    dedupe of already reported peaks/troughs behaves as in production.
+    Nothing is submitted: no Selenium, no update_water.php.
+    """
+    def __init__(self,
+                 station: Station,
+                 workers: int | None = None,
+                 cadence: timedelta = timedelta(hours=1),
+                 fetcher: DataFetcher | None = None,
+                 log_level: str = "WARNING"):
+        self.station = station
+        self.workers = workers
+        self.cadence = cadence
+        self.fetcher = fetcher
+        self.log_level = log_level
+        self.logger = LoggerFactory()
+
+    def load_series(self, start: datetime, end: datetime, input_file: str | None = None,
+                    from_archive: bool = False) -> WaterSeries:
+        """
+        Rows of [start - lookback, end]. Payloads (file or API) are parsed
+        while they are read, never held whole as a list of dicts.
+        """
+        if from_archive:
+            return SeriesArchive().read(self.station.serial_number, start - LOOKBACK, end)
+        if input_file:
+            series = DataProcessor().process_stream(iter_json_array(iter_file_chunks(input_file)))
+        else:
+            fetcher = self.fetcher if self.fetcher is not None else DataFetcher()
+            series = fetcher.fetch_series_between(self.station.serial_number, start - LOOKBACK, end)
+        return series[np.argsort(series.times, kind="stable")]
+
+    def run(self, start: datetime, end: datetime, output: str, input_file: str | None = None,
+            from_archive: bool = False) -> int:
+        series = self.load_series(start, end, input_file, from_archive)
+        slots = hourly_slots(start, end, self.cadence)
+        self.logger.add_log("INFO", f"Backfill {self.station.serial_number}: {len(series)} records, {len(slots)} slots from {start} to {end}", tag="Backfill")
+        print(f"[Backfill] {len(series)} records, {len(slots)} slots, writing {output}")
+
+        if self.workers == 1:
+            _init_worker(series, self.log_level)
+            analyses = [analyze_slot(slot) for slot in slots]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(series, self.log_level)) as pool:
+                workers = self.workers or os.cpu_count() or 1
+                analyses = list(pool.map(analyze_slot, slots, chunksize=max(1, len(slots) // (workers * 4))))
+
+        written = 0
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with tempfile.TemporaryDirectory() as workdir, open(output, "w", encoding="utf-8") as out:
+            # sổ sự kiện riêng: không đụng tới sổ của pipeline thật
+            ledger = EventLedger(os.path.join(workdir, "events.sqlite3"))
+            for now, records, filtered, trend_code, closest_record in analyses:
+                line = {"time": now.isoformat(timespec="minutes"), "station": self.station.serial_number,
+                        "records": records, "synoptic": is_synoptic_hour(now)}
+                if filtered is None:
+                    line.update(report=None, error="no data in window")
+                else:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        report = make_report(list(filtered), trend_code, closest_record,
+                                             report_code=self.station.report_code, ledger=ledger,
+                                             now=now, station=self.station.serial_number)
+                    line.update(report=report, trend_code=trend_code, events=len(filtered))
+                    written += 1
+                out.write(json.dumps(line, ensure_ascii=False) + "\n")
+            ledger.close()
+        self.logger.add_log("INFO", f"Backfill {self.station.serial_number}: {written}/{len(slots)} reports written to {output}", tag="Backfill")
+        return written
+
+def _parse_time(text: str) -> datetime:
+    return datetime.fromisoformat(text)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate the hourly reports of a past date range (no submission).")
+    parser.add_argument("--start", type=_parse_time, required=True, help="first slot, e.g. 2025-01-01 or 2025-01-01T07:00")
+    parser.add_argument("--end", type=_parse_time, required=True, help="last slot (inclusive)")
+    parser.add_argument("--station", default=None, help="serial number (default: DEFAULT_STATION)")
+    parser.add_argument("--output", "-o", default=None, help="JSONL output (default: backfill_<serial>.jsonl)")
+    parser.add_argument("--input", help="replay a saved water_level.php payload (JSON list) instead of fetching")
+    parser.add_argument("--archive", action="store_true", help="read the range from the local SeriesArchive instead of fetching")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (1: run inline)")
+    parser.add_argument("--cadence-minutes", type=int, default=60)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    station = get_station(args.station) if args.station else get_station()
+    output = args.output or f"backfill_{station.serial_number}.jsonl"
+    LoggerFactory().set_level(args.log_level)
+    written = Backfill(station, workers=args.workers, cadence=timedelta(minutes=args.cadence_minutes),
+                       log_level=args.log_level).run(args.start, args.end, output, args.input, args.archive)
+    print(f"[Backfill] {written} reports written to {output}")
+    LoggerFactory().close()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
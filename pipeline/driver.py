@@ -0,0 +1,145 @@
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from data.data_handler import DataProcessor, WaterSeries
+from data.filter import FilterWaterLevel
+from data.incremental_trend import detect_trend
+from data.report_making import make_report
+from logger.logger import LoggerFactory
+from network.fetcher import DataFetcher
+from pipeline.stations import Station, load_stations
+
+@dataclass
+class StationResult:
+    station: Station
+    report: str | None = None
+    error: str | None = None
+    records: int = 0
+    timings: dict[str, float] = field(default_factory=dict)   # giây theo từng stage
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def analyze_station(series: WaterSeries, station: Station, now: datetime | None = None) -> tuple[str, dict[str, float]]:
+    """
+    CPU stages of one station: outlier filter → trend detection → report.
+    `now` is the logical time of the report (default: current time).
+    Top-level function so it can run in a worker process.
+    """
+    timings = {}
+    started = time.perf_counter()
+    keep_mask = FilterWaterLevel().detect_outlier_by_median(series)
+    series = series[keep_mask[0]]
+    timings["outlier"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    filtered, trend_code, closest_record = detect_trend(station.serial_number, series, now=now)
+    timings["trend"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    report = make_report(filtered, trend_code, closest_record,
+                         report_code=station.report_code, now=now, station=station.serial_number)
+    timings["report"] = time.perf_counter() - started
+    LoggerFactory().flush()
+    return report, timings
+
+class StationDriver:
+    """
+    Run fetch → DataProcessor.process → detect_outlier_by_median →
+    detect_trend → make_report for many stations.
+
+    Fetch and parse run on a thread pool (I/O bound), the analysis of each
+    station is submitted to a process pool as soon as its data arrives, so a
+    slow or failing station never blocks the others.
+    """
+    def __init__(self,
+                 stations: list[Station] | None = None,
+                 io_workers: int = 8,
+                 cpu_workers: int | None = None,
+                 fetcher: DataFetcher | None = None):
+        self.stations = stations if stations is not None else list(load_stations().values())
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.fetcher = fetcher if fetcher is not None else DataFetcher()
+        self.logger = LoggerFactory()
+
+    def run(self, now: datetime | None = None) -> list[StationResult]:
+        now = now or datetime.now()
+        results = {station.serial_number: StationResult(station) for station in self.stations}
+        if not self.stations:
+            return []
+        io_workers = min(self.io_workers, len(self.stations))
+        with ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="StationIO") as io_pool, \
+             ProcessPoolExecutor(max_workers=self.cpu_workers) as cpu_pool:
+            fetches = {io_pool.submit(self._fetch_and_parse, station, now): station for station in self.stations}
+            analyses = {}
+            for future in as_completed(fetches):
+                station = fetches[future]
+                result = results[station.serial_number]
+                try:
+                    series, timings = future.result()
+                except Exception as e:
+                    result.error = f"fetch: {e}"
+                    self.logger.add_log("BUG", f"Station {station.serial_number} fetch failed: {e}", tag="StationDriver")
+                    continue
+                result.timings.update(timings)
+                result.records = len(series)
+                if not len(series):
+                    result.error = "No data fetched"
+                    self.logger.add_log("WARNING", f"Station {station.serial_number}: no data fetched", tag="StationDriver")
+                    continue
+                analyses[cpu_pool.submit(analyze_station, series, station, now)] = station
+
+            for future in as_completed(analyses):
+                station = analyses[future]
+                result = results[station.serial_number]
+                try:
+                    result.report, timings = future.result()
+                    result.timings.update(timings)
+                except Exception as e:
+                    result.error = f"analyze: {e}"
+                    self.logger.add_log("BUG", f"Station {station.serial_number} analysis failed: {e}", tag="StationDriver")
+
+        for result in results.values():
+            self.logger.add_log(
+                "INFO" if result.ok else "WARNING",
+                f"Station {result.station.serial_number}: records={result.records}, "
+                f"timings={ {k: round(v, 3) for k, v in result.timings.items()} }, "
+                f"report={result.report!r}, error={result.error}",
+                tag="StationDriver"
+            )
+        return list(results.values())
+
+    def _fetch_and_parse(self, station: Station, now: datetime) -> tuple[WaterSeries, dict[str, float]]:
+        timings = {}
+        started = time.perf_counter()
+        data = self.fetcher.fetch(station.serial_number, now=now)
+        timings["fetch"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        series = DataProcessor().process(data) if data else WaterSeries.empty(station.serial_number)
+        timings["process"] = time.perf_counter() - started
+        return series, timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the report pipeline for every registered station.")
+    parser.add_argument("--stations", nargs="*", help="serial numbers to run (default: all registered)")
+    parser.add_argument("--io-workers", type=int, default=8)
+    parser.add_argument("--cpu-workers", type=int, default=None)
+    args = parser.parse_args()
+
+    registry = load_stations()
+    stations = [registry[serial] for serial in args.stations] if args.stations else list(registry.values())
+    results = StationDriver(stations, io_workers=args.io_workers, cpu_workers=args.cpu_workers).run()
+    for result in results:
+        status = result.report if result.ok else f"FAILED ({result.error})"
+        print(f"{result.station.serial_number}: {status}  {({k: round(v, 3) for k, v in result.timings.items()})}")
+    LoggerFactory().close()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
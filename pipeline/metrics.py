@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from config import METRICS_DIR
+from logger.logger import LoggerFactory
+from network.http_client import HttpClient
+
+PROM_FILE = "pipeline.prom"
+HISTORY_FILE = "runs.jsonl"
+PREFIX = "water_pipeline"
+
+class RunMetrics:
+    """
+    Timings and counters of one pipeline run.
+
+        metrics = RunMetrics(station.serial_number, now)
+        with metrics.stage("fetch") as stage:
+            data = fetcher.fetch(...)
+            stage["records_out"] = len(data)
+        metrics.write()
+
+    Every stage records wall time (perf_counter), CPU time of the process
+    (process_time), the HTTP requests/bytes/retries made inside it (from
+    HttpClient.totals) and any counters set on the yielded dict.
+    write() replaces the Prometheus text file and appends one JSONL line.
+    """
+    def __init__(self, station: str, run_at: datetime | None = None, metrics_dir: str = METRICS_DIR):
+        self.station = station
+        self.run_at = run_at or datetime.now()
+        self.metrics_dir = metrics_dir
+        self.stages: dict[str, dict] = {}
+        self.ok = True
+        self.error: str | None = None
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        counters = {}
+        http_before = HttpClient.totals_snapshot()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield counters
+        except Exception as e:
+            counters["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            http_after = HttpClient.totals_snapshot()
+            entry = {
+                "wall": time.perf_counter() - wall,
+                "cpu": time.process_time() - cpu,
+                "http_requests": http_after["requests"] - http_before["requests"],
+                "http_bytes": http_after["bytes"] - http_before["bytes"],
+                "http_retries": http_after["retries"] - http_before["retries"],
+                "http_errors": http_after["errors"] - http_before["errors"],
+            }
+            entry.update(counters)
+            self.stages[name] = entry
+
+    def fail(self, error: str):
+        self.ok = False
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {
+            "run_at": self.run_at.isoformat(timespec="seconds"),
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "station": self.station,
+            "ok": self.ok,
+            "error": self.error,
+            "wall": time.perf_counter() - self._started,
+            "cpu": time.process_time() - self._cpu_started,
+            "stages": self.stages,
+        }
+
+    def write(self):
+        """
+        Write <metrics_dir>/pipeline.prom (atomically, for the node_exporter
+        textfile collector) and append the run to <metrics_dir>/runs.jsonl.
+        Errors are logged, never raised: metrics must not break a run.
+        """
+        record = self.to_dict()
+        try:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            prom_path = os.path.join(self.metrics_dir, PROM_FILE)
+            tmp_path = prom_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(prometheus_text(record))
+            os.replace(tmp_path, prom_path)
+            with _history_lock, open(os.path.join(self.metrics_dir, HISTORY_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            LoggerFactory().add_log("BUG", f"Cannot write metrics to {self.metrics_dir}: {e}", tag="Metrics")
+
+_history_lock = threading.Lock()
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def prometheus_text(record: dict) -> str:
+    """
+    Prometheus text exposition of one run record (gauges of the last run).
+    """
+    station = record["station"]
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} gauge")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(val)}"' for key, val in labels.items())
+            lines.append(f"{PREFIX}_{name}{{{label_text}}} {value}")
+
+    run_at = datetime.fromisoformat(record["run_at"]).timestamp()
+    metric("last_run_timestamp_seconds", "Logical time of the last run.", [({"station": station}, run_at)])
+    metric("last_run_success", "1 if the last run completed without error.", [({"station": station}, int(record["ok"]))])
+    metric("run_wall_seconds", "Wall time of the last run.", [({"station": station}, record["wall"])])
+    metric("run_cpu_seconds", "CPU time of the last run.", [({"station": station}, record["cpu"])])
+
+    # Mọi giá trị số của stage thành một gauge, vd stage_records_out
+    keys = []
+    for entry in record["stages"].values():
+        keys += [key for key, value in entry.items()
+                 if isinstance(value, (int, float)) and not isinstance(value, bool) and key not in keys]
+    for key in keys:
+        unit = "_seconds" if key in ("wall", "cpu") else ""
+        samples = [({"station": station, "stage": name}, entry[key])
+                   for name, entry in record["stages"].items() if key in entry]
+        metric(f"stage_{key}{unit}", f"Per-stage {key.replace('_', ' ')} of the last run.", samples)
+    return "\n".join(lines) + "\n"
+
+def load_history(path: str, last: int | None = None) -> list[dict]:
+    runs = []
+    if not os.path.exists(path):
+        return runs
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue  # dòng bị cắt khi ghi dở
+    return runs[-last:] if last else runs
+
+def rolling_percentiles(runs: list[dict], field: str = "wall") -> dict[str, dict[str, float]]:
+    """
+    {stage: {"n", "p50", "p95"}} of one numeric stage field over the runs;
+    the whole run is reported as stage "total".
+    """
+    values: dict[str, list[float]] = {}
+    for run in runs:
+        for name, entry in run.get("stages", {}).items():
+            if isinstance(entry.get(field), (int, float)):
+                values.setdefault(name, []).append(entry[field])
+        if isinstance(run.get(field), (int, float)):
+            values.setdefault("total", []).append(run[field])
+    return {
+        name: {"n": len(samples), "p50": float(np.percentile(samples, 50)), "p95": float(np.percentile(samples, 95))}
+        for name, samples in values.items()
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling p50/p95 per pipeline stage from the run history.")
+    parser.add_argument("--history", default=os.path.join(METRICS_DIR, HISTORY_FILE))
+    parser.add_argument("--last", type=int, default=168, help="number of most recent runs (default: one week hourly)")
+    parser.add_argument("--station", help="only runs of this station")
+    parser.add_argument("--field", default="wall", help="stage field: wall, cpu, http_bytes, records_out, ...")
+    args = parser.parse_args(argv)
+
+    runs = load_history(args.history)
+    if args.station:
+        runs = [run for run in runs if run.get("station") == args.station]
+    runs = runs[-args.last:] if args.last else runs
+    if not runs:
+        print(f"No runs in {args.history}")
+        return
+    failed = sum(not run.get("ok", True) for run in runs)
+    print(f"{len(runs)} runs from {runs[0]['run_at']} to {runs[-1]['run_at']}, {failed} failed, field={args.field}")
+    print(f"{'stage':<12} {'n':>5} {'p50':>12} {'p95':>12}")
+    for name, stats in rolling_percentiles(runs, args.field).items():
+        print(f"{name:<12} {stats['n']:>5} {stats['p50']:>12.4g} {stats['p95']:>12.4g}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from config import SCHEDULE_CADENCE_MINUTES, SCHEDULE_RUN_TIMEOUT, SCHEDULE_MAX_CATCH_UP, SCHEDULE_STATE_FILE
+from logger.logger import LoggerFactory
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_SLEEP = 60.0  # giây; thức dậy định kỳ để kiểm tra lại đồng hồ hệ thống
+TERMINATE_GRACE = 10.0  # giây chờ run bị timeout tự thoát sau SIGTERM, rồi SIGKILL
+# spawn: tiến trình con mới hoàn toàn, không thừa hưởng lock của logger/requests từ tiến trình cha
+START_METHOD = "spawn"
+
+class Scheduler:
+    """
+    Run task(slot_time) once per cadence slot (slots aligned to midnight,
+    e.g. every full hour), replacing the sleep-then-run loop of main.py.
+
+    - Slots are computed from the slot grid, not from when the previous run
+      finished, so a slow run never shifts the cadence. Waiting uses the
+      monotonic clock and re-checks the wall clock at least every MAX_SLEEP
+      seconds (clock changes, suspend).
+    - Every slot runs in its own process (START_METHOD), so `task` must be
+      picklable (a module-level function). If it takes longer than
+      run_timeout the process is terminated (then killed after
+      TERMINATE_GRACE) and the cadence continues with the next slot; a new
+      run is never started while the previous one is still active (overlap
+      protection).
+    - The last handled slot is persisted. Slots that passed while a run was
+      active or the program was stopped are caught up in order (at most
+      max_catch_up, the newest ones), each with its own logical time.
+    """
+    def __init__(self,
+                 task,
+                 cadence: timedelta = timedelta(minutes=SCHEDULE_CADENCE_MINUTES),
+                 run_timeout: float | None = SCHEDULE_RUN_TIMEOUT,
+                 max_catch_up: int = SCHEDULE_MAX_CATCH_UP,
+                 state_file: str | None = SCHEDULE_STATE_FILE,
+                 clock=datetime.now):
+        if cadence <= timedelta(0) or timedelta(days=1) % cadence:
+            raise ValueError(f"cadence must divide a day, got {cadence}")
+        self.task = task
+        self.cadence = cadence
+        self.run_timeout = run_timeout
+        self.max_catch_up = max_catch_up
+        self.state_file = state_file
+        self.clock = clock
+        self.logger = LoggerFactory()
+        self._context = multiprocessing.get_context(START_METHOD)
+        self._worker: multiprocessing.process.BaseProcess | None = None
+        self._stop = threading.Event()
+        self.last_slot = self._load_last_slot()
+
+    # ---- slots ------------------------------------------------------------
+    def slot_at_or_before(self, when: datetime) -> datetime:
+        midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight + ((when - midnight) // self.cadence) * self.cadence
+
+    def next_slot(self, when: datetime) -> datetime:
+        return self.slot_at_or_before(when) + self.cadence
+
+    def due_slots(self, now: datetime) -> list[datetime]:
+        """
+        Slots after the last handled one up to now. Without history nothing
+        is due: the first run is the next slot, as in run_every_hour.
+        """
+        current = self.slot_at_or_before(now)
+        if self.last_slot is None:
+            self._save_last_slot(current)
+            return []
+        due = []
+        slot = self.last_slot + self.cadence
+        while slot <= current:
+            due.append(slot)
+            slot += self.cadence
+        if len(due) > self.max_catch_up:
+            skipped = due[:-self.max_catch_up]
+            self.logger.add_log("WARNING", f"Skipping {len(skipped)} missed slots from {skipped[0]} to {skipped[-1]}", tag="Scheduler")
+            due = due[-self.max_catch_up:]
+        return due
+
+    # ---- running ----------------------------------------------------------
+    def run_forever(self):
+        self.logger.add_log("INFO", f"Scheduler started: every {self.cadence}, last slot {self.last_slot}", tag="Scheduler")
+        while not self._stop.is_set():
+            self.run_pending()
+            if self._stop.is_set():
+                break
+            now = self.clock()
+            if self._busy():
+                # run trước vẫn chưa xong: chờ nó hoặc tới slot kế tiếp
+                self._worker.join(timeout=min(MAX_SLEEP, (self.next_slot(now) - now).total_seconds()))
+                continue
+            self._wait_until(self.next_slot(now))
+
+    def run_pending(self) -> int:
+        """
+        Run every due slot in order; returns how many were started.
+        Stops early if a run is still active (it is caught up later).
+        """
+        started = 0
+        for slot in self.due_slots(self.clock()):
+            if self._busy():
+                self.logger.add_log("WARNING", f"Previous run still active, slot {slot} postponed", tag="Scheduler")
+                break
+            self.run_slot(slot)
+            started += 1
+        return started
+
+    def run_slot(self, slot: datetime) -> bool:
+        """
+        Run the task for one logical slot time in a new process. Returns
+        True if it finished within run_timeout; otherwise the process is
+        terminated so the next slot can start.
+        """
+        lateness = (self.clock() - slot).total_seconds()
+        print(f"[{slot.strftime(TIME_FORMAT)}] Running task... ({lateness:.0f}s after slot)")
+        self.logger.add_log("INFO", f"Running slot {slot} ({lateness:.0f}s late)", tag="Scheduler")
+        started = time.monotonic()
+        self._worker = self._context.Process(target=_run_task, args=(self.task, slot), name=f"Run-{slot:%H%M}")
+        self._worker.start()
+        # slot được coi là đã xử lý khi bắt đầu chạy, kể cả khi bị timeout
+        self._save_last_slot(slot)
+        self._worker.join(self.run_timeout)
+        if self._worker.is_alive():
+            self.logger.add_log("BUG", f"Run for slot {slot} exceeded {self.run_timeout}s, terminating it", tag="Scheduler")
+            print(f"Run for slot {slot} timed out after {self.run_timeout}s, terminating it")
+            self._terminate_worker()
+            return False
+        if self._worker.exitcode != 0:
+            self.logger.add_log("BUG", f"Run for slot {slot} exited with code {self._worker.exitcode}", tag="Scheduler")
+        self.logger.add_log("INFO", f"Slot {slot} done in {time.monotonic() - started:.1f}s", tag="Scheduler")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _terminate_worker(self):
+        self._worker.terminate()
+        self._worker.join(TERMINATE_GRACE)
+        if self._worker.is_alive():
+            self._worker.kill()
+            self._worker.join()
+
+    def _busy(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def _wait_until(self, target: datetime):
+        """
+        Sleep until the wall clock reaches target, measuring with the
+        monotonic clock and re-checking the wall clock every MAX_SLEEP s.
+        """
+        remaining = (target - self.clock()).total_seconds()
+        print(f"[{self.clock().strftime(TIME_FORMAT)}] waiting time {max(remaining, 0):.0f}s for next task...")
+        while remaining > 0 and not self._stop.is_set():
+            deadline = time.monotonic() + min(remaining, MAX_SLEEP)
+            self._stop.wait(max(0.0, deadline - time.monotonic()))
+            remaining = (target - self.clock()).total_seconds()
+
+    # ---- state ------------------------------------------------------------
+    def _load_last_slot(self) -> datetime | None:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return None
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return datetime.strptime(json.load(f)["last_slot"], TIME_FORMAT)
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.add_log("BUG", f"Cannot read scheduler state {self.state_file}: {e}", tag="Scheduler")
+            return None
+
+    def _save_last_slot(self, slot: datetime):
+        self.last_slot = slot
+        if not self.state_file:
+            return
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_slot": slot.strftime(TIME_FORMAT)}, f)
+        os.replace(tmp_path, self.state_file)
+
+def _run_task(task, slot: datetime):
+    """
+    Body of the per-slot process.
+    """
+    logger = LoggerFactory()
+    try:
+        task(slot)
+    except Exception as e:
+        logger.add_log("BUG", f"Run for slot {slot} failed: {e}", tag="Scheduler")
+        print(f"Error: {e}")
+    finally:
+        logger.flush()
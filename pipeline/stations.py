@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+from config import STATIONS, DEFAULT_STATION
+
+@dataclass(frozen=True)
+class Station:
+    serial_number: str      # serial của cảm biến trên water_level.php
+    report_code: str        # mã trạm đầu điện báo (vd "74194")
+
+def load_stations() -> dict[str, Station]:
+    """
+    Build the registry {serial_number: Station} from config.STATIONS.
+    """
+    registry = {}
+    for entry in STATIONS:
+        station = Station(**entry)
+        if station.serial_number in registry:
+            raise ValueError(f"Duplicate station serial number: {station.serial_number}")
+        registry[station.serial_number] = station
+    return registry
+
+def get_station(serial_number: str = DEFAULT_STATION) -> Station:
+    registry = load_stations()
+    if serial_number not in registry:
+        raise KeyError(f"Unknown station: {serial_number}")
+    return registry[serial_number]
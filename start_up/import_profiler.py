@@ -0,0 +1,71 @@
+import sys
+import time
+import builtins
+import threading
+
+class ImportProfiler:
+    """
+    Measure what every import statement costs while it is installed.
+
+        profiler = ImportProfiler().start()
+        import main_stuff
+        profiler.stop()
+        print(profiler.report())
+
+    builtins.__import__ is wrapped, so it also works in a frozen (PyInstaller)
+    build where `python -X importtime` is not available. Only imports that
+    actually load new modules are recorded; "self" excludes the time spent in
+    nested imports that were recorded themselves.
+    """
+    def __init__(self):
+        self.entries: dict[str, dict] = {}
+        self._original = None
+        self._local = threading.local()
+
+    def start(self) -> "ImportProfiler":
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def stop(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        loaded_before = len(sys.modules)
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if len(sys.modules) > loaded_before:
+                entry = self.entries.setdefault(_absolute_name(name, globals, level),
+                                                {"inclusive": 0.0, "self": 0.0, "modules": 0})
+                entry["inclusive"] += elapsed
+                entry["self"] += elapsed - children
+                entry["modules"] += len(sys.modules) - loaded_before
+                if stack:
+                    stack[-1] += elapsed
+
+    def report(self, limit: int = 25) -> str:
+        # tổng các "self" = tổng thời gian import, không tính trùng các import lồng nhau
+        total = sum(entry["self"] for entry in self.entries.values())
+        lines = [f"Import cost: {total * 1000:.1f} ms recorded, {len(sys.modules)} modules loaded in total",
+                 f"{'module':<45} {'inclusive ms':>12} {'self ms':>9} {'new modules':>12}"]
+        ranked = sorted(self.entries.items(), key=lambda item: item[1]["inclusive"], reverse=True)
+        for name, entry in ranked[:limit]:
+            lines.append(f"{name:<45} {entry['inclusive'] * 1000:>12.1f} {entry['self'] * 1000:>9.1f} {entry['modules']:>12}")
+        return "\n".join(lines)
+
+def _absolute_name(name: str, globals: dict | None, level: int) -> str:
+    if level <= 0 or not globals:
+        return name
+    package = (globals.get("__package__") or "").rsplit(".", level - 1)[0]
+    return f"{package}.{name}" if name else package
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    # logs/, state/, metrics/... được tạo theo thư mục hiện tại: không ghi vào repo
+    monkeypatch.chdir(tmp_path)
+
+@pytest.fixture
+def local_server():
+    """
+    Start http.server on localhost with the given handler class and return
+    its base URL; every server is shut down after the test.
+    """
+    from http.server import ThreadingHTTPServer
+    import threading
+    servers = []
+
+    def start(handler) -> str:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+LOGIN_FORM = """<form method="post" action="login.asp">
+<input name="username"><input type="password" name="password">
+<input type="submit" name="logon" value="Login"></form>"""
+
+HOUR_FORM = """<form method="post" action="add_maTV.asp?step=hour">
+<select name="gio">{options}</select><input type="submit" name="OK" value="OK"></form>"""
+
+CONTENT_FORM = """<form method="post" action="save_maTV.asp">
+<input type="hidden" name="ma_tr" value="74194">
+<textarea name="noidungmadien"></textarea>
+<input type="submit" name="save" value="Ghi"><input type="submit" name="cancel" value="Huy"></form>"""
+
+def madien_stub(echo_content=True, save_delay=0.0):
+    """
+    Handler class imitating the madien2 ASP pages: login.asp sets a session
+    cookie, add_maTV.asp shows the `gio` select then the content form,
+    save_maTV.asp records the POST.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        posts = []
+        hours = []
+        logins = 0
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if path.endswith("login.asp"):
+                return self.reply(LOGIN_FORM)
+            if path.endswith("add_maTV.asp"):
+                if "session=ok" not in self.headers.get("Cookie", ""):
+                    return self.reply(LOGIN_FORM)
+                options = "".join(f"<option value='{h}'>{h}h</option>" for h in range(1, 25))
+                return self.reply(HOUR_FORM.format(options=options))
+            self.send_error(404)
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            form = {key: values[0] for key, values in parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode()).items()}
+            if path.endswith("login.asp"):
+                if form.get("username") == "user" and form.get("password") == "secret":
+                    type(self).logins += 1
+                    return self.reply("<p>Welcome</p>", cookie="session=ok; Path=/")
+                return self.reply(LOGIN_FORM)
+            if path.endswith("add_maTV.asp"):
+                type(self).hours.append(form["gio"])
+                return self.reply(CONTENT_FORM)
+            if path.endswith("save_maTV.asp"):
+                type(self).posts.append(form)
+                time.sleep(save_delay)
+                return self.reply(f"<p>{form['noidungmadien'] if echo_content else 'saved'}</p>")
+            self.send_error(404)
+
+        def reply(self, body, cookie=None):
+            data = f"<html><body>{body}</body></html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(data)))
+            if cookie:
+                self.send_header("Set-Cookie", cookie)
+            self.end_headers()
+            self.wfile.write(data)
+    return Handler
+
+@pytest.fixture
+def madien_site(local_server):
+    """
+    Start a madien_stub server; returns (base URL, handler class) where the
+    handler class records the logins, chosen hours and posted reports.
+    """
+    def start(**options):
+        handler = madien_stub(**options)
+        return local_server(handler), handler
+    return start
@@ -0,0 +1,99 @@
+import struct
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from data.archive import SeriesArchive, HEADER_SIZE, COLUMNS, ITEM_SIZE, _read_header
+from data.data_handler import WaterSeries
+
+def make_series(start, levels, step=timedelta(minutes=10), ids=None):
+    n = len(levels)
+    levels = np.asarray(levels, dtype=np.int64)
+    return WaterSeries(
+        ids=np.arange(n) if ids is None else np.asarray(ids),
+        serial_number="TEST",
+        times=np.array([start + k * step for k in range(n)], dtype="datetime64[s]"),
+        water_level_0=levels,
+        water_level_1=levels + 1,
+        water_level_2=levels + 2,
+        vol=np.full(n, 12.5),
+    )
+
+def assert_same(a: WaterSeries, b: WaterSeries):
+    for name, _ in COLUMNS:
+        assert np.array_equal(getattr(a, name), getattr(b, name)), name
+
+def memmap_base(array):
+    # khối memmap gốc của file (các lát cắt của memmap cũng là np.memmap)
+    mapped = None
+    while array is not None:
+        if isinstance(array, np.memmap):
+            mapped = array
+        array = getattr(array, "base", None)
+    return mapped
+
+def test_round_trip_across_a_month_boundary(tmp_path):
+    archive = SeriesArchive(str(tmp_path))
+    series = make_series(datetime(2025, 1, 31, 22), range(1000, 1024))
+    assert archive.append(series) == 24
+    assert archive.months("TEST") == [(2025, 1), (2025, 2)]
+    assert_same(archive.read("TEST", datetime(2025, 1, 1), datetime(2025, 3, 1)), series)
+    assert archive.last_time("TEST") == datetime(2025, 2, 1, 1, 50)
+    # trùng thời điểm, cùng giá trị: bỏ qua
+    assert archive.append(series) == 0
+
+def test_read_within_a_month_is_zero_copy(tmp_path):
+    archive = SeriesArchive(str(tmp_path))
+    archive.append(make_series(datetime(2025, 1, 31, 22), range(1000, 1024)))
+    inside = archive.read("TEST", datetime(2025, 1, 31, 22, 30), datetime(2025, 1, 31, 23, 0))
+    assert inside.water_level_0.tolist() == [1003, 1004, 1005, 1006]
+    block = memmap_base(inside.water_level_0)
+    assert block is not None
+    assert all(np.shares_memory(getattr(inside, name), block) for name, _ in COLUMNS)
+    across = archive.read("TEST", datetime(2025, 1, 31, 23), datetime(2025, 2, 1, 1))
+    assert memmap_base(across.water_level_0) is None and len(across) == 13
+
+def test_late_rows_are_merged_in_time_order(tmp_path):
+    archive = SeriesArchive(str(tmp_path))
+    series = make_series(datetime(2025, 3, 1), range(1000, 1010))
+    archive.append(series[np.r_[0:3, 6:10]])
+    assert archive.append(series[3:6]) == 3
+    assert_same(archive.read("TEST", datetime(2025, 3, 1), datetime(2025, 3, 2)), series)
+
+def test_corrected_values_replace_the_archived_row(tmp_path):
+    archive = SeriesArchive(str(tmp_path))
+    series = make_series(datetime(2025, 3, 1), range(1000, 1010))
+    archive.append(series)
+    corrected = series[4:5]
+    corrected.water_level_0[:] = 5000
+    assert archive.append(corrected) == 0
+    stored = archive.read("TEST", datetime(2025, 3, 1), datetime(2025, 3, 2))
+    assert len(stored) == 10
+    assert stored.water_level_0.tolist() == [1000, 1001, 1002, 1003, 5000, 1005, 1006, 1007, 1008, 1009]
+
+def test_rows_past_count_after_a_crash_are_ignored(tmp_path):
+    archive = SeriesArchive(str(tmp_path))
+    series = make_series(datetime(2025, 3, 1), range(1000, 1006))
+    archive.append(series[:3])
+    path = archive._path("TEST", 2025, 3)
+    header = _read_header(path)
+    # crash giữa chừng: các cột của 3 dòng mới đã ghi nhưng count chưa được cập nhật
+    with open(path, "r+b") as f:
+        for k, (name, dtype) in enumerate(COLUMNS):
+            f.seek(HEADER_SIZE + (k * header["capacity"] + header["count"]) * ITEM_SIZE)
+            f.write(np.full(3, -1).astype(dtype).tobytes())
+    assert_same(archive.read("TEST", datetime(2025, 3, 1), datetime(2025, 3, 2)), series[:3])
+    assert archive.append(series[3:]) == 3
+    assert_same(archive.read("TEST", datetime(2025, 3, 1), datetime(2025, 3, 2)), series)
+
+def test_bad_header_is_rejected(tmp_path):
+    archive = SeriesArchive(str(tmp_path))
+    archive.append(make_series(datetime(2025, 3, 1), range(1000, 1003)))
+    path = archive._path("TEST", 2025, 3)
+    with open(path, "r+b") as f:
+        f.write(b"NOTANARC")
+    with pytest.raises(ValueError):
+        archive.read("TEST", datetime(2025, 3, 1), datetime(2025, 3, 2))
+    with open(path, "r+b") as f:
+        f.write(b"WLARCH01" + struct.pack("<I", 99))
+    with pytest.raises(ValueError):
+        archive.append(make_series(datetime(2025, 3, 2), [1000]))
@@ -0,0 +1,49 @@
+import os
+import json
+from datetime import datetime, timedelta
+from benchmark.synthetic import TideConfig, generate_rows
+from config import EVENTS_DB
+from pipeline import backfill
+from pipeline.backfill import Backfill, LOOKBACK
+from pipeline.stations import get_station
+
+START = datetime(2025, 6, 1)
+END = datetime(2025, 6, 2)
+
+def write_payload(path):
+    days = (END - START + LOOKBACK) / timedelta(days=1) + 0.5
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(generate_rows(TideConfig(days=days, end=END, seed=7)), f)
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+def test_inline_and_process_pool_write_the_same_reports(tmp_path, monkeypatch):
+    payload = str(tmp_path / "payload.json")
+    write_payload(payload)
+    ledgers = []
+    real_make_report = backfill.make_report
+
+    def make_report(*args, ledger=None, **kwargs):
+        ledgers.append(ledger)
+        return real_make_report(*args, ledger=ledger, **kwargs)
+    monkeypatch.setattr(backfill, "make_report", make_report)
+
+    station = get_station()
+    inline = str(tmp_path / "inline.jsonl")
+    pooled = str(tmp_path / "pooled.jsonl")
+    written = Backfill(station, workers=1).run(START, END, inline, input_file=payload)
+    assert Backfill(station, workers=2).run(START, END, pooled, input_file=payload) == written
+
+    lines = read_lines(inline)
+    assert len(lines) == 25 and written == 25
+    assert lines == read_lines(pooled)
+    first = json.loads(lines[0])
+    assert first["time"] == "2025-06-01T00:00" and first["report"] and first["records"] > 500
+
+    # sổ sự kiện riêng cho mỗi lần backfill, không bao giờ là sổ của pipeline thật
+    assert len(ledgers) == 2 * written
+    assert all(ledger is not None and os.path.abspath(ledger.path) != os.path.abspath(EVENTS_DB) for ledger in ledgers)
+    assert len({ledger.path for ledger in ledgers}) == 2
+    assert not os.path.exists(EVENTS_DB)
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+import numpy as np
+from data.data_handler import WaterSeries
+from data.filter import FilterWaterLevel, MISSING_VALUE
+
+START = datetime(2025, 1, 1)
+
+def make_series(level_0, level_1=None, level_2=None, minutes=None):
+    n = len(level_0)
+    level_1 = level_0 if level_1 is None else level_1
+    level_2 = level_1 if level_2 is None else level_2
+    minutes = list(range(0, 10 * n, 10)) if minutes is None else minutes
+    return WaterSeries(
+        ids=np.arange(n),
+        serial_number="TEST",
+        times=np.array([START + timedelta(minutes=m) for m in minutes], dtype="datetime64[s]"),
+        water_level_0=level_0,
+        water_level_1=level_1,
+        water_level_2=level_2,
+        vol=np.arange(n, dtype=float),
+    )
+
+def test_sustained_channel_0_failure_falls_back_on_every_record():
+    healthy = [1000 + 5 * i for i in range(12)]
+    stuck = list(healthy)
+    stuck[3:9] = [5000] * 6
+    result = FilterWaterLevel().fill_lack_value(make_series(stuck, healthy))
+    assert result.water_level_0.tolist() == healthy
+    assert result.ids.tolist() == list(range(12))
+
+def test_rejected_record_is_dropped_and_its_slot_interpolated():
+    # kênh nào cũng lệch ở index 2: bị loại, ô 10 phút được nội suy (id -1)
+    levels = [1000, 1010, 3000, 1030, 1040]
+    result = FilterWaterLevel().fill_lack_value(make_series(levels))
+    assert result.water_level_0.tolist() == [1000, 1010, 1020, 1030, 1040]
+    assert result.ids.tolist() == [0, 1, -1, 3, 4]
+
+def test_record_after_rejected_one_is_accepted_unchecked():
+    levels = [1000, 1010, 3000, 2000, 2010]
+    result = FilterWaterLevel().fill_lack_value(make_series(levels))
+    assert result.ids.tolist() == [0, 1, -1, 3, 4]
+    assert result.water_level_0.tolist()[3:] == [2000, 2010]
+
+def test_missing_value_records_are_dropped():
+    levels = [1000, 1010, MISSING_VALUE, 1030]
+    result = FilterWaterLevel().fill_lack_value(make_series(levels))
+    assert result.water_level_0.tolist() == [1000, 1010, 1020, 1030]
+    assert result.ids.tolist() == [0, 1, -1, 3]
+
+def test_gap_longer_than_an_hour_is_filled_on_the_10_minute_grid():
+    result = FilterWaterLevel().fill_lack_value(make_series([1000, 1090], minutes=[0, 90]))
+    assert len(result) == 10
+    assert np.all(np.diff(result.times) == np.timedelta64(10, "m"))
+    assert result.water_level_0.tolist() == list(range(1000, 1091, 10))
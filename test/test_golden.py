@@ -0,0 +1,50 @@
+import io
+import json
+import contextlib
+import numpy as np
+import pytest
+from benchmark.golden import CASES, GOLDEN_FILE, golden_payload, event_key
+from data.data_handler import DataProcessor
+from data.filter import FilterWaterLevel
+from data.incremental_trend import IncrementalTrendDetector
+from data.trend_detected import trend_detected_processes
+
+with open(GOLDEN_FILE, encoding="utf-8") as f:
+    GOLDEN = json.load(f)["cases"]
+
+def run_pipeline(options):
+    rows, now = golden_payload(options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        series = DataProcessor().process(rows)
+        keep_mask = FilterWaterLevel().detect_outlier_by_median(series)[0]
+        kept = series[keep_mask]
+        result = trend_detected_processes(kept, now=now)
+    return series, keep_mask, kept, result, now
+
+@pytest.mark.parametrize("name, options", CASES, ids=[name for name, _ in CASES])
+def test_pipeline_matches_the_baseline(name, options):
+    expected = GOLDEN[name]
+    series, keep_mask, kept, (filtered, trend_code, closest_record), now = run_pipeline(options)
+
+    parsed = expected["parsed"]
+    assert len(series) == parsed["count"]
+    assert series.ids.tolist() == parsed["ids"]
+    assert str(series.times[0]).replace("T", " ") == parsed["first_time"]
+    assert str(series.times[-1]).replace("T", " ") == parsed["last_time"]
+    assert [int(getattr(series, f"water_level_{k}").sum()) for k in range(3)] == parsed["level_sums"]
+    assert round(float(series.vol.sum()), 6) == parsed["vol_sum"]
+
+    assert np.flatnonzero(~keep_mask).tolist() == expected["outlier_indices"]
+    assert event_key(filtered) == expected["events"]
+    assert trend_code == expected["trend_code"]
+    assert closest_record.id == expected["closest_id"]
+
+@pytest.mark.parametrize("name, options", CASES, ids=[name for name, _ in CASES])
+def test_incremental_trend_matches_the_baseline(tmp_path, name, options):
+    _, _, kept, _, now = run_pipeline(options)
+    detector = IncrementalTrendDetector("GOLDEN", state_dir=str(tmp_path))
+    # lần đầu: tính full và lưu state; lần hai: dùng lại state
+    for _ in range(2):
+        filtered, trend_code, closest_record = detector.process(kept, now=now)
+        assert event_key(filtered) == GOLDEN[name]["events"]
+        assert (trend_code, closest_record.id) == (GOLDEN[name]["trend_code"], GOLDEN[name]["closest_id"])
@@ -0,0 +1,69 @@
+from http.server import BaseHTTPRequestHandler
+import pytest
+import requests
+from network import http_client
+from network.http_client import HttpClient
+
+def flaky_handler(statuses):
+    """
+    Handler class answering GET and POST with the next status of
+    `statuses` (200 once they are used up) and counting the requests.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        requests_seen = []
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.answer()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.answer()
+
+        def answer(self):
+            type(self).requests_seen.append(self.command)
+            status = statuses.pop(0) if statuses else 200
+            body = b"ok" if status == 200 else b"busy"
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    return Handler
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # không chờ thật giữa các lần retry, chỉ ghi lại thời gian chờ
+    delays = []
+    monkeypatch.setattr(http_client.time, "sleep", delays.append)
+    return delays
+
+def test_get_retries_5xx_and_429_then_succeeds(local_server, sleeps):
+    handler = flaky_handler([503, 429, 502])
+    client = HttpClient(retries=3, backoff=0.5)
+    resp = client.get(local_server(handler) + "/data")
+    assert resp.status_code == 200 and resp.text == "ok"
+    assert handler.requests_seen == ["GET"] * 4
+    # backoff lũy thừa 2 với jitter trong [delay, 2 * delay)
+    assert [0.5 <= sleeps[0] < 1.0, 1.0 <= sleeps[1] < 2.0, 2.0 <= sleeps[2] < 4.0] == [True] * 3
+    assert client.snapshot()[-1].attempts == 4
+
+def test_get_returns_last_response_when_retries_are_used_up(local_server, sleeps):
+    handler = flaky_handler([503, 503, 503])
+    resp = HttpClient(retries=2, backoff=0.1).get(local_server(handler) + "/data")
+    assert resp.status_code == 503
+    assert len(handler.requests_seen) == 3 and len(sleeps) == 2
+
+def test_post_is_sent_once(local_server, sleeps):
+    handler = flaky_handler([503])
+    resp = HttpClient(retries=3, backoff=0.1).post(local_server(handler) + "/update", data={"text": "74194"})
+    assert resp.status_code == 503
+    assert handler.requests_seen == ["POST"] and sleeps == []
+
+def test_get_retries_connection_errors_then_raises(sleeps):
+    client = HttpClient(retries=2, backoff=0.1, connect_timeout=0.5)
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://127.0.0.1:9/closed")  # cổng discard: không có server
+    assert len(sleeps) == 2
+    assert client.snapshot()[-1].status is None
@@ -0,0 +1,84 @@
+import sys
+import types
+from datetime import datetime
+import pytest
+from automation import http_submitter
+from automation.http_submitter import HttpFormSubmitter, SubmitError
+from network.http_client import HttpClient
+
+def make_submitter(base, password="secret", client=None):
+    return HttpFormSubmitter(user="user", password=password,
+                             login_link=f"{base}/content/users/login.asp?ret_page=../../content/code/",
+                             report_link=f"{base}/content/code/",
+                             client=client or HttpClient(retries=0))
+
+def test_login_select_hour_and_post_content(madien_site):
+    base, handler = madien_site()
+    submitter = make_submitter(base)
+    assert submitter.submit_report("74194 12345", now=datetime(2025, 6, 1, 0, 5))
+    assert handler.logins == 1
+    assert handler.hours == ["24"]  # 0h → 24
+    assert handler.posts == [{"ma_tr": "74194", "noidungmadien": "74194 12345", "save": "Ghi"}]
+
+def test_content_missing_on_result_page_returns_false(madien_site):
+    base, handler = madien_site(echo_content=False)
+    submitter = make_submitter(base)
+    assert not submitter.submit_report("74194 12345", now=datetime(2025, 6, 1, 7))
+    assert len(handler.posts) == 1
+
+def test_checking_stops_before_posting(madien_site):
+    base, handler = madien_site()
+    submitter = make_submitter(base)
+    assert submitter.submit_report("checking", now=datetime(2025, 6, 1, 7))
+    assert handler.hours == ["7"] and handler.posts == []
+
+def test_rejected_login_raises(madien_site):
+    submitter = make_submitter(madien_site()[0], password="wrong")
+    with pytest.raises(SubmitError):
+        submitter.submit_report("74194 12345", now=datetime(2025, 6, 1, 7))
+
+@pytest.fixture
+def selenium_module(monkeypatch):
+    # selenium_controller giả: ghi lại các lần fallback và tin Zalo, không mở trình duyệt
+    module = types.ModuleType("automation.selenium_controller")
+    module.calls, module.alerts = [], []
+    module.selenium_controller = lambda content, now=None: module.calls.append((content, now)) or True
+    module.send_zalo_message = module.alerts.append
+    monkeypatch.setitem(sys.modules, "automation.selenium_controller", module)
+    monkeypatch.setattr(http_submitter, "REPORT_SUBMITTER", "http")
+    return module
+
+@pytest.fixture
+def selenium_calls(selenium_module):
+    return selenium_module.calls
+
+def test_fallback_only_before_the_post(madien_site, monkeypatch, selenium_calls):
+    now = datetime(2025, 6, 1, 7)
+    monkeypatch.setattr(http_submitter, "_submitter", make_submitter(madien_site()[0], password="wrong"))
+    assert http_submitter.submit_report("74194 12345", now=now)
+    assert selenium_calls == [("74194 12345", now)]
+
+def test_no_fallback_when_result_page_lacks_content(madien_site, monkeypatch, selenium_calls):
+    base, handler = madien_site(echo_content=False)
+    monkeypatch.setattr(http_submitter, "_submitter", make_submitter(base))
+    assert not http_submitter.submit_report("74194 12345", now=datetime(2025, 6, 1, 7))
+    assert selenium_calls == [] and len(handler.posts) == 1
+
+def test_no_fallback_when_post_times_out(madien_site, monkeypatch, selenium_calls):
+    base, handler = madien_site(save_delay=0.5)
+    client = HttpClient(read_timeout=0.2, retries=0)
+    monkeypatch.setattr(http_submitter, "_submitter", make_submitter(base, client=client))
+    assert not http_submitter.submit_report("74194 12345", now=datetime(2025, 6, 1, 7))
+    assert selenium_calls == [] and len(handler.posts) == 1
+
+def test_unconfirmed_post_alerts_the_operators(madien_site, monkeypatch, selenium_module):
+    base, handler = madien_site(echo_content=False)
+    monkeypatch.setattr(http_submitter, "_submitter", make_submitter(base))
+    assert not http_submitter.submit_report("74194 12345", now=datetime(2025, 6, 1, 7))
+    assert selenium_module.alerts == ["[Web Error] Ma dien bao: :74194 12345"]
+    assert selenium_module.calls == []
+
+def test_confirmed_post_sends_no_alert(madien_site, monkeypatch, selenium_module):
+    monkeypatch.setattr(http_submitter, "_submitter", make_submitter(madien_site()[0]))
+    assert http_submitter.submit_report("74194 12345", now=datetime(2025, 6, 1, 7))
+    assert selenium_module.alerts == [] and selenium_module.calls == []
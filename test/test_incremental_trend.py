@@ -0,0 +1,68 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from benchmark.synthetic import TideConfig, generate_rows
+from data.data_handler import DataProcessor
+from data.incremental_trend import IncrementalTrendDetector
+from data.trend_detected import trend_detected_processes
+from network.record_cache import RecordCache
+
+END = datetime(2025, 6, 1)
+
+def result_key(result):
+    filtered, trend_code, closest_record = result
+    return [(rec.id, kind) for rec, kind in filtered], trend_code, closest_record.id
+
+def hourly_windows(days=6, lookback=timedelta(days=4), runs=12):
+    series = DataProcessor().process(generate_rows(TideConfig(days=days, end=END, seed=3)))
+    for k in range(runs, -1, -1):
+        now = END - timedelta(hours=k)
+        yield series[series.time_index.window(now - lookback, now)], now
+
+def test_incremental_matches_full_recompute_every_hour(tmp_path):
+    detector = IncrementalTrendDetector("TEST", state_dir=str(tmp_path))
+    for k, (window, now) in enumerate(hourly_windows()):
+        if k:
+            assert detector._check_state(detector._load_state(), window)[0] is None
+        assert result_key(detector.process(window, now=now)) == result_key(trend_detected_processes(window, now=now))
+
+def test_state_only_keeps_the_tail_and_settled_candidates(tmp_path):
+    detector = IncrementalTrendDetector("TEST", state_dir=str(tmp_path))
+    window, now = next(hourly_windows(runs=0))
+    detector.process(window, now=now)
+    state = detector._load_state()
+    assert len(state["tail_times"]) == detector.tail
+    assert state["last_time"] == window.times[-1]
+    assert all(len(rel) < len(window) // 10 for rel, _ in state["candidates"])
+
+def test_changed_tail_falls_back_to_full_recompute(tmp_path):
+    detector = IncrementalTrendDetector("TEST", state_dir=str(tmp_path))
+    windows = list(hourly_windows(runs=1))
+    detector.process(*windows[0])
+    window, now = windows[1]
+    last_old = int(np.searchsorted(window.times, windows[0][0].times[-1]))
+    window.water_level_0[last_old] += 50   # dữ liệu cũ bị sửa sau lần chạy trước
+    reason, _ = detector._check_state(detector._load_state(), window)
+    assert reason == "data changed since the previous run"
+    assert result_key(detector.process(window, now=now)) == result_key(trend_detected_processes(window, now=now))
+
+def test_late_rows_and_invalidate_in_the_cache_reset_the_state(tmp_path):
+    rows = generate_rows(TideConfig(days=2, end=END, seed=3))
+    cache = RecordCache(str(tmp_path / "cache"))
+    cache.merge("TEST", rows[:-1])
+    detector = IncrementalTrendDetector("TEST")
+    detector.process(DataProcessor().process(rows[:-1]), now=END)
+    assert os.path.exists(detector.state_path)
+
+    # dòng mới hơn watermark, hoặc dòng cũ không đổi (fetch lặp lại): giữ state
+    cache.merge("TEST", rows[-1:] + rows[10:11])
+    assert os.path.exists(detector.state_path)
+
+    # dòng cũ hơn watermark bị sửa trên server: trước phần tail → phải tính lại
+    late = dict(rows[10], water_lever_0=str(int(rows[10]["water_lever_0"]) + 50))
+    cache.merge("TEST", [late])
+    assert not os.path.exists(detector.state_path)
+
+    detector.process(DataProcessor().process(rows), now=END)
+    cache.invalidate("TEST", END - timedelta(hours=6))
+    assert not os.path.exists(detector.state_path)
@@ -0,0 +1,42 @@
+import itertools
+import json
+import random
+import pytest
+from network.json_stream import iter_json_array
+
+PAYLOAD = json.dumps([
+    1, -2, 1.5, -0.25, 1e3, 2.5E-2, 12345678901234567890,
+    True, False, None, "", "trạm Triều Dương", "a\"b\\c\u00e9",
+    {"id": 7, "water_level_0": 1234.5, "date_time": "2025-06-01 07:00:00"},
+    [1, [2, [3]], {}], [],
+], ensure_ascii=False, indent=1).encode()
+
+def split_at(data: bytes, *cuts: int) -> list[bytes]:
+    bounds = [0, *cuts, len(data)]
+    return [data[a:b] for a, b in zip(bounds, bounds[1:])]
+
+def test_scalar_split_at_decimal_point():
+    assert list(iter_json_array([b"[1.", b"5]"])) == [1.5]
+    assert list(iter_json_array([b"[1e", b"3, tr", b"ue]"])) == [1000.0, True]
+
+def test_every_split_point_gives_the_same_items():
+    expected = json.loads(PAYLOAD)
+    for cut in range(1, len(PAYLOAD)):
+        assert list(iter_json_array(split_at(PAYLOAD, cut))) == expected, cut
+
+def test_random_chunking_gives_the_same_items():
+    expected = json.loads(PAYLOAD)
+    rng = random.Random(0)
+    for _ in range(300):
+        cuts = sorted(rng.sample(range(1, len(PAYLOAD)), rng.randint(1, 40)))
+        assert list(iter_json_array(split_at(PAYLOAD, *cuts))) == expected
+
+@pytest.mark.parametrize("payload", [b"[1x]", b"[1,", b'{"a": 1}', b"[1] 2", b"[1 2]"])
+def test_malformed_payload_raises(payload):
+    with pytest.raises(ValueError):
+        list(iter_json_array(split_at(payload, 2)))
+
+def test_undecodable_item_is_not_buffered_until_eof():
+    endless = itertools.chain([b'["'], itertools.repeat(b"a" * 1024))
+    with pytest.raises(ValueError, match="not decodable"):
+        list(iter_json_array(endless, max_item_size=16 * 1024))
@@ -0,0 +1,172 @@
+import os
+import threading
+from datetime import datetime
+import pytest
+from logger import logger as logger_module
+from logger.logger import LoggerFactory, LOG_DIR
+
+@pytest.fixture
+def logger():
+    """
+    The singleton with a fresh writer (log files go to the test's cwd);
+    levels, rate limits and sampling are restored afterwards.
+    """
+    logger = LoggerFactory()
+    logger.close()
+    saved = (logger._default_level, dict(logger._tag_levels),
+             {tag: dict(limit) for tag, limit in logger._rate_limits.items()}, dict(logger._sampling))
+    logger.set_level("DEBUG")
+    yield logger
+    logger.close()
+    logger._default_level, logger._tag_levels, logger._rate_limits, logger._sampling = saved
+
+def log_lines(name=None):
+    lines = []
+    if not os.path.isdir(LOG_DIR):
+        return lines
+    for filename in sorted(os.listdir(LOG_DIR)):
+        if name is None or filename == name:
+            with open(os.path.join(LOG_DIR, filename), encoding="utf-8", newline="") as f:
+                lines += f.read().split("\r\n")[:-1]
+    return lines
+
+def messages(lines):
+    # bỏ phần thời gian "[YYYY-mm-dd HH:MM:SS] "
+    return [line[22:] for line in lines]
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class Counted:
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "counted"
+
+def test_writer_thread_writes_every_line_in_order(logger):
+    def worker(k):
+        for i in range(200):
+            logger.add_log("INFO", "worker %d line %d", k, i, tag="Writer")
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert logger._writer.name == "LoggerWriter" and logger._writer.daemon
+    logger.flush()
+    lines = messages(log_lines())
+    assert len(lines) == 800
+    for k in range(4):
+        assert [line for line in lines if line.startswith(f"[INFO] [Writer] worker {k} ")] == \
+               [f"[INFO] [Writer] worker {k} line {i}" for i in range(200)]
+
+def test_close_stops_the_writer_and_a_later_line_restarts_it(logger):
+    logger.add_log("INFO", "before close", tag="Writer")
+    logger.close()
+    assert logger._writer is None and logger._file is None
+    logger.add_log("INFO", "after close", tag="Writer")
+    logger.close()
+    assert messages(log_lines()) == ["[INFO] [Writer] before close", "[INFO] [Writer] after close"]
+
+def test_lines_logged_while_closing_are_not_lost(logger):
+    stop = threading.Event()
+    sent = [0] * 3
+
+    def worker(k):
+        while not stop.is_set():
+            logger.add_log("INFO", "line %d", sent[k], tag=f"Closing{k}")
+            sent[k] += 1
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(3)]
+    for thread in threads:
+        thread.start()
+    for _ in range(20):
+        logger.close()
+    stop.set()
+    for thread in threads:
+        thread.join()
+    logger.close()
+    assert len(log_lines()) == sum(sent)
+
+def test_lines_go_to_the_file_of_their_day(logger, monkeypatch):
+    stamps = [datetime(2025, 6, 1, 23, 59, 59), datetime(2025, 6, 2, 0, 0, 1), datetime(2025, 6, 2, 0, 0, 2)]
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return stamps.pop(0)
+    monkeypatch.setattr(logger_module, "datetime", FakeDatetime)
+    for text in ("before midnight", "after midnight", "next"):
+        logger.add_log("INFO", text, tag="Rollover")
+    logger.flush()
+    assert log_lines("2025-06-01.txt") == ["[2025-06-01 23:59:59] [INFO] [Rollover] before midnight"]
+    assert log_lines("2025-06-02.txt") == ["[2025-06-02 00:00:01] [INFO] [Rollover] after midnight",
+                                           "[2025-06-02 00:00:02] [INFO] [Rollover] next"]
+    assert logger._file_date == datetime(2025, 6, 2).date()
+
+def test_level_gating_by_default_level_and_tag(logger):
+    logger.set_level("WARNING")
+    logger.set_level("DEBUG", tag="Chatty")
+    assert not logger.is_enabled("INFO", "Quiet") and logger.is_enabled("BUG", "Quiet")
+    assert logger.is_enabled("DEBUG", "Chatty")
+    logger.add_log("INFO", "dropped", tag="Quiet")
+    logger.add_log("WARNING", "kept", tag="Quiet")
+    logger.add_log("DEBUG", "kept too", tag="Chatty")
+    logger.flush()
+    assert messages(log_lines()) == ["[WARNING] [Quiet] kept", "[DEBUG] [Chatty] kept too"]
+    with pytest.raises(ValueError):
+        logger.add_log("ERROR", "no such level")
+
+def test_formatting_only_runs_for_written_lines(logger):
+    logger.set_level("INFO")
+    counted, calls = Counted(), []
+    logger.add_log("DEBUG", "Data: %s", counted, tag="Lazy")
+    logger.add_log("DEBUG", lambda: calls.append(1) or "never", tag="Lazy")
+    assert counted.calls == 0 and calls == []
+    logger.add_log("INFO", "Data: %s", counted, tag="Lazy")
+    logger.add_log("INFO", lambda: calls.append(1) or "built", tag="Lazy")
+    logger.flush()
+    assert counted.calls == 1 and calls == [1]
+    assert messages(log_lines()) == ["[INFO] [Lazy] Data: counted", "[INFO] [Lazy] built"]
+
+def test_positional_tag_is_still_accepted_and_stray_args_are_rejected(logger):
+    logger.add_log("INFO", "legacy call", "Legacy")
+    logger.add_log("INFO", "no tag")
+    logger.flush()
+    assert messages(log_lines()) == ["[INFO] [Legacy] legacy call", "[INFO] [MyApp] no tag"]
+    with pytest.raises(TypeError):
+        logger.add_log("INFO", "two extra args", "a", "b")
+    with pytest.raises(TypeError):
+        logger.add_log("INFO", "not a tag", 42, tag="Strict")
+
+def test_rate_limit_drops_lines_and_reports_them(logger, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(logger_module.time, "monotonic", clock)
+    logger.set_rate_limit("Noisy", 2, per_seconds=60)
+    counted = Counted()
+    for i in range(5):
+        logger.add_log("INFO", "line %d %s", i, counted, tag="Noisy")
+    logger.add_log("WARNING", "warnings are never limited", tag="Noisy")
+    assert counted.calls == 2
+    clock.now += 60
+    logger.add_log("INFO", "new window", tag="Noisy")
+    logger.flush()
+    assert messages(log_lines()) == [
+        "[INFO] [Noisy] line 0 counted",
+        "[INFO] [Noisy] line 1 counted",
+        "[WARNING] [Noisy] warnings are never limited",
+        "[WARNING] [Noisy] Rate limit: suppressed 3 lines of tag Noisy",
+        "[INFO] [Noisy] new window",
+    ]
+
+def test_sampling_keeps_one_line_in_every_n(logger):
+    logger.set_sampling("Sampled", 3)
+    for i in range(7):
+        logger.add_log("DEBUG", "sample %d", i, tag="Sampled")
+    logger.flush()
+    assert messages(log_lines()) == [f"[DEBUG] [Sampled] sample {i}" for i in (0, 3, 6)]
@@ -0,0 +1,83 @@
+import json
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler
+import pytest
+from network.http_client import HttpClient
+from pipeline.metrics import RunMetrics, prometheus_text, load_history, rolling_percentiles, PROM_FILE, HISTORY_FILE
+
+class OkHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = b"x" * 100
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def run_record(wall, stages):
+    return {"run_at": "2025-06-01T10:00:00", "station": "TEST", "ok": True, "wall": wall, "cpu": wall / 2, "stages": stages}
+
+def test_stage_records_time_counters_and_http_deltas(local_server, tmp_path):
+    base = local_server(OkHandler)
+    client = HttpClient(retries=0)
+    client.get(base + "/before")  # ngoài stage: không được tính
+    metrics = RunMetrics("TEST", datetime(2025, 6, 1, 10), metrics_dir=str(tmp_path))
+    with metrics.stage("fetch") as stage:
+        client.get(base + "/a")
+        client.get(base + "/b")
+        stage["records_out"] = 2
+    fetch = metrics.stages["fetch"]
+    assert fetch["http_requests"] == 2 and fetch["http_bytes"] == 200
+    assert fetch["http_retries"] == fetch["http_errors"] == 0
+    assert fetch["records_out"] == 2 and fetch["wall"] >= 0 and fetch["cpu"] >= 0
+
+def test_stage_error_is_recorded_and_reraised(tmp_path):
+    metrics = RunMetrics("TEST", datetime(2025, 6, 1, 10), metrics_dir=str(tmp_path))
+    with pytest.raises(ZeroDivisionError):
+        with metrics.stage("trend") as stage:
+            stage["records_in"] = 5
+            1 / 0
+    trend = metrics.stages["trend"]
+    assert trend["error"] == "ZeroDivisionError: division by zero"
+    assert trend["records_in"] == 5 and "wall" in trend
+
+def test_write_replaces_prom_file_and_appends_history(tmp_path):
+    for hour in (10, 11):
+        metrics = RunMetrics("TEST", datetime(2025, 6, 1, hour), metrics_dir=str(tmp_path))
+        with metrics.stage("parse"):
+            pass
+        metrics.write()
+    assert "water_pipeline_last_run_timestamp_seconds" in (tmp_path / PROM_FILE).read_text(encoding="utf-8")
+    assert not (tmp_path / (PROM_FILE + ".tmp")).exists()
+    assert [run["run_at"] for run in load_history(str(tmp_path / HISTORY_FILE))] == ["2025-06-01T10:00:00", "2025-06-01T11:00:00"]
+
+def test_prometheus_text_escapes_labels_and_suffixes_seconds():
+    record = run_record(1.5, {'fe"tch\\\n': {"wall": 0.25, "cpu": 0.125, "records_out": 7, "ok": True, "error": "x"}})
+    text = prometheus_text(record)
+    assert 'water_pipeline_stage_wall_seconds{station="TEST",stage="fe\\"tch\\\\\\n"} 0.25' in text
+    assert "water_pipeline_stage_cpu_seconds{" in text
+    assert 'water_pipeline_stage_records_out{station="TEST",stage="fe\\"tch\\\\\\n"} 7' in text
+    # bool và chuỗi không thành gauge, và không có hậu tố _seconds cho counter
+    assert "stage_ok" not in text and "stage_error" not in text and "records_out_seconds" not in text
+    assert "# TYPE water_pipeline_run_wall_seconds gauge" in text
+    assert all(line.startswith("#") or len(line.split(" ")) == 2 for line in text.splitlines())
+
+def test_load_history_skips_truncated_lines(tmp_path):
+    path = tmp_path / HISTORY_FILE
+    runs = [run_record(k, {}) for k in range(3)]
+    lines = [json.dumps(run) for run in runs]
+    path.write_text(lines[0] + "\n\n" + lines[1] + "\n" + lines[2][:20] + "\n" + lines[2] + "\n" + lines[2][:-5], encoding="utf-8")
+    assert [run["wall"] for run in load_history(str(path))] == [0, 1, 2]
+    assert [run["wall"] for run in load_history(str(path), last=2)] == [1, 2]
+    assert load_history(str(tmp_path / "missing.jsonl")) == []
+
+def test_rolling_percentiles_per_stage_and_total():
+    runs = [run_record(float(k), {"fetch": {"wall": float(k)}, "trend": {"wall": 10.0 * k}}) for k in range(1, 101)]
+    runs.append(run_record(1.0, {"fetch": {"error": "boom"}}))
+    stats = rolling_percentiles(runs)
+    assert stats["fetch"] == {"n": 100, "p50": 50.5, "p95": pytest.approx(95.05)}
+    assert stats["trend"]["p50"] == 505.0
+    assert stats["total"]["n"] == 101
+    assert rolling_percentiles(runs, "http_bytes") == {}
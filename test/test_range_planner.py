@@ -0,0 +1,50 @@
+from datetime import datetime
+import numpy as np
+from data.data_handler import DataProcessor
+from network.range_planner import TableRequest, plan_table_requests, merge_by_time, merge_series_by_time
+
+def row(row_id, created_at, level=1000):
+    return {"id": row_id, "serial_number": "TEST", "created_at": created_at,
+            "water_level_0": level, "water_level_1": level, "water_level_2": level, "vol": 12.5}
+
+def test_plan_single_table():
+    begin, end = datetime(2025, 3, 4, 1), datetime(2025, 3, 8, 1)
+    assert plan_table_requests(begin, end) == [TableRequest("water_level_03_2025", begin, end)]
+
+def test_plan_february_of_leap_and_common_years():
+    for year, last_day in ((2024, 29), (2025, 28)):
+        plan = plan_table_requests(datetime(year, 2, 27), datetime(year, 3, 2))
+        assert [request.table_name for request in plan] == [f"water_level_02_{year}", f"water_level_03_{year}"]
+        assert plan[0].end == datetime(year, 2, last_day, 23, 59, 59)
+        assert plan[1].begin == datetime(year, 3, 1)
+
+def test_plan_december_to_january_rollover():
+    plan = plan_table_requests(datetime(2024, 12, 30, 12), datetime(2025, 1, 2, 12))
+    assert plan == [
+        TableRequest("water_level_12_2024", datetime(2024, 12, 30, 12), datetime(2024, 12, 31, 23, 59, 59)),
+        TableRequest("water_level_01_2025", datetime(2025, 1, 1), datetime(2025, 1, 2, 12)),
+    ]
+
+def test_plan_empty_when_end_before_begin():
+    assert plan_table_requests(datetime(2025, 3, 2), datetime(2025, 3, 1)) == []
+
+def test_merge_keeps_equal_ids_from_different_month_tables():
+    # id bắt đầu lại trong mỗi bảng water_level_MM_YYYY
+    january = [row(4, "2025-01-31 23:40:00"), row(5, "2025-01-31 23:50:00")]
+    february = [row(5, "2025-02-01 00:00:00"), row(6, "2025-02-01 00:10:00")]
+    merged = merge_by_time([january, february])
+    assert [r["created_at"] for r in merged] == [
+        "2025-01-31 23:40:00", "2025-01-31 23:50:00", "2025-02-01 00:00:00", "2025-02-01 00:10:00"]
+
+def test_merge_drops_rows_repeated_inside_a_table():
+    january = [row(5, "2025-01-31 23:50:00"), row(5, "2025-01-31 23:50:00")]
+    assert len(merge_by_time([january, [row(5, "2025-02-01 00:00:00")]])) == 2
+
+def test_merge_series_matches_row_merge_across_month_boundary():
+    january = [row(4, "2025-01-31 23:40:00"), row(5, "2025-01-31 23:50:00"), row(5, "2025-01-31 23:50:00")]
+    february = [row(5, "2025-02-01 00:00:00"), row(6, "2025-02-01 00:10:00")]
+    parse = lambda rows: DataProcessor().process(rows)
+    merged = merge_series_by_time([parse(january), parse(february)])
+    expected = parse(merge_by_time([january, february]))
+    assert merged.ids.tolist() == expected.ids.tolist() == [4, 5, 5, 6]
+    assert np.array_equal(merged.times, expected.times)
@@ -0,0 +1,95 @@
+import os
+import json
+from datetime import datetime
+import pytest
+from network import record_cache
+from network.record_cache import RecordCache
+
+def row(row_id, created_at, level=1000):
+    return {"id": str(row_id), "serial_number": "TEST", "created_at": created_at,
+            "water_lever_0": str(level), "water_lever_1": str(level), "water_lever_2": str(level), "vol": "12.50"}
+
+ROWS = [
+    row(1, "2025-01-31 23:40:00"),
+    row(2, "2025-01-31 23:50:00"),
+    row(1, "2025-02-01 00:00:00"),   # id bắt đầu lại trong bảng tháng mới
+    row(2, "2025-02-01 00:10:00"),
+]
+
+@pytest.fixture
+def cache(tmp_path):
+    return RecordCache(str(tmp_path / "cache"))
+
+def times(rows):
+    return [r["created_at"] for r in rows]
+
+def test_merge_splits_by_month_table_and_advances_the_watermark(cache):
+    assert cache.last_timestamp("TEST") is None
+    assert cache.merge("TEST", ROWS[:3]) == 3
+    assert cache.last_timestamp("TEST") == datetime(2025, 2, 1)
+    assert cache._tables("TEST") == ["water_level_01_2025", "water_level_02_2025"]
+    # cùng id, thay giá trị: không tính là mới; dòng cũ hơn không kéo watermark lùi
+    assert cache.merge("TEST", [row(2, "2025-01-31 23:50:00", level=1100), ROWS[3]]) == 1
+    assert cache.last_timestamp("TEST") == datetime(2025, 2, 1, 0, 10)
+    loaded = cache.load("TEST", datetime(2025, 1, 1), datetime(2025, 3, 1))
+    assert times(loaded) == times(ROWS)
+    assert loaded[1]["water_lever_0"] == "1100"
+
+def test_rows_without_created_at_are_skipped(cache):
+    assert cache.merge("TEST", [{"id": "9"}, {"id": "8", "created_at": "yesterday"}]) == 0
+    assert cache.last_timestamp("TEST") is None
+
+def test_load_is_inclusive_and_sorted(cache):
+    cache.merge("TEST", list(reversed(ROWS)))
+    assert times(cache.load("TEST", datetime(2025, 1, 31, 23, 50), datetime(2025, 2, 1))) == times(ROWS[1:3])
+    assert cache.load("TEST", datetime(2025, 2, 2), datetime(2025, 2, 3)) == []
+    assert cache.load("OTHER", datetime(2025, 1, 1), datetime(2025, 3, 1)) == []
+
+def test_evict_drops_older_rows_and_empty_tables(cache):
+    cache.merge("TEST", ROWS)
+    assert cache.evict("TEST", datetime(2025, 1, 31, 23, 50)) == 1
+    assert cache.evict("TEST", datetime(2025, 2, 1)) == 1
+    assert cache._tables("TEST") == ["water_level_02_2025"]
+    assert times(cache.load("TEST", datetime(2025, 1, 1), datetime(2025, 3, 1))) == times(ROWS[2:])
+    # evict không đụng watermark
+    assert cache.last_timestamp("TEST") == datetime(2025, 2, 1, 0, 10)
+
+def test_invalidate_range_moves_the_watermark_back(cache):
+    cache.merge("TEST", ROWS)
+    assert cache.invalidate("TEST", datetime(2025, 1, 31, 23, 50), datetime(2025, 2, 1)) == 2
+    assert times(cache.load("TEST", datetime(2025, 1, 1), datetime(2025, 3, 1))) == times([ROWS[0], ROWS[3]])
+    assert cache.last_timestamp("TEST") == datetime(2025, 1, 31, 23, 50)
+    assert cache.invalidate("TEST", datetime(2025, 2, 1)) == 1
+    assert times(cache.load("TEST", datetime(2025, 1, 1), datetime(2025, 3, 1))) == times(ROWS[:1])
+    # watermark đã trước begin: giữ nguyên
+    assert cache.last_timestamp("TEST") == datetime(2025, 1, 31, 23, 50)
+
+def test_crash_during_write_keeps_the_previous_file(cache, monkeypatch):
+    cache.merge("TEST", ROWS[:2])
+    path = cache._table_path("TEST", "water_level_01_2025")
+    with open(path, encoding="utf-8") as f:
+        before = f.read()
+
+    def crash(src, dst):
+        raise OSError("power lost")
+    monkeypatch.setattr(record_cache.os, "replace", crash)
+    with pytest.raises(OSError):
+        cache.merge("TEST", [row(3, "2025-01-31 23:55:00")])
+    monkeypatch.undo()
+
+    # file cũ còn nguyên, file .tmp dở dang không được đọc như một bảng
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == before
+    assert os.path.exists(path + ".tmp")
+    assert cache._tables("TEST") == ["water_level_01_2025"]
+    assert times(cache.load("TEST", datetime(2025, 1, 1), datetime(2025, 3, 1))) == times(ROWS[:2])
+    assert cache.last_timestamp("TEST") == datetime(2025, 1, 31, 23, 50)
+    assert cache.merge("TEST", [row(3, "2025-01-31 23:55:00")]) == 1
+    with open(path, encoding="utf-8") as f:
+        assert len(json.load(f)) == 3
+
+def test_unreadable_table_file_is_treated_as_empty(cache):
+    cache.merge("TEST", ROWS[:2])
+    with open(cache._table_path("TEST", "water_level_01_2025"), "w", encoding="utf-8") as f:
+        f.write('{"1": {"id"')
+    assert cache.load("TEST", datetime(2025, 1, 1), datetime(2025, 3, 1)) == []
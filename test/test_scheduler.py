@@ -0,0 +1,100 @@
+import os
+import time
+import types
+from datetime import datetime, timedelta
+from functools import partial
+import pytest
+from pipeline.scheduler import Scheduler
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+# Các task chạy trong tiến trình con (spawn): phải là hàm cấp module
+def record_slot(path, slot):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(f"{slot:%Y-%m-%d %H:%M}\n")
+
+def hang_on(hung_slot, path, slot):
+    if slot == hung_slot:
+        time.sleep(60)
+    record_slot(path, slot)
+
+def recorded(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+def make_scheduler(tmp_path, now, task=None, **options):
+    options.setdefault("state_file", str(tmp_path / "scheduler.json"))
+    return Scheduler(task or partial(record_slot, str(tmp_path / "runs.txt")), clock=FakeClock(now), **options)
+
+def test_slots_are_aligned_to_midnight(tmp_path):
+    scheduler = make_scheduler(tmp_path, datetime(2025, 6, 1, 10, 37))
+    assert scheduler.slot_at_or_before(datetime(2025, 6, 1, 10, 37, 59)) == datetime(2025, 6, 1, 10)
+    assert scheduler.next_slot(datetime(2025, 6, 1, 10)) == datetime(2025, 6, 1, 11)
+    quarter = make_scheduler(tmp_path, datetime(2025, 6, 1), cadence=timedelta(minutes=15))
+    assert quarter.slot_at_or_before(datetime(2025, 6, 1, 10, 37)) == datetime(2025, 6, 1, 10, 30)
+    assert quarter.next_slot(datetime(2025, 6, 1, 23, 50)) == datetime(2025, 6, 2)
+    with pytest.raises(ValueError):
+        make_scheduler(tmp_path, datetime(2025, 6, 1), cadence=timedelta(minutes=7))
+
+def test_first_start_waits_for_the_next_slot(tmp_path):
+    scheduler = make_scheduler(tmp_path, datetime(2025, 6, 1, 10, 37))
+    assert scheduler.due_slots(scheduler.clock()) == []
+    assert scheduler.last_slot == datetime(2025, 6, 1, 10)
+
+def test_catch_up_is_capped_to_the_newest_slots(tmp_path):
+    scheduler = make_scheduler(tmp_path, datetime(2025, 6, 1, 10, 5), max_catch_up=3)
+    scheduler.due_slots(scheduler.clock())
+    due = scheduler.due_slots(datetime(2025, 6, 1, 16, 2))
+    assert due == [datetime(2025, 6, 1, 14), datetime(2025, 6, 1, 15), datetime(2025, 6, 1, 16)]
+
+def test_last_slot_is_restored_from_the_state_file(tmp_path):
+    first = make_scheduler(tmp_path, datetime(2025, 6, 1, 10, 5))
+    first.due_slots(first.clock())
+    restarted = make_scheduler(tmp_path, datetime(2025, 6, 1, 12, 1))
+    assert restarted.last_slot == datetime(2025, 6, 1, 10)
+    assert restarted.due_slots(restarted.clock()) == [datetime(2025, 6, 1, 11), datetime(2025, 6, 1, 12)]
+
+def test_unreadable_state_file_starts_fresh(tmp_path):
+    (tmp_path / "scheduler.json").write_text("{not json", encoding="utf-8")
+    assert make_scheduler(tmp_path, datetime(2025, 6, 1, 10)).last_slot is None
+
+def test_run_pending_runs_due_slots_in_order_with_their_time(tmp_path):
+    clock = FakeClock(datetime(2025, 6, 1, 10, 5))
+    scheduler = make_scheduler(tmp_path, clock.now)
+    scheduler.clock = clock
+    scheduler.due_slots(clock())
+    clock.now = datetime(2025, 6, 1, 12, 0, 30)
+    assert scheduler.run_pending() == 2
+    assert recorded(tmp_path / "runs.txt") == ["2025-06-01 11:00", "2025-06-01 12:00"]
+    assert scheduler.run_pending() == 0
+
+def test_no_new_run_while_the_previous_one_is_active(tmp_path):
+    scheduler = make_scheduler(tmp_path, datetime(2025, 6, 1, 12, 1))
+    scheduler.last_slot = datetime(2025, 6, 1, 10)
+    scheduler._worker = types.SimpleNamespace(is_alive=lambda: True)
+    assert scheduler.run_pending() == 0
+    assert scheduler.last_slot == datetime(2025, 6, 1, 10)
+
+def test_hung_run_is_terminated_and_the_next_slot_runs(tmp_path):
+    runs = str(tmp_path / "runs.txt")
+    clock = FakeClock(datetime(2025, 6, 1, 11, 0, 5))
+    scheduler = make_scheduler(tmp_path, clock.now, task=partial(hang_on, datetime(2025, 6, 1, 11), runs), run_timeout=2)
+    scheduler.clock = clock
+    scheduler.last_slot = datetime(2025, 6, 1, 10)
+
+    started = time.monotonic()
+    assert scheduler.run_pending() == 1
+    assert time.monotonic() - started < 20
+    assert not scheduler._busy()
+    assert scheduler.last_slot == datetime(2025, 6, 1, 11)
+
+    clock.now = datetime(2025, 6, 1, 12, 0, 5)
+    assert scheduler.run_pending() == 1
+    assert recorded(runs) == ["2025-06-01 12:00"]
@@ -0,0 +1,60 @@
+import os
+from datetime import datetime
+import pytest
+
+pytest.importorskip("selenium")
+from selenium.common.exceptions import TimeoutException
+from automation.selenium_controller import BrowserSession, new_chromium_driver
+
+if not os.path.exists("/usr/bin/chromedriver"):
+    pytest.skip("chromedriver not installed", allow_module_level=True)
+
+@pytest.fixture
+def browser_session(madien_site):
+    sessions = []
+
+    def start(timeout=5, **options):
+        base, handler = madien_site(**options)
+        session = BrowserSession(user="user", password="secret",
+                                 login_link=f"{base}/content/users/login.asp?ret_page=../../content/code/",
+                                 report_link=f"{base}/content/code/",
+                                 timeout=timeout,
+                                 driver_factory=lambda: new_chromium_driver(headless=True))
+        sessions.append(session)
+        return session, handler
+
+    yield start
+    for session in sessions:
+        session.close()
+
+def test_submit_report_waits_for_each_page(browser_session):
+    session, handler = browser_session()
+    assert session.submit_report("74194 12345", now=datetime(2025, 6, 1, 0, 5))
+    assert handler.logins == 1
+    assert handler.hours == ["24"]
+    assert [post["noidungmadien"] for post in handler.posts] == ["74194 12345"]
+
+def test_checking_fills_the_form_without_submitting(browser_session):
+    session, handler = browser_session()
+    assert session.submit_report("checking", now=datetime(2025, 6, 1, 7))
+    assert handler.hours == ["7"] and handler.posts == []
+
+def test_session_is_reused_and_logs_in_again_when_expired(browser_session):
+    session, handler = browser_session()
+    assert session.submit_report("74194 11111", now=datetime(2025, 6, 1, 7))
+    assert session.submit_report("74194 22222", now=datetime(2025, 6, 1, 8))
+    assert handler.logins == 1
+    session.driver.delete_all_cookies()  # server coi như phiên đã hết hạn
+    assert session.submit_report("74194 33333", now=datetime(2025, 6, 1, 9))
+    assert handler.logins == 2 and len(handler.posts) == 3
+
+def test_content_missing_on_result_page_times_out_to_false(browser_session):
+    session, handler = browser_session(timeout=1, echo_content=False)
+    assert not session.submit_report("74194 12345", now=datetime(2025, 6, 1, 7))
+    assert len(handler.posts) == 1
+
+def test_rejected_login_raises_timeout_after_one_retry(browser_session):
+    session, handler = browser_session(timeout=1)
+    session.password = "wrong"
+    with pytest.raises(TimeoutException):
+        session.submit_report("74194 12345", now=datetime(2025, 6, 1, 7))
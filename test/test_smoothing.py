@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from scipy.signal import savgol_coeffs, savgol_filter
+from benchmark.synthetic import TideConfig, generate_rows
+from data.data_handler import DataProcessor
+from data.smoothing import SavgolSmoother, savgol_coefficients, savgol_smooth
+
+PARAMS = [(5, 1), (7, 2), (11, 3), (23, 3), (31, 4), (9, 0)]
+
+@pytest.fixture(scope="module")
+def levels():
+    series = DataProcessor().process(generate_rows(TideConfig(days=2, seed=11)))
+    return series.water_level_0.astype(np.float64)
+
+@pytest.mark.parametrize("window_length, polyorder", PARAMS)
+def test_savgol_smooth_matches_scipy(levels, window_length, polyorder):
+    assert np.allclose(savgol_coefficients(window_length, polyorder), savgol_coeffs(window_length, polyorder),
+                       rtol=0, atol=1e-12)
+    expected = savgol_filter(levels, window_length, polyorder, mode="interp")
+    # phần giữa phải giống hệt từng bit (các tie của find_peaks_custom phụ thuộc vào nó)
+    half = window_length // 2
+    smoothed = savgol_smooth(levels, window_length, polyorder)
+    assert np.array_equal(smoothed[half:-half], expected[half:-half])
+    assert np.allclose(smoothed, expected, rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize("window_length, polyorder", PARAMS)
+def test_smoother_append_matches_scipy_on_the_whole_series(levels, window_length, polyorder):
+    smoother = SavgolSmoother(window_length, polyorder)
+    # lô nhỏ hơn cửa sổ lúc đầu, rồi các lô lớn nhỏ khác nhau
+    cuts = [0, 3, window_length + 1, 40, 41, 100, 170, len(levels)]
+    for begin, end in zip(cuts, cuts[1:]):
+        smoothed = smoother.append(levels[begin:end])
+        if end < window_length:
+            assert len(smoothed) == 0
+            continue
+        expected = savgol_filter(levels[:end], window_length, polyorder, mode="interp")
+        assert np.allclose(smoothed, expected, rtol=0, atol=1e-9)
+    assert np.array_equal(smoother.smoothed, savgol_smooth(levels, window_length, polyorder))
+
+def test_invalid_parameters_are_rejected_like_scipy():
+    with pytest.raises(ValueError):
+        savgol_coefficients(6, 2)
+    with pytest.raises(ValueError):
+        SavgolSmoother(5, 5)
+    with pytest.raises(ValueError):
+        savgol_smooth(np.arange(4.0), 5, 1)